@@ -0,0 +1,198 @@
+"""
+Calcul des KPIs des dashboards en ligne de commande, sans Streamlit ni Plotly :
+même lecture, même preprocessing et mêmes requêtes que l'application.
+Chaque CSV (ou chaque CSV d'un dossier) produit un fichier JSON, ou un fichier Parquet par KPI.
+
+Usage :
+    python -m app.cli data/shopping.csv --output rapports/
+    python -m app.cli data/ --filters '{"room_type": ["Private room"]}' --format parquet --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from app.database.connection import execute_query, register_dataframe
+from app.database.ingestion import ingest_csv
+from app.utils.constants import PREPROCESSING_WORKERS
+from app.utils.data_processing import preprocess_auto, read_csv_sniffed, read_options, sniff_csv
+from app.utils.lazy_loading import load_queries
+
+
+OUTPUT_FORMATS = ['json', 'parquet']
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('inputs', type=Path, nargs='+', help="Fichiers CSV ou dossiers de CSV")
+    parser.add_argument('--filters', type=json.loads, default=None, help="Filtres des dashboards, en JSON")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='json')
+    parser.add_argument('--output', type=Path, default=Path('kpis'), help="Dossier des résultats")
+    parser.add_argument('--engine', choices=['pandas', 'duckdb'], default='pandas', help="Lecture et nettoyage du CSV")
+    parser.add_argument('--workers', type=int, help="Fichiers traités en parallèle (par défaut un processus par CPU)")
+    args = parser.parse_args(argv)
+
+    if args.filters is not None and not isinstance(args.filters, dict):
+        parser.error("--filters doit être un objet JSON")
+
+    files = list_csv_files(args.inputs)
+    if not files:
+        parser.error("aucun fichier CSV trouvé")
+
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(files)))
+    jobs = [
+        (path, name, args.filters, args.format, args.output, args.engine, workers == 1)
+        for path, name in zip(files, output_names(files))
+    ]
+
+    # Un processus par fichier : chacun a sa propre base DuckDB en mémoire
+    if workers == 1:
+        reports = [_run_job(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            reports = list(executor.map(_run_job, *zip(*jobs)))
+
+    failed = 0
+    for report in reports:
+        if 'error' in report:
+            failed += 1
+            print(f"{report['source']} : erreur, {report['error']}", file=sys.stderr)
+        else:
+            print(f"{report['source']} -> {report['output']} ({report['dataset_type']}, {report['rows']:,} lignes, {report['seconds']:.2f} s)")
+
+    return 1 if failed else 0
+
+
+def list_csv_files(inputs: list[Path]) -> list[Path]:
+    """
+    Fichiers CSV à traiter : les fichiers indiqués et les CSV des dossiers indiqués
+    """
+    files = []
+    for path in inputs:
+        if path.is_dir():
+            files.extend(sorted(path.glob('*.csv')))
+        else:
+            files.append(path)
+    return files
+
+
+def output_names(files: list[Path]) -> list[str]:
+    """
+    Nom des résultats de chaque fichier : le nom du CSV, préfixé par son dossier s'il est
+    partagé par plusieurs fichiers (a/listings.csv -> a_listings), puis numéroté s'il reste
+    en double, pour qu'aucun résultat n'en écrase un autre
+    """
+    stems = Counter(path.stem for path in files)
+    names = []
+    for path in files:
+        name = path.stem if stems[path.stem] == 1 else f"{path.resolve().parent.name}_{path.stem}"
+        unique, index = name, 2
+        while unique in names:
+            unique, index = f"{name}_{index}", index + 1
+        names.append(unique)
+    return names
+
+
+def compute_kpis(
+    csv_path: Path,
+    filters: dict | None = None,
+    engine: str = 'pandas',
+    preprocessing_workers: int = PREPROCESSING_WORKERS
+) -> tuple[str, int, int | None, dict[str, pd.DataFrame]]:
+    """
+    Lit et nettoie le CSV comme l'application, puis calcule tous les KPIs de son dashboard
+
+    Args:
+        csv_path: Fichier CSV
+        filters: Filtres du dashboard (mêmes clés que ceux de la barre latérale)
+        engine: 'pandas' (preprocess_auto) ou 'duckdb' (ingestion native)
+        preprocessing_workers: Processus du preprocessing pandas
+
+    Returns:
+        Tuple (type de dataset, nombre de lignes nettoyées, doublons supprimés, KPIs indexés par nom)
+    """
+    with open(csv_path, 'rb') as f:
+        dataset_type, sample = sniff_csv(f)
+        if dataset_type == 'unknown':
+            raise ValueError("type de dataset non reconnu")
+
+        if engine == 'duckdb':
+            dataset_type, duplicates_removed = ingest_csv(str(csv_path), dataset_type)
+            rows = None
+        else:
+            df_raw = read_csv_sniffed(f, read_options(dataset_type, sample))
+            df_clean, dataset_type = preprocess_auto(df_raw, workers=preprocessing_workers)
+            del df_raw
+            rows = len(df_clean)
+            duplicates_removed = df_clean.attrs.get('duplicates_removed')
+            register_dataframe(df_clean, dataset_type)
+            del df_clean
+
+    if rows is None:
+        rows = int(execute_query(f"SELECT COUNT(*) AS nb_lignes FROM {dataset_type}")['nb_lignes'].iloc[0])
+
+    return dataset_type, rows, duplicates_removed, load_queries(dataset_type).get_dashboard_kpis(filters)
+
+
+def write_kpis(kpis: dict[str, pd.DataFrame], output_dir: Path, name: str, output_format: str, metadata: dict) -> Path:
+    """
+    Écrit les KPIs d'un fichier : <name>.json (métadonnées et lignes de chaque KPI)
+    ou un dossier <name>/ contenant un fichier Parquet par KPI
+
+    Returns:
+        Fichier ou dossier écrit
+    """
+    if output_format == 'parquet':
+        output = output_dir / name
+        output.mkdir(parents=True, exist_ok=True)
+        for kpi, df in kpis.items():
+            df.to_parquet(output / f"{kpi}.parquet", index=False)
+        return output
+
+    output = output_dir / f"{name}.json"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    document = {**metadata, 'kpis': {kpi: _records(df) for kpi, df in kpis.items()}}
+    output.write_text(json.dumps(document, indent=2, ensure_ascii=False))
+    return output
+
+
+def _run_job(
+    csv_path: Path, name: str, filters: dict | None, output_format: str, output_dir: Path, engine: str, single: bool
+) -> dict:
+    """
+    Traite un fichier et retourne son compte rendu. Toute erreur (fichier illisible, colonne
+    manquante…) est rapportée dans ce compte rendu, sans interrompre le traitement des autres fichiers.
+    """
+    start = time.perf_counter()
+    try:
+        # Fichiers traités en parallèle : le preprocessing de chacun reste dans son processus
+        dataset_type, rows, duplicates_removed, kpis = compute_kpis(csv_path, filters, engine, PREPROCESSING_WORKERS if single else 1)
+        metadata = {
+            'source': str(csv_path),
+            'dataset_type': dataset_type,
+            'rows': rows,
+            'duplicates_removed': duplicates_removed,
+            'filters': filters,
+        }
+        output = write_kpis(kpis, output_dir, name, output_format, metadata)
+    except Exception as e:
+        return {'source': str(csv_path), 'error': f"{type(e).__name__}: {e}"}
+
+    return {**metadata, 'output': str(output), 'seconds': time.perf_counter() - start}
+
+
+def _records(df: pd.DataFrame) -> list[dict]:
+    """
+    Lignes du KPI en types JSON (valeurs manquantes à null)
+    """
+    return json.loads(df.to_json(orient='records', force_ascii=False, double_precision=15))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
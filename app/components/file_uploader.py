@@ -1,16 +1,46 @@
 """
 Composant Streamlit pour le téléversement de fichiers CSV
 """
+import hashlib
+
+import duckdb
 import pandas as pd
 import streamlit as st
 
-from app.utils.data_processing import preprocess_auto
-from app.database.connection import register_dataframe
+from app.utils.cache import LRUCache
+from app.utils.constants import (
+    DEDUP_STRATEGY,
+    INGESTION_CACHE_MAX_ENTRIES,
+    INGESTION_ENGINES,
+    PREPROCESSING_VERSION
+)
+from app.utils.data_processing import memory_report, preprocess_auto, read_csv_sniffed, read_options, sniff_csv
+from app.utils.lazy_loading import load_queries
+from app.utils.profiling import profile_step
+from app.database.catalog import (
+    append_dataset,
+    dataset_table,
+    delta_table,
+    find_dataset,
+    list_datasets,
+    open_dataset,
+    save_dataset
+)
+from app.database.connection import (
+    drop_table,
+    execute_query,
+    get_table,
+    get_table_version,
+    register_dataframe,
+    table_exists
+)
+from app.database.ingestion import ingest_stream, ingest_upload
 
 
-def render_file_uploader() -> tuple[pd.DataFrame | None, str | None]:
+def render_file_uploader() -> tuple[duckdb.DuckDBPyRelation | None, str | None]:
     """
-    Affiche le composant d'upload CSV et retourne le DataFrame traité
+    Affiche le composant d'upload CSV (ou de réouverture d'un dataset du catalogue)
+    et retourne la table DuckDB des données traitées
     """
     uploaded_file = st.file_uploader(
         "Téléverser un fichier CSV",
@@ -18,38 +48,294 @@ def render_file_uploader() -> tuple[pd.DataFrame | None, str | None]:
         help="Fichiers supportés : Customer Shopping Behavior, Airbnb Open Data"
     )
 
-    if uploaded_file is not None:
+    engine = st.radio(
+        "Moteur d'ingestion",
+        options=INGESTION_ENGINES,
+        horizontal=True,
+        help="duckdb : lecture CSV parallèle et nettoyage en SQL. pandas : pipeline historique, conservé pour comparaison. "
+             "arrow : pipeline pandas avec le parseur multithread de pyarrow. "
+             "streaming : pandas par blocs en mémoire bornée, pour les fichiers de plusieurs Go."
+    )
+
+    # Mode ajout : le fichier complète le dataset ouvert au lieu de le remplacer
+    append = bool(st.session_state.get('opened_digest')) and st.toggle(
+        "Ajouter au dataset ouvert",
+        help="Seules les lignes absentes du dataset ouvert sont insérées (mêmes règles de dédoublonnage "
+             "que le preprocessing). Pour les dépôts quotidiens d'un même flux."
+    )
+
+    try:
+        if uploaded_file is not None and append:
+            entry, origin = _append_upload(uploaded_file, engine)
+        elif uploaded_file is not None:
+            entry, origin = _load_upload(uploaded_file, engine)
+        else:
+            entry, origin = _render_catalog_picker(), 'catalog'
+            if entry is None:
+                return None, None
+
+        # Un fichier non reconnu est refusé par _read_into : message d'erreur ci-dessous
+        dataset_type = entry['dataset_type']
+        st.success(f"Dataset **{dataset_type.upper()}** détecté et nettoyé.")
+
+        if origin == 'cache':
+            st.caption("Cache d'ingestion : fichier déjà traité, lecture et preprocessing ignorés.")
+        elif origin == 'append':
+            added = st.session_state['last_append'][2]
+            st.caption(
+                f"Fichier ajouté ({engine}) : {added:,} nouvelles lignes insérées, options de filtres et cube "
+                "complétés à partir du delta, graphiques recalculés sur le cube."
+            )
+        elif origin == 'catalog':
+            st.caption("Catalogue : dataset déjà nettoyé, rouvert sans relire le fichier.")
+        else:
+            st.caption(f"Fichier lu et nettoyé ({engine}), enregistré dans le catalogue.")
+
+        # Affichage
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Lignes", f"{entry['n_rows']:,}")
+        with col2:
+            st.metric("Colonnes", entry['n_cols'])
+
+        # Aperçu des data
+        with st.expander("Aperçu des données"):
+            st.dataframe(execute_query(f"SELECT * FROM {dataset_type} LIMIT 10", arrow=True))
+
+        # Doublons supprimés, quel que soit le moteur d'ingestion
+        st.caption(
+            f"{entry['duplicates_removed']:,} doublons supprimés "
+            f"(stratégie de dédoublonnage : {entry['dedup_strategy']})"
+        )
+
+        # Rapport mémoire de la dernière ingestion pandas de ce dataset
+        report = st.session_state.get('memory_report')
+        if report is not None and report[0] == dataset_table(entry['digest']):
+            _render_memory_report(report[1])
+
+        return get_table(dataset_type), dataset_type
+
+    except Exception as e:
+        st.error(f"Erreur lors du chargement : {e}")
+        return None, None
+
+
+def _load_upload(uploaded_file, engine: str) -> tuple[dict, str]:
+    """
+    Rend disponible le fichier téléversé sous le nom de son type de dataset
+
+    Returns:
+        Tuple (métadonnées du dataset, origine : 'cache', 'catalog' ou 'ingestion')
+    """
+    cache = _get_ingestion_cache()
+    cache_key = _ingestion_key(uploaded_file)
+    entry = cache.get(cache_key)
+
+    # Rien à faire si la session a déjà ouvert ce dataset
+    if (
+        entry is not None
+        and st.session_state.get('opened_digest') == entry['digest']
+        and table_exists(entry['dataset_type'])
+    ):
+        return entry, 'cache'
+
+    digest = cache_key[0]
+    entry = find_dataset(digest)
+    origin = 'catalog'
+
+    if entry is None:
+        entry = _ingest(uploaded_file, engine, digest)
+        origin = 'ingestion'
+
+    open_dataset(entry)
+    cache.put(cache_key, entry)
+    st.session_state['opened_digest'] = digest
+
+    return entry, origin
+
+
+def _append_upload(uploaded_file, engine: str) -> tuple[dict, str]:
+    """
+    Ajoute les lignes nouvelles du fichier téléversé au dataset ouvert de la session
+
+    Returns:
+        Tuple (métadonnées du dataset complété, origine : 'cache' ou 'append')
+    """
+    delta_digest = _ingestion_key(uploaded_file)[0]
+    base_digest = st.session_state['opened_digest']
+
+    # Reruns suivants : le fichier a déjà été ajouté au dataset ouvert
+    last_append = st.session_state.get('last_append')
+    if delta_digest == base_digest or (last_append is not None and last_append[:2] == (delta_digest, base_digest)):
+        entry = find_dataset(base_digest)
+        if entry is not None and table_exists(entry['dataset_type']):
+            return entry, 'cache'
+
+    base = find_dataset(base_digest)
+    if base is None:
+        raise ValueError("Le dataset ouvert n'est plus dans le catalogue, rechargez-le avant d'y ajouter un fichier.")
+
+    staging = 'upload__staging'
+    try:
+        dataset_type, duplicates_removed = _read_into(uploaded_file, engine, staging)
+        if dataset_type != base['dataset_type']:
+            raise ValueError(f"Le fichier ajouté n'est pas un dataset {base['dataset_type']}.")
+        entry = append_dataset(base, staging, delta_digest, uploaded_file.name, duplicates_removed)
+    finally:
+        drop_table(staging)
+
+    # Le rapport mémoire du fichier ajouté est affiché avec le dataset complété
+    report = st.session_state.get('memory_report')
+    if report is not None and report[0] == staging:
+        st.session_state['memory_report'] = (dataset_table(entry['digest']), report[1])
+
+    # Options de filtres complétées à partir du delta, sans relire la table complète
+    previous_version = get_table_version(entry['dataset_type'])
+    open_dataset(entry)
+    load_queries(entry['dataset_type']).merge_filter_options(previous_version, delta_table(entry['digest']))
+    st.session_state['opened_digest'] = entry['digest']
+    st.session_state['last_append'] = (delta_digest, entry['digest'], entry['n_rows'] - base['n_rows'])
+
+    return entry, 'append'
+
+
+def _render_catalog_picker() -> dict | None:
+    """
+    Liste les datasets du catalogue et ouvre celui choisi par l'utilisateur
+    """
+    saved = list_datasets()
+    if saved.empty:
+        return None
+
+    entries = {row['digest']: row for row in saved.to_dict('records')}
+    digest = st.selectbox(
+        "Ou rouvrir un dataset enregistré",
+        options=[None, *entries],
+        format_func=lambda d: "—" if d is None else (
+            f"{entries[d]['file_name']} ({entries[d]['dataset_type']}, {entries[d]['n_rows']:,} lignes)"
+        )
+    )
+    if digest is None:
+        return None
+
+    entry = entries[digest]
+    if st.session_state.get('opened_digest') != digest or not table_exists(entry['dataset_type']):
+        open_dataset(entry)
+        st.session_state['opened_digest'] = digest
+
+    return entry
+
+
+def _ingest(uploaded_file, engine: str, digest: str) -> dict:
+    """
+    Lit, nettoie et matérialise le fichier dans la table du catalogue avec le moteur choisi.
+    Seules les métadonnées sont conservées en mémoire : les données vivent dans DuckDB.
+    """
+    dataset_type, duplicates_removed = _read_into(uploaded_file, engine, dataset_table(digest))
+    return save_dataset(digest, dataset_type, uploaded_file.name, duplicates_removed)
+
+
+def _read_into(uploaded_file, engine: str, table: str) -> tuple[str, int]:
+    """
+    Lit et nettoie le fichier dans la table indiquée avec le moteur choisi.
+    Le type de dataset est détecté sur l'en-tête et un échantillon : un fichier
+    non reconnu est refusé avant sa lecture complète.
+
+    Returns:
+        Tuple (type de dataset détecté, nombre de doublons supprimés)
+    """
+    dataset_type, sample = sniff_csv(uploaded_file)
+    if dataset_type == 'unknown':
+        raise ValueError(
+            "Type de dataset non reconnu, fichier refusé. "
+            "Fichiers supportés : Customer Shopping Behavior, Airbnb Open Data"
+        )
+
+    if engine == 'duckdb':
+        with profile_step('ingest_upload', 'ingestion'):
+            return ingest_upload(uploaded_file, table)
+
+    if engine == 'streaming':
+        progress = st.progress(0.0, text="Lecture du fichier par blocs…")
+
+        def on_progress(n_rows: int, bytes_read: int, total_bytes: int) -> None:
+            progress.progress(
+                min(bytes_read / max(total_bytes, 1), 1.0),
+                text=f"{n_rows:,} lignes lues, {bytes_read / 2**20:,.0f} / {total_bytes / 2**20:,.0f} Mo"
+            )
+
         try:
-            # Lecture du CSV
-            df_raw = pd.read_csv(uploaded_file, low_memory=False)
+            with profile_step('ingest_stream', 'ingestion'):
+                return ingest_stream(uploaded_file, table, on_progress=on_progress)
+        finally:
+            progress.empty()
+
+    # Lecture du CSV : seules les colonnes du schéma déclaré, avec leur type
+    with profile_step('read_csv', 'ingestion') as step:
+        df_raw = read_csv_sniffed(uploaded_file, read_options(dataset_type, sample, arrow=engine == 'arrow'))
+        step['rows_returned'] = len(df_raw)
+    del sample
+
+    # Preprocessing automatique selon le type de dataset, DataFrame compact en sortie
+    with profile_step('preprocess_auto', 'ingestion') as step:
+        df_clean, dataset_type = preprocess_auto(df_raw)
+        duplicates_removed = df_clean.attrs.get('duplicates_removed', 0)
+        step.update(rows_scanned=len(df_raw), rows_returned=len(df_clean), duplicates_removed=duplicates_removed)
+    st.session_state['memory_report'] = (table, memory_report(df_raw, df_clean))
+    del df_raw
+
+    # Copie dans une table duckdb, le DataFrame est libéré en sortie de fonction
+    register_dataframe(df_clean, table)
+    return dataset_type, duplicates_removed
+
 
-            # Preprocessing automatique selon le type de dataset
-            df_clean, dataset_type = preprocess_auto(df_raw)
+def _render_memory_report(report: pd.DataFrame) -> None:
+    """
+    Affiche la mémoire occupée par chaque colonne avant (lecture du CSV) et après le preprocessing
+    """
+    with st.expander("Rapport mémoire"):
+        total_before = report['octets_avant'].sum()
+        total_after = report['octets_apres'].sum()
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Lecture du CSV", f"{total_before / 2**20:,.1f} Mo")
+        with col2:
+            st.metric("DataFrame compact", f"{total_after / 2**20:,.1f} Mo")
+        with col3:
+            st.metric("Gain", f"{100 * (1 - total_after / max(total_before, 1)):.0f} %")
+
+        st.dataframe(report, hide_index=True)
 
-            # Protection contre la casse si un utilisateur uploade un dataset inconnu
-            if dataset_type == 'unknown':
-                st.warning("Type de dataset non reconnu. Aucun preprocessing appliqué.")
-            else:
-                st.success(f"Dataset **{dataset_type.upper()}** détecté et nettoyé.")
 
-            # Enregistrement dans duckdb
-            register_dataframe(df_clean, dataset_type)
+def _get_ingestion_cache() -> LRUCache:
+    """
+    Retourne le cache d'ingestion de la session en évinçant les entrées
+    produites par une ancienne version du preprocessing ou une autre stratégie de dédoublonnage
+    """
+    if 'ingestion_cache' not in st.session_state:
+        st.session_state['ingestion_cache'] = LRUCache(INGESTION_CACHE_MAX_ENTRIES)
 
-            # Affichage
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("Lignes", f"{len(df_clean):,}")
-            with col2:
-                st.metric("Colonnes", len(df_clean.columns))
+    cache = st.session_state['ingestion_cache']
+    cache.evict(lambda key: key[1:] != (DEDUP_STRATEGY, PREPROCESSING_VERSION))
+    return cache
 
-            # Aperçu des data
-            with st.expander("Aperçu des données"):
-                st.dataframe(df_clean.head(10))
 
-            return df_clean, dataset_type
+def _ingestion_key(uploaded_file) -> tuple[str, str, int]:
+    """
+    Clé du cache d'ingestion : empreinte du contenu du fichier, stratégie de dédoublonnage
+    et version du preprocessing.
+    L'empreinte est mémorisée par identifiant d'upload pour ne hacher le fichier qu'une fois.
+    """
+    digests = st.session_state.setdefault('upload_digests', {})
+    file_id = getattr(uploaded_file, 'file_id', None)
 
-        except Exception as e:
-            st.error(f"Erreur lors du chargement : {e}")
-            return None, None
+    if file_id is None or file_id not in digests:
+        digest = hashlib.blake2b(uploaded_file.getvalue(), digest_size=16).hexdigest()
+        if file_id is None:
+            return digest, DEDUP_STRATEGY, PREPROCESSING_VERSION
+        # Un seul upload actif par session : on ne garde que la dernière empreinte
+        digests.clear()
+        digests[file_id] = digest
 
-    return None, None
+    return digests[file_id], DEDUP_STRATEGY, PREPROCESSING_VERSION
@@ -0,0 +1,89 @@
+"""
+Panneau de profilage des reruns (barre latérale) : chronologie des étapes du dernier rerun,
+plan EXPLAIN ANALYZE d'une requête KPI et export JSON des derniers reruns
+"""
+from collections import deque
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from app.database.connection import explain_analyze
+from app.utils.constants import PROFILING_MAX_RERUNS
+from app.utils.lazy_loading import get_startup
+from app.utils.profiling import export_reruns
+
+
+def render_profiling_panel(rerun: dict) -> None:
+    """
+    Affiche le profil du rerun qui vient de se terminer et l'ajoute à l'historique de la session
+    """
+    history = st.session_state.setdefault('profiled_reruns', deque(maxlen=PROFILING_MAX_RERUNS))
+    history.append(rerun)
+
+    with st.sidebar.expander("Profilage du rerun", expanded=True):
+        steps = pd.DataFrame(rerun['steps'])
+        st.metric("Durée du rerun", f"{rerun['seconds'] * 1000:,.0f} ms")
+
+        startup = get_startup()
+        if startup is not None:
+            st.caption(
+                f"Démarrage du processus : premier rerun en {startup['first_rerun_seconds']:.2f} s, "
+                f"dont {startup['imports_seconds']:.2f} s d'imports"
+            )
+
+        if steps.empty:
+            st.caption("Aucune étape mesurée.")
+        else:
+            _render_timeline(steps)
+
+        _render_explain(rerun['steps'])
+
+        st.download_button(
+            f"Exporter les {len(history)} derniers reruns (JSON)",
+            data=export_reruns(list(history)),
+            file_name='profil_reruns.json',
+            mime='application/json'
+        )
+
+
+def _render_timeline(steps: pd.DataFrame) -> None:
+    """
+    Chronologie des étapes (début et durée), puis détail des étapes
+    """
+    steps = steps.assign(
+        libelle=[f"{i + 1}. {name[:40]}" for i, name in enumerate(steps['step'])],
+        ms=steps['seconds'] * 1000,
+        debut_ms=steps['start'] * 1000
+    )
+
+    fig = px.bar(
+        steps,
+        x='ms',
+        base='debut_ms',
+        y='libelle',
+        color='kind',
+        orientation='h',
+        hover_data=[col for col in ('thread', 'cache', 'rows_returned', 'rows_scanned') if col in steps],
+        labels={'ms': 'Durée (ms)', 'libelle': '', 'kind': 'Étape'}
+    )
+    fig.update_yaxes(autorange='reversed')
+    fig.update_layout(height=120 + 22 * len(steps), margin=dict(l=0, r=0, t=10, b=0), xaxis_title='ms depuis le début du rerun')
+    st.plotly_chart(fig, use_container_width=True)
+
+    columns = [col for col in ('step', 'kind', 'ms', 'cache', 'rows_returned', 'rows_scanned') if col in steps]
+    st.dataframe(steps[columns].round({'ms': 1}), hide_index=True)
+
+
+def _render_explain(steps: list[dict]) -> None:
+    """
+    Plan EXPLAIN ANALYZE d'une requête du rerun, avec ses paramètres de filtres
+    """
+    queries = {step['step']: step for step in steps if step.get('query')}
+    if not queries:
+        return
+
+    label = st.selectbox("Requête à analyser", options=list(queries), key='explain_query')
+    if st.button("EXPLAIN ANALYZE"):
+        step = queries[label]
+        st.code(explain_analyze(step['query'], step.get('params')), language=None)
@@ -3,19 +3,29 @@ Composants de la barre latérale avec filtres dynamiques
 """
 import streamlit as st
 
-from app.database.queries_shopping import get_filter_options as get_shopping_filters
-from app.database.queries_airbnb import get_filter_options as get_airbnb_filters
+from app.database.connection import get_query_cache_stats
+from app.utils.lazy_loading import load_queries
+from app.utils.profiling import profile_step
 
 
 def render_sidebar_filters(dataset_type: str) -> dict:
     st.sidebar.header("Filtres")
 
     if dataset_type == 'shopping':
-        return _render_shopping_filters()
+        filters = _render_shopping_filters()
     elif dataset_type == 'airbnb':
-        return _render_airbnb_filters()
+        filters = _render_airbnb_filters()
+    else:
+        filters = {}
 
-    return {}
+    # Efficacité du cache de résultats depuis le démarrage
+    stats = get_query_cache_stats()
+    st.sidebar.caption(
+        f"Cache des requêtes : {stats['hits']:,} hits, {stats['misses']:,} misses, "
+        f"{stats['entries']} résultats ({stats['bytes'] / 1024:,.0f} Ko)"
+    )
+
+    return filters
 
 
 def _render_shopping_filters() -> dict:
@@ -25,12 +35,14 @@ def _render_shopping_filters() -> dict:
     filters = {}
 
     try:
-        options = get_shopping_filters()
+        with profile_step('get_filter_options', 'query'):
+            options = load_queries('shopping').get_filter_options()
 
         # Filtre par catégorie
         selected_categories = st.sidebar.multiselect(
             "Catégorie",
             options=options['categories'],
+            format_func=_with_count(options['counts']['categories']),
             default=None,
             placeholder="Toutes les catégories"
         )
@@ -41,6 +53,7 @@ def _render_shopping_filters() -> dict:
         selected_seasons = st.sidebar.multiselect(
             "Saison",
             options=options['seasons'],
+            format_func=_with_count(options['counts']['seasons']),
             default=None,
             placeholder="Toutes les saisons"
         )
@@ -51,6 +64,7 @@ def _render_shopping_filters() -> dict:
         selected_genders = st.sidebar.multiselect(
             "Genre",
             options=options['genders'],
+            format_func=_with_count(options['counts']['genders']),
             default=None,
             placeholder="Tous les genres"
         )
@@ -61,6 +75,7 @@ def _render_shopping_filters() -> dict:
         selected_locations = st.sidebar.multiselect(
             "Localisation",
             options=options['locations'],
+            format_func=_with_count(options['counts']['locations']),
             default=None,
             placeholder="Toutes les localisations"
         )
@@ -80,12 +95,14 @@ def _render_airbnb_filters() -> dict:
     filters = {}
 
     try:
-        options = get_airbnb_filters()
+        with profile_step('get_filter_options', 'query'):
+            options = load_queries('airbnb').get_filter_options()
 
         # Filtre par quartier
         selected_neighbourhoods = st.sidebar.multiselect(
             "Quartier",
             options=options['neighbourhoods'],
+            format_func=_with_count(options['counts']['neighbourhoods']),
             default=None,
             placeholder="Tous les quartiers"
         )
@@ -96,6 +113,7 @@ def _render_airbnb_filters() -> dict:
         selected_room_types = st.sidebar.multiselect(
             "Type de logement",
             options=options['room_types'],
+            format_func=_with_count(options['counts']['room_types']),
             default=None,
             placeholder="Tous les types"
         )
@@ -106,6 +124,7 @@ def _render_airbnb_filters() -> dict:
         selected_policies = st.sidebar.multiselect(
             "Politique d'annulation",
             options=options['cancellation_policies'],
+            format_func=_with_count(options['counts']['cancellation_policies']),
             default=None,
             placeholder="Toutes les politiques"
         )
@@ -126,3 +145,10 @@ def _render_airbnb_filters() -> dict:
         st.sidebar.warning(f"Erreur chargement filtres: {e}")
 
     return filters
+
+
+def _with_count(counts: dict):
+    """
+    Affiche chaque option de filtre avec son nombre de lignes
+    """
+    return lambda value: f"{value} ({counts.get(value, 0):,})"
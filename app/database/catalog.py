@@ -0,0 +1,332 @@
+"""
+Catalogue persistant des datasets nettoyés (fichier DuckDB dans data/catalog).
+Chaque dataset est stocké une seule fois, identifié par l'empreinte du CSV d'origine,
+et peut être rouvert après un redémarrage sans nouvel upload.
+
+Le sélecteur d'une session ne liste que les datasets qu'elle a elle-même déposés ou ouverts.
+Un fichier déjà présent, déposé par une autre session, est rouvert sans être relu (même empreinte).
+Le catalogue est borné (CATALOG_MAX_DATASETS, CATALOG_MAX_AGE_DAYS) : à l'enregistrement d'un dataset,
+les moins récemment ouverts sont supprimés, sauf ceux ouverts depuis moins de SESSION_IDLE_TIMEOUT.
+
+Un dataset n'est retrouvé que s'il a été produit par la version courante du preprocessing
+et avec la stratégie de dédoublonnage courante (DEDUP_STRATEGY) : changer de stratégie
+suffit à relire les fichiers, sans incrémenter PREPROCESSING_VERSION.
+"""
+import hashlib
+
+import duckdb
+import pandas as pd
+
+from app.database.connection import (
+    append_table,
+    bump_table_version,
+    execute_query,
+    get_connection,
+    get_namespace,
+    get_table_info,
+    qualify_table,
+    quote_literal
+)
+from app.database.cube import attach_cube, build_cube, update_cube
+from app.utils.constants import (
+    AGGREGATE_CUBE_ENABLED,
+    CATALOG_MAX_AGE_DAYS,
+    CATALOG_MAX_DATASETS,
+    CATALOG_PATH,
+    DEDUP_STRATEGY,
+    PREPROCESSING_VERSION,
+    SESSION_IDLE_TIMEOUT
+)
+from app.utils.data_processing import dedup_columns
+
+
+CATALOG_NAME = 'catalog'
+
+
+def attach_catalog() -> None:
+    """
+    Attache le fichier du catalogue à la connexion (sans effet s'il l'est déjà).
+    Si le dossier n'est pas accessible en écriture, un catalogue en mémoire
+    est utilisé : l'application fonctionne, sans persistance.
+    """
+    conn = get_connection()
+    try:
+        CATALOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn.execute(f"ATTACH IF NOT EXISTS {quote_literal(str(CATALOG_PATH))} AS {CATALOG_NAME}")
+    except (OSError, duckdb.IOException):
+        conn.execute(f"ATTACH IF NOT EXISTS ':memory:' AS {CATALOG_NAME}")
+
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CATALOG_NAME}.datasets (
+            digest VARCHAR PRIMARY KEY,
+            dataset_type VARCHAR,
+            file_name VARCHAR,
+            preprocessing_version INTEGER,
+            n_rows BIGINT,
+            n_cols INTEGER,
+            created_at TIMESTAMP DEFAULT current_timestamp
+        )
+    """)
+    # Catalogues créés avant l'éviction des datasets, la copie à l'écriture du mode ajout
+    # et l'enregistrement du dédoublonnage
+    conn.execute(f"ALTER TABLE {CATALOG_NAME}.datasets ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMP")
+    conn.execute(f"ALTER TABLE {CATALOG_NAME}.datasets ADD COLUMN IF NOT EXISTS parent VARCHAR")
+    conn.execute(f"ALTER TABLE {CATALOG_NAME}.datasets ADD COLUMN IF NOT EXISTS dedup_strategy VARCHAR")
+    conn.execute(f"ALTER TABLE {CATALOG_NAME}.datasets ADD COLUMN IF NOT EXISTS duplicates_removed BIGINT")
+
+    # Sessions (schéma DuckDB) ayant déposé ou ouvert chaque dataset
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CATALOG_NAME}.dataset_owners (
+            digest VARCHAR,
+            owner VARCHAR,
+            PRIMARY KEY (digest, owner)
+        )
+    """)
+
+
+def dataset_table(digest: str) -> str:
+    """
+    Nom qualifié de la table du catalogue contenant le dataset
+    (vue base UNION ALL delta pour un dataset complété en mode ajout)
+    """
+    return f"{CATALOG_NAME}.ds_{digest}"
+
+
+def delta_table(digest: str) -> str:
+    """
+    Nom qualifié de la table du catalogue contenant les lignes ajoutées à sa base
+    par un dataset complété en mode ajout
+    """
+    return f"{CATALOG_NAME}.delta_{digest}"
+
+
+def cube_table(digest: str) -> str:
+    """
+    Nom qualifié de la table du catalogue contenant le cube de pré-agrégats du dataset
+    """
+    return f"{CATALOG_NAME}.cube_{digest}"
+
+
+def find_dataset(digest: str) -> dict | None:
+    """
+    Retourne les métadonnées du dataset s'il est présent dans le catalogue
+    et produit par la version courante du preprocessing, avec la stratégie de dédoublonnage courante
+    """
+    attach_catalog()
+    result = execute_query(f"""
+        SELECT * FROM {CATALOG_NAME}.datasets
+        WHERE digest = {quote_literal(digest)}
+          AND preprocessing_version = {PREPROCESSING_VERSION}
+          AND dedup_strategy = {quote_literal(DEDUP_STRATEGY)}
+    """, use_cache=False)
+    if result.empty:
+        return None
+    return result.iloc[0].to_dict()
+
+
+def list_datasets() -> pd.DataFrame:
+    """
+    Liste les datasets déposés ou ouverts par la session, du plus récemment ouvert au plus ancien,
+    produits par la version courante du preprocessing et la stratégie de dédoublonnage courante.
+    Lecture seule : appelée à chaque rerun, elle n'écrit pas dans le catalogue partagé
+    (l'éviction est faite à l'enregistrement d'un dataset, cf. _purge_datasets).
+    """
+    attach_catalog()
+    return execute_query(f"""
+        SELECT datasets.* FROM {CATALOG_NAME}.datasets
+        JOIN {CATALOG_NAME}.dataset_owners USING (digest)
+        WHERE owner = {quote_literal(get_namespace())}
+          AND preprocessing_version = {PREPROCESSING_VERSION}
+          AND dedup_strategy = {quote_literal(DEDUP_STRATEGY)}
+        ORDER BY COALESCE(last_used_at, created_at) DESC
+    """, use_cache=False)
+
+
+def save_dataset(digest: str, dataset_type: str, file_name: str, duplicates_removed: int = 0) -> dict:
+    """
+    Enregistre dans le catalogue les métadonnées d'un dataset dont la table
+    (dataset_table(digest)) vient d'être créée, et construit son cube si le mode cube est actif.
+    Le cube d'une ingestion précédente du même fichier (autre stratégie de dédoublonnage) est supprimé.
+    """
+    conn = get_connection()
+    table = dataset_table(digest)
+    if AGGREGATE_CUBE_ENABLED:
+        build_cube(dataset_type, table, cube_table(digest))
+    else:
+        conn.execute(f"DROP TABLE IF EXISTS {cube_table(digest)}")
+    n_rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    n_cols = len(get_table_info(table))
+
+    conn.execute(
+        f"INSERT OR REPLACE INTO {CATALOG_NAME}.datasets "
+        "(digest, dataset_type, file_name, preprocessing_version, n_rows, n_cols, dedup_strategy, duplicates_removed) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [digest, dataset_type, file_name, PREPROCESSING_VERSION, n_rows, n_cols, DEDUP_STRATEGY, duplicates_removed]
+    )
+    _claim_dataset(digest)
+    _purge_datasets()
+    return find_dataset(digest)
+
+
+def append_dataset(entry: dict, source: str, delta_digest: str, file_name: str, duplicates_removed: int = 0) -> dict:
+    """
+    Crée dans le catalogue le dataset complété : le dataset de entry et les lignes nettoyées de source
+    qu'il ne contient pas encore (même ligne entière, ou même clé naturelle en stratégie 'key').
+    Seul le delta est écrit, et le cube du dataset complété (construit même hors mode cube)
+    est déduit de celui de la base et du delta seul.
+
+    Le dataset complété a sa propre empreinte (contenu précédent + fichier ajouté). La base n'est pas
+    modifiée (copie à l'écriture) : les sessions qui l'ont ouverte continuent de la lire, avec leurs
+    résultats en cache. Seule la session qui ouvre ensuite le dataset complété (open_dataset) change
+    de données ; son cache de résultats est alors vidé, hors options de filtres (merge_filter_options)
+    et cube, complétés à partir du delta.
+
+    Args:
+        entry: Métadonnées du dataset à compléter
+        source: Expression FROM des données nettoyées à ajouter
+        delta_digest: Empreinte du fichier ajouté
+        file_name: Nom du fichier ajouté
+        duplicates_removed: Doublons supprimés à l'ingestion du fichier ajouté
+
+    Returns:
+        Métadonnées du dataset complété, dont les doublons supprimés depuis le premier fichier
+    """
+    conn = get_connection()
+    digest = hashlib.blake2b(f"{entry['digest']}+{delta_digest}".encode(), digest_size=16).hexdigest()
+
+    # Même dataset complété par le même fichier : déjà présent dans le catalogue
+    existing = find_dataset(digest)
+    if existing is not None:
+        return existing
+
+    # Clé naturelle en stratégie 'key', ligne entière sinon
+    base = dataset_table(entry['digest'])
+    columns = get_table_info(base)['column_name'].tolist()
+    keys = dedup_columns(columns, entry['dataset_type'], DEDUP_STRATEGY)
+    n_added, n_present = append_table(
+        source, base, dataset_table(digest), delta_table(digest), keys if keys != columns else None
+    )
+    # Cube toujours construit pour un dataset complété, même hors mode cube : les KPIs se déduisent
+    # des agrégats de la base et du delta au lieu de relire la table complète après chaque ajout.
+    # Le cube de la base est construit au premier ajout s'il manque, puis réutilisé par les suivants.
+    base_cube = cube_table(entry['digest'])
+    if _catalog_table_exists(base_cube) or build_cube(entry['dataset_type'], base, base_cube):
+        update_cube(entry['dataset_type'], delta_table(digest), base_cube, cube_table(digest))
+
+    conn.execute(
+        f"INSERT OR REPLACE INTO {CATALOG_NAME}.datasets "
+        "(digest, dataset_type, file_name, preprocessing_version, n_rows, n_cols, parent, dedup_strategy, duplicates_removed) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            digest, entry['dataset_type'], f"{entry['file_name']} + {file_name}", PREPROCESSING_VERSION,
+            entry['n_rows'] + n_added, entry['n_cols'], entry['digest'], DEDUP_STRATEGY,
+            int(entry['duplicates_removed']) + duplicates_removed + n_present
+        ]
+    )
+    _claim_dataset(digest)
+    _purge_datasets()
+    return find_dataset(digest)
+
+
+def open_dataset(entry: dict) -> None:
+    """
+    Fait pointer le nom du dataset ('shopping' ou 'airbnb') vers sa table du catalogue.
+    Simple création de vue : aucune donnée n'est relue ni copiée.
+    Le cube du dataset est associé à la vue (et construit s'il manque, en mode cube).
+    Un dataset complété en mode ajout est toujours lu dans son cube.
+    """
+    conn = get_connection()
+    name = entry['dataset_type']
+    target = qualify_table(name)
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {target}")
+    except duckdb.CatalogException:
+        # L'objet existant est déjà une vue, remplacée ci-dessous
+        pass
+    conn.execute(f"CREATE OR REPLACE VIEW {target} AS SELECT * FROM {dataset_table(entry['digest'])}")
+    bump_table_version(name)
+    _claim_dataset(entry['digest'])
+
+    cube = cube_table(entry['digest'])
+    if _catalog_table_exists(cube) or (
+        AGGREGATE_CUBE_ENABLED and build_cube(name, dataset_table(entry['digest']), cube)
+    ):
+        # Le cube d'un dataset complété en mode ajout est utilisé même hors mode cube
+        attach_cube(name, cube, always=pd.notna(entry.get('parent')))
+
+
+def _catalog_table_exists(table: str) -> bool:
+    conn = get_connection()
+    table_name = table.split('.', 1)[1]
+    return conn.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE database_name = ? AND table_name = ?",
+        [CATALOG_NAME, table_name]
+    ).fetchone()[0] > 0
+
+
+def _claim_dataset(digest: str) -> None:
+    """
+    Ajoute le dataset au sélecteur de la session et note son ouverture (ordre d'éviction)
+    """
+    conn = get_connection()
+    conn.execute(f"UPDATE {CATALOG_NAME}.datasets SET last_used_at = current_timestamp WHERE digest = ?", [digest])
+    conn.execute(f"INSERT OR IGNORE INTO {CATALOG_NAME}.dataset_owners VALUES (?, ?)", [digest, get_namespace()])
+
+
+def _purge_datasets() -> None:
+    """
+    Supprime les datasets d'une ancienne version du preprocessing ou d'une autre stratégie
+    de dédoublonnage, puis ceux qui ne sont pas ouverts
+    depuis CATALOG_MAX_AGE_DAYS jours ou qui dépassent CATALOG_MAX_DATASETS (les moins récemment ouverts).
+    Un dataset ouvert depuis moins de SESSION_IDLE_TIMEOUT peut encore être lu par une session :
+    il n'est pas supprimé, quitte à dépasser temporairement la limite. La base d'un dataset
+    complété conservé est conservée aussi.
+    Appelée seulement à l'enregistrement d'un dataset (save_dataset, append_dataset), jamais
+    à l'affichage du sélecteur : les reruns n'écrivent pas dans le catalogue partagé.
+    """
+    conn = get_connection()
+    evicted = conn.execute(f"""
+        SELECT digest FROM (
+            SELECT
+                digest,
+                preprocessing_version,
+                dedup_strategy,
+                COALESCE(last_used_at, created_at) AS last_used,
+                row_number() OVER (ORDER BY COALESCE(last_used_at, created_at) DESC) AS rank
+            FROM {CATALOG_NAME}.datasets
+        )
+        WHERE preprocessing_version <> ?
+           OR dedup_strategy IS DISTINCT FROM ?
+           OR (
+               last_used < current_timestamp::TIMESTAMP - to_seconds(?::DOUBLE)
+               AND (last_used < current_timestamp::TIMESTAMP - to_days(?) OR rank > ?)
+           )
+    """, [PREPROCESSING_VERSION, DEDUP_STRATEGY, SESSION_IDLE_TIMEOUT, CATALOG_MAX_AGE_DAYS, CATALOG_MAX_DATASETS]).fetchall()
+
+    # La vue d'un dataset complété lit sa base : la base d'un dataset conservé est conservée
+    parents = dict(conn.execute(f"SELECT digest, parent FROM {CATALOG_NAME}.datasets").fetchall())
+    evicted = {digest for (digest,) in evicted}
+    for digest in list(parents):
+        if digest not in evicted:
+            parent = parents[digest]
+            while parent is not None and parent in parents:
+                evicted.discard(parent)
+                parent = parents[parent]
+
+    for digest in evicted:
+        _drop_catalog_object(dataset_table(digest))
+        conn.execute(f"DROP TABLE IF EXISTS {delta_table(digest)}")
+        conn.execute(f"DROP TABLE IF EXISTS {cube_table(digest)}")
+        conn.execute(f"DELETE FROM {CATALOG_NAME}.dataset_owners WHERE digest = ?", [digest])
+        conn.execute(f"DELETE FROM {CATALOG_NAME}.datasets WHERE digest = ?", [digest])
+
+
+def _drop_catalog_object(name: str) -> None:
+    """
+    Supprime la table ou la vue (dataset complété) du catalogue
+    """
+    conn = get_connection()
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {name}")
+    except duckdb.CatalogException:
+        conn.execute(f"DROP VIEW IF EXISTS {name}")
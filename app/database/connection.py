@@ -1,24 +1,459 @@
 """
 Gestion de la connexion DuckDB
 """
+import contextvars
+import itertools
+import json
+import queue
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Hashable, Iterator
+
 import duckdb
 import pandas as pd
-import streamlit as st
+import pyarrow as pa
+
+from app.utils.cache import LRUCache
+from app.utils.profiling import is_profiling, profile_step
+from app.utils.constants import (
+    CONCURRENT_QUERY_THREADS,
+    ENUM_MAX_CARDINALITY,
+    QUERY_CACHE_MAX_BYTES,
+    QUERY_CACHE_MAX_ENTRIES,
+    SESSION_IDLE_TIMEOUT
+)
+
+
+# Types entiers du plus compact au plus large, avec leurs bornes
+INTEGER_TYPES = [
+    ('TINYINT', -2**7, 2**7 - 1),
+    ('SMALLINT', -2**15, 2**15 - 1),
+    ('INTEGER', -2**31, 2**31 - 1),
+]
+
+# Métriques du profilage DuckDB relevées pour chaque requête d'un rerun profilé
+DUCKDB_PROFILING_METRICS = {'CUMULATIVE_ROWS_SCANNED': 'true', 'OPERATOR_CARDINALITY': 'true'}
+
+# Schéma par défaut, utilisé hors d'une session Streamlit (tests, scripts)
+DEFAULT_NAMESPACE = 'main'
+
+# Version du contenu de chaque table, indexée par (schéma, table), changée à chaque remplacement
+_table_versions: dict[tuple[str, str], int] = {}
+_version_counter = itertools.count(1)
+
+# Version des données de chaque schéma : dernière version attribuée à l'une de ses tables
+_data_versions: dict[str, int] = {}
+
+# Requêtes paramétrées déjà analysées, indexées par (schéma, version des données, requête)
+_statements = LRUCache(max_entries=128)
+
+# Résultats des requêtes, indexés par (schéma, version des données, requête, paramètres)
+_query_cache = LRUCache(
+    QUERY_CACHE_MAX_ENTRIES,
+    max_bytes=QUERY_CACHE_MAX_BYTES,
+    sizeof=lambda result: _result_size(result)
+)
+
+# Base DuckDB du processus, créée à la première connexion
+_database: duckdb.DuckDBPyConnection | None = None
+_database_lock = threading.Lock()
+
+# Caches propres à chaque session, indexés par (schéma, nom du cache) : supprimés à la fermeture de la session
+_session_caches: dict[tuple[str, str], LRUCache] = {}
+
+# Curseur et schéma de chaque session Streamlit
+_sessions: dict[str, dict] = {}
+_sessions_lock = threading.Lock()
+_last_cleanup = 0.0
+
+# Curseurs libres des requêtes concurrentes, par schéma (un curseur n'exécute qu'une requête à la fois)
+_worker_cursors: dict[str, queue.SimpleQueue] = {}
+
+# Threads des requêtes concurrentes, partagés par les sessions
+_query_pool = ThreadPoolExecutor(max_workers=CONCURRENT_QUERY_THREADS, thread_name_prefix='duckdb-query')
+
+# Curseur et schéma prêtés au thread courant par run_concurrently
+_worker = threading.local()
+
+
+def get_database() -> duckdb.DuckDBPyConnection:
+    """
+    Base DuckDB partagée par toutes les sessions du serveur (ou par la CLI).
+    Les sessions ne l'utilisent pas directement mais via leur propre curseur.
+    """
+    global _database
+    with _database_lock:
+        if _database is None:
+            _database = duckdb.connect()
+        return _database
 
 
-@st.cache_resource
 def get_connection() -> duckdb.DuckDBPyConnection:
-    return duckdb.connect()
+    """
+    Connexion de la session courante : un curseur DuckDB dédié, positionné sur
+    le schéma de la session. Les tables 'shopping' / 'airbnb' d'une session ne sont
+    donc pas visibles des autres, et les sessions s'exécutent en parallèle.
+    Hors d'une session Streamlit, retourne la base partagée (schéma main).
+    Dans une tâche de run_concurrently, retourne le curseur prêté à la tâche.
+    """
+    cursor = getattr(_worker, 'cursor', None)
+    if cursor is not None:
+        return cursor
+
+    session_id = _current_session_id()
+    if session_id is None:
+        return get_database()
+
+    now = time.monotonic()
+    with _sessions_lock:
+        session = _sessions.get(session_id)
+        if session is None:
+            session = _open_session(session_id)
+            _sessions[session_id] = session
+        session['last_used'] = now
+
+        if now - _last_cleanup > SESSION_IDLE_TIMEOUT / 10:
+            _close_idle_sessions(now)
+
+    return session['cursor']
+
+
+def get_namespace() -> str:
+    """
+    Schéma DuckDB de la session courante
+    """
+    namespace = getattr(_worker, 'namespace', None)
+    if namespace is not None:
+        return namespace
+
+    session_id = _current_session_id()
+    return DEFAULT_NAMESPACE if session_id is None else _schema_name(session_id)
+
+
+def run_concurrently(tasks: dict[Hashable, Callable[[], Any]]) -> Iterator[tuple[Hashable, Any]]:
+    """
+    Exécute les tâches (des fonctions de requêtes) en même temps, chacune sur son propre
+    curseur DuckDB positionné sur le schéma de la session, et retourne leurs résultats
+    au fur et à mesure qu'ils arrivent : la durée totale est celle de la tâche la plus lente.
+
+    Les threads n'ont pas le contexte Streamlit : le schéma de la session leur est transmis,
+    les tâches ne doivent donc pas appeler Streamlit.
+
+    Args:
+        tasks: Fonctions sans argument, indexées par un identifiant
+
+    Returns:
+        Itérateur de tuples (identifiant, résultat), dans l'ordre de fin des tâches
+    """
+    namespace = get_namespace()
+    # Chaque tâche reçoit une copie du contexte (rerun profilé en cours)
+    futures = {
+        _query_pool.submit(contextvars.copy_context().run, _run_task, namespace, task): key
+        for key, task in tasks.items()
+    }
+    try:
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # Tâches restantes d'un appelant interrompu (erreur, rerun) : inutile de les lancer
+        for future in futures:
+            future.cancel()
 
 
 def register_dataframe(df: pd.DataFrame, table_name: str) -> None:
+    """
+    Copie le DataFrame dans une table DuckDB typée. Une fois la table créée,
+    DuckDB ne garde aucune référence au DataFrame, qui peut être libéré.
+    """
+    conn = get_connection()
+    # Vue temporaire non qualifiée, même si la table cible l'est (catalogue)
+    staging = f"{table_name.rsplit('.', 1)[-1]}__dataframe"
+    with profile_step('register_dataframe', 'ingestion') as step:
+        step['rows_returned'] = len(df)
+        # Sans index : celui d'un DataFrame Arrow filtré deviendrait une colonne __index_level_0__
+        conn.register(staging, df.reset_index(drop=True))
+        try:
+            materialize_table(staging, table_name)
+        finally:
+            conn.unregister(staging)
+
+
+def materialize_table(source: str, table_name: str) -> None:
+    """
+    Crée (ou remplace) une table DuckDB à partir d'une table, d'une vue ou d'une sous-requête,
+    en stockant chaque colonne dans son type le plus compact :
+    - colonnes texte à faible cardinalité en ENUM
+    - colonnes entières dans le plus petit type entier qui contient leurs valeurs
+
+    Args:
+        source: Expression FROM des données à matérialiser
+        table_name: Nom de la table à créer
+    """
+    conn = get_connection()
+    target = qualify_table(table_name)
+
+    # Un ancien DataFrame ou une vue du catalogue porte peut-être déjà ce nom
+    conn.unregister(table_name)
+    _drop_view(conn, target)
+
+    columns = [(row[0], row[1]) for row in conn.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+    column_types = _compact_types(conn, source, columns)
+
+    select = ", ".join(
+        f"CAST({quote_identifier(name)} AS {sql_type}) AS {quote_identifier(name)}"
+        for name, sql_type in column_types
+    )
+    conn.execute(f"CREATE OR REPLACE TABLE {target} AS SELECT {select} FROM {source}")
+    bump_table_version(table_name)
+
+
+def append_table(
+    source: str,
+    base_table: str,
+    table_name: str,
+    delta_table: str,
+    keys: list[str] | None = None
+) -> tuple[int, int]:
+    """
+    Crée table_name : les lignes de base_table complétées par celles de source qu'elle ne contient pas encore
+    (même ligne entière, ou même clé si keys est indiquée). Copie à l'écriture : base_table n'est ni modifiée
+    ni recopiée, les vues des autres sessions qui la lisent restent valides. Seules les nouvelles lignes
+    sont écrites, dans delta_table, et table_name est une vue base_table UNION ALL delta_table.
+    Les types compacts sont élargis dans la vue si les nouvelles lignes sortent de leur domaine
+    (nouvelle valeur d'un ENUM, entier hors des bornes du type).
+
+    Args:
+        source: Expression FROM des données nettoyées et dédoublonnées à ajouter (mêmes colonnes que la table),
+            comme à l'ingestion d'un fichier : ses lignes ne sont pas dédoublonnées entre elles une seconde fois
+        base_table: Table (ou vue) à compléter
+        table_name: Vue à créer
+        delta_table: Table à créer avec les lignes ajoutées
+        keys: Colonnes de la clé de dédoublonnage (par défaut, la ligne entière)
+
+    Returns:
+        Tuple (nombre de lignes ajoutées, nombre de lignes de source déjà présentes dans base_table)
+    """
     conn = get_connection()
-    conn.register(table_name, df)
+    base = qualify_table(base_table)
+    delta = qualify_table(delta_table)
+
+    base_types = [(row[0], row[1]) for row in conn.execute(f"DESCRIBE {base}").fetchall()]
+    source_columns = [row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+    if sorted(source_columns) != sorted(name for name, _ in base_types):
+        raise ValueError("Les colonnes des données ajoutées ne correspondent pas à celles de la table")
+
+    select = ", ".join(quote_identifier(name) for name, _ in base_types)
+    # Anti-jointure : chaque ligne de source est gardée ou écartée individuellement, sans autre
+    # dédoublonnage que celui déjà fait à son ingestion (sur les valeurs brutes du fichier)
+    matching = " AND ".join(
+        f"base.{quote_identifier(key)} IS NOT DISTINCT FROM ajout.{quote_identifier(key)}"
+        for key in keys or [name for name, _ in base_types]
+    )
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {delta} AS
+        SELECT {select} FROM {source} AS ajout
+        WHERE NOT EXISTS (SELECT 1 FROM {base} AS base WHERE {matching})
+    """)
+
+    # Types communs de la base et du delta : ceux de la base, élargis si besoin
+    widened = dict(_widened_types(conn, base, delta))
+    delta_types = dict(conn.execute(f"SELECT column_name, column_type FROM (DESCRIBE {delta})").fetchall())
+    for name, sql_type in base_types:
+        sql_type = widened.get(name, sql_type)
+        if delta_types[name] != sql_type:
+            conn.execute(f"ALTER TABLE {delta} ALTER {quote_identifier(name)} TYPE {sql_type}")
+
+    base_select = ", ".join(
+        f"CAST({quote_identifier(name)} AS {widened[name]}) AS {quote_identifier(name)}"
+        if name in widened else quote_identifier(name)
+        for name, _ in base_types
+    )
+    conn.execute(f"""
+        CREATE OR REPLACE VIEW {qualify_table(table_name)} AS
+        SELECT {base_select} FROM {base}
+        UNION ALL
+        SELECT {select} FROM {delta}
+    """)
+
+    n_source = conn.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+    n_added = conn.execute(f"SELECT COUNT(*) FROM {delta}").fetchone()[0]
+    return n_added, n_source - n_added
+
+
+def drop_table(table_name: str) -> None:
+    """
+    Supprime la table de la session si elle existe
+    """
+    get_connection().execute(f"DROP TABLE IF EXISTS {qualify_table(table_name)}")
+
+
+def qualify_table(table_name: str) -> str:
+    """
+    Préfixe un nom de table non qualifié par le schéma de la session, pour qu'un DROP
+    ou un CREATE ne touche jamais l'objet homonyme d'un autre schéma
+    """
+    if '.' in table_name:
+        return table_name
+    return f"{get_namespace()}.{table_name}"
+
+
+def get_table_version(table_name: str) -> int:
+    """
+    Version du contenu de la table dans le schéma de la session :
+    sert de clé aux caches calculés à partir de ses données
+    """
+    return _table_versions.get((get_namespace(), table_name), 0)
 
 
-def execute_query(query: str) -> pd.DataFrame:
+def bump_table_version(table_name: str) -> None:
+    """
+    Signale que le contenu de la table a changé, ce qui invalide les caches
+    de la session qui en dépendent
+    """
+    namespace = get_namespace()
+    version = next(_version_counter)
+    _table_versions[(namespace, table_name)] = version
+    _data_versions[namespace] = version
+    _query_cache.evict(lambda key: key[0] == namespace)
+    _statements.evict(lambda key: key[0] == namespace)
+
+
+def execute_query(
+    query: str,
+    params: dict | None = None,
+    use_cache: bool = True,
+    arrow: bool = False
+) -> pd.DataFrame | pa.Table:
+    """
+    Exécute la requête et retourne le résultat. Les résultats sont mis en cache
+    jusqu'au prochain changement des données : revenir à un état de filtres
+    déjà affiché ne réinterroge pas DuckDB.
+
+    Args:
+        query: Requête SQL en lecture seule
+        params: Valeurs des paramètres nommés ($nom) de la requête. Une requête
+            paramétrée est analysée une seule fois puis réutilisée
+        use_cache: False pour les requêtes sur des tables modifiées hors de
+            materialize_table (métadonnées du catalogue par exemple), ou dont
+            l'appelant met en cache le résultat final (cached_result)
+        arrow: True pour recevoir une table Arrow, lue depuis DuckDB sans conversion
+            en DataFrame (graphiques, aperçu). La conversion pandas reste à faire
+            par l'appelant là où elle est nécessaire (pivot par exemple)
+    """
+    if not use_cache:
+        return _run_query(query, params, arrow)
+
+    namespace = get_namespace()
+    key = (namespace, _data_versions.get(namespace, 0), query.strip(), _normalize_filters(params), arrow)
+    df = _query_cache.get(key)
+
+    if df is None:
+        df = _run_query(query, params, arrow)
+        _query_cache.put(key, df)
+    elif is_profiling():
+        # Résultat servi par le cache : étape conservée dans le profil, sans requête
+        with profile_step(_query_label(query), 'query') as step:
+            step.update(cache=True, rows_returned=len(df), query=query, params=params)
+
+    if arrow:
+        # Une table Arrow est immuable : pas de copie
+        return df
+    # Copie superficielle : un appelant qui modifie le résultat ne modifie pas le cache
+    return df.copy(deep=False)
+
+
+def filter_conditions(filters: dict | None, columns: dict[str, str]) -> list[str]:
+    """
+    Prédicats des seuls filtres de valeurs renseignés : colonne IN ($filtre_0, $filtre_1, ...).
+    Le texte ne dépend que des filtres présents et du nombre de valeurs choisies, pas des valeurs :
+    la requête analysée est réutilisée, et DuckDB pousse le filtre jusqu'au scan de la table.
+
+    Args:
+        filters: Filtres du dashboard
+        columns: Colonne filtrée (identifiant SQL) par nom de filtre
+    """
+    filters = filters or {}
+    return [
+        f"{column} IN ({', '.join(f'${name}_{i}' for i in range(len(filters[name])))})"
+        for name, column in columns.items() if filters.get(name)
+    ]
+
+
+def filter_params(filters: dict | None, columns: dict[str, str]) -> dict:
+    """
+    Valeurs des paramètres de filter_conditions
+    """
+    filters = filters or {}
+    return {
+        f"{name}_{i}": value
+        for name in columns if filters.get(name)
+        for i, value in enumerate(sorted(filters[name]))
+    }
+
+
+def explain_analyze(query: str, params: dict | None = None) -> str:
+    """
+    Exécute la requête avec EXPLAIN ANALYZE et retourne le plan annoté
+    (temps et cardinalité de chaque opérateur)
+    """
     conn = get_connection()
-    return conn.execute(query).df()
+    explain = f"EXPLAIN ANALYZE {query}"
+    result = conn.execute(explain) if params is None else conn.execute(explain, params)
+    return '\n'.join(row[-1] for row in result.fetchall())
+
+
+def cached_result(kpi_id: str, filters: dict | None, compute: Callable[[], Any]) -> Any:
+    """
+    Met en cache un résultat calculé en plusieurs étapes (requête puis découpage, par exemple),
+    indexé par (version des données, identifiant du KPI, filtres normalisés)
+
+    Args:
+        kpi_id: Identifiant unique du calcul
+        filters: Filtres du dashboard
+        compute: Fonction calculant le résultat (DataFrame ou dict de DataFrames)
+    """
+    namespace = get_namespace()
+    key = (namespace, _data_versions.get(namespace, 0), kpi_id, _normalize_filters(filters))
+    result = _query_cache.get(key)
+
+    if result is None:
+        result = compute()
+        _query_cache.put(key, result)
+
+    if isinstance(result, dict):
+        return {name: df.copy(deep=False) for name, df in result.items()}
+    return result.copy(deep=False)
+
+
+def session_cache(name: str, max_entries: int) -> LRUCache:
+    """
+    Cache LRU réservé à la session courante : les entrées d'une session n'évincent jamais
+    celles des autres, quel que soit le nombre de sessions. Supprimé à la fermeture de la session.
+
+    Args:
+        name: Nom du cache (unique par module appelant)
+        max_entries: Nombre maximal d'entrées de la session
+    """
+    key = (get_namespace(), name)
+    cache = _session_caches.get(key)
+    if cache is None:
+        cache = _session_caches.setdefault(key, LRUCache(max_entries))
+    return cache
+
+
+def get_query_cache_stats() -> dict:
+    """
+    Compteurs du cache de résultats (hits, misses, entrées, octets)
+    """
+    return _query_cache.stats()
+
+
+def get_table(table_name: str) -> duckdb.DuckDBPyRelation:
+    conn = get_connection()
+    return conn.table(table_name)
 
 
 def table_exists(table_name: str) -> bool:
@@ -33,3 +468,275 @@ def table_exists(table_name: str) -> bool:
 def get_table_info(table_name: str) -> pd.DataFrame:
     conn = get_connection()
     return conn.execute(f"DESCRIBE {table_name}").df()
+
+
+def quote_identifier(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _current_session_id() -> str | None:
+    # Streamlit n'est consulté que s'il est déjà chargé : la CLI et les scripts ne l'importent pas
+    if 'streamlit' not in sys.modules:
+        return None
+
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return None if ctx is None else ctx.session_id
+
+
+def _schema_name(session_id: str) -> str:
+    return 's_' + re.sub(r'\W', '_', session_id)
+
+
+def _open_session(session_id: str) -> dict:
+    """
+    Crée le schéma de la session et un curseur qui l'utilise par défaut
+    """
+    schema = _schema_name(session_id)
+    cursor = get_database().cursor()
+    cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+    cursor.execute(f"USE {schema}")
+    return {'cursor': cursor, 'schema': schema, 'last_used': time.monotonic()}
+
+
+def _close_idle_sessions(now: float) -> None:
+    """
+    Ferme les curseurs inutilisés depuis SESSION_IDLE_TIMEOUT et supprime leur schéma
+    (vues et tables de la session) ainsi que leurs entrées de cache, leurs caches de session
+    (options de filtres, cubes) et les versions de leurs tables
+    """
+    global _last_cleanup
+    _last_cleanup = now
+
+    for session_id, session in list(_sessions.items()):
+        if now - session['last_used'] <= SESSION_IDLE_TIMEOUT:
+            continue
+
+        del _sessions[session_id]
+        session['cursor'].close()
+        _close_worker_cursors(session['schema'])
+        get_database().execute(f"DROP SCHEMA IF EXISTS {session['schema']} CASCADE")
+        _query_cache.evict(lambda key: key[0] == session['schema'])
+        _statements.evict(lambda key: key[0] == session['schema'])
+        for key in [key for key in _session_caches if key[0] == session['schema']]:
+            del _session_caches[key]
+        for key in [key for key in _table_versions if key[0] == session['schema']]:
+            del _table_versions[key]
+        _data_versions.pop(session['schema'], None)
+
+
+def _close_worker_cursors(namespace: str) -> None:
+    free = _worker_cursors.pop(namespace, None)
+    while free is not None and not free.empty():
+        free.get_nowait().close()
+
+
+def _run_task(namespace: str, task: Callable[[], Any]) -> Any:
+    """
+    Exécute une tâche de run_concurrently avec un curseur libre du schéma, rendu ensuite
+    """
+    free = _worker_cursors.setdefault(namespace, queue.SimpleQueue())
+    try:
+        cursor = free.get_nowait()
+    except queue.Empty:
+        cursor = get_database().cursor()
+        cursor.execute(f"USE {namespace}")
+
+    _worker.cursor, _worker.namespace = cursor, namespace
+    try:
+        return task()
+    finally:
+        _worker.cursor = _worker.namespace = None
+        free.put(cursor)
+
+
+def _run_query(query: str, params: dict | None, arrow: bool = False) -> pd.DataFrame | pa.Table:
+    conn = get_connection()
+    profiling = is_profiling()
+
+    with profile_step(_query_label(query), 'query') as step:
+        if profiling:
+            # Profilage DuckDB du curseur, le temps de la requête : lignes lues par les scans
+            conn.execute("SET enable_profiling = 'no_output'")
+            conn.execute(f"SET custom_profiling_settings = {quote_literal(json.dumps(DUCKDB_PROFILING_METRICS))}")
+        try:
+            result = conn.execute(query) if params is None else conn.execute(_prepare(conn, query), params)
+            df = result.df() if not arrow else _arrow_result(result.to_arrow_table())
+            if profiling:
+                info = json.loads(conn.get_profiling_information())
+                step.update(rows_scanned=info.get('cumulative_rows_scanned'), query=query, params=params)
+        finally:
+            if profiling:
+                conn.execute("RESET enable_profiling")
+
+        step.update(cache=False, rows_returned=len(df))
+
+    return df
+
+
+def _query_label(query: str) -> str:
+    """
+    Libellé court d'une requête dans le profil : début de la requête sur une ligne
+    """
+    label = ' '.join(query.split())
+    return label if len(label) <= 80 else label[:77] + '...'
+
+
+def _arrow_result(table: pa.Table) -> pa.Table:
+    """
+    Convertit en float64 les colonnes décimales (SUM d'entiers : HUGEINT), comme le fait .df() :
+    Plotly ne sait pas tracer des valeurs Decimal
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+    return table
+
+
+def _prepare(conn: duckdb.DuckDBPyConnection, query: str) -> duckdb.Statement:
+    """
+    Requête analysée une seule fois par connexion (schéma de session) et version des données.
+    L'API Python de DuckDB n'expose pas de PREPARE réutilisable avec paramètres liés :
+    on conserve l'instruction analysée, et les paramètres sont liés à chaque exécution.
+    """
+    namespace = get_namespace()
+    key = (namespace, _data_versions.get(namespace, 0), query)
+    statement = _statements.get(key)
+
+    if statement is None:
+        statement = conn.extract_statements(query)[0]
+        _statements.put(key, statement)
+
+    return statement
+
+
+def _normalize_filters(filters: dict | None) -> tuple:
+    """
+    Forme canonique et hashable des filtres (ou paramètres) : l'ordre des clés
+    et des valeurs sélectionnées est ignoré
+    """
+    if not filters:
+        return ()
+    return tuple(sorted(
+        (key, tuple(sorted(value)) if isinstance(value, (list, tuple, set)) else value)
+        for key, value in filters.items()
+    ))
+
+
+def _result_size(result: Any) -> int:
+    if isinstance(result, dict):
+        return sum(_result_size(df) for df in result.values())
+    if isinstance(result, pa.Table):
+        return result.nbytes
+    return int(result.memory_usage(deep=True).sum())
+
+
+def _drop_view(conn: duckdb.DuckDBPyConnection, name: str) -> None:
+    try:
+        conn.execute(f"DROP VIEW IF EXISTS {name}")
+    except duckdb.CatalogException:
+        # L'objet existant est une table, remplacée par CREATE OR REPLACE TABLE
+        pass
+
+
+def _compact_types(conn: duckdb.DuckDBPyConnection, source: str, columns: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """
+    Choisit le type de stockage de chaque colonne à partir de ses statistiques
+    (min/max des entiers, nombre de valeurs distinctes des textes)
+    """
+    stats = []
+    for name, sql_type in columns:
+        col = quote_identifier(name)
+        if sql_type in ('BIGINT', 'INTEGER', 'SMALLINT'):
+            stats += [f"MIN({col})", f"MAX({col})"]
+        elif sql_type == 'VARCHAR':
+            stats.append(f"COUNT(DISTINCT {col})")
+
+    if not stats:
+        return columns
+
+    values = iter(conn.execute(f"SELECT {', '.join(stats)} FROM {source}").fetchone())
+
+    column_types = []
+    enum_columns = []
+    for name, sql_type in columns:
+        if sql_type in ('BIGINT', 'INTEGER', 'SMALLINT'):
+            min_value, max_value = next(values), next(values)
+            sql_type = _narrowest_integer_type(min_value, max_value, sql_type)
+        elif sql_type == 'VARCHAR' and 0 < next(values) <= ENUM_MAX_CARDINALITY:
+            enum_columns.append(name)
+        column_types.append((name, sql_type))
+
+    if not enum_columns:
+        return column_types
+
+    # Dictionnaire de chaque dimension : valeurs distinctes triées
+    distinct_values = conn.execute(
+        "SELECT " + ", ".join(
+            f"LIST(DISTINCT {quote_identifier(name)} ORDER BY {quote_identifier(name)}) "
+            f"FILTER (WHERE {quote_identifier(name)} IS NOT NULL)"
+            for name in enum_columns
+        ) + f" FROM {source}"
+    ).fetchone()
+    enum_types = {
+        name: "ENUM(" + ", ".join(quote_literal(value) for value in values) + ")"
+        for name, values in zip(enum_columns, distinct_values)
+    }
+
+    return [(name, enum_types.get(name, sql_type)) for name, sql_type in column_types]
+
+
+def _narrowest_integer_type(min_value: int | None, max_value: int | None, sql_type: str) -> str:
+    if min_value is None:
+        return sql_type
+
+    for candidate, lower, upper in INTEGER_TYPES:
+        if lower <= min_value and max_value <= upper:
+            return candidate
+
+    return sql_type
+
+
+def _widened_types(conn: duckdb.DuckDBPyConnection, target: str, delta: str) -> list[tuple[str, str]]:
+    """
+    Colonnes de la table dont le type compact doit être élargi pour accueillir les lignes du delta
+    """
+    target_types = [(row[0], row[1]) for row in conn.execute(f"DESCRIBE {target}").fetchall()]
+
+    stats = []
+    for name, sql_type in target_types:
+        col = quote_identifier(name)
+        if sql_type.startswith('ENUM('):
+            stats.append(f"LIST(DISTINCT CAST({col} AS VARCHAR)) FILTER (WHERE {col} IS NOT NULL)")
+        elif sql_type in ('TINYINT', 'SMALLINT', 'INTEGER'):
+            stats += [f"MIN({col})", f"MAX({col})"]
+
+    if not stats:
+        return []
+
+    values = iter(conn.execute(f"SELECT {', '.join(stats)} FROM {delta}").fetchone())
+    integer_ranks = [name for name, _, _ in INTEGER_TYPES] + ['BIGINT']
+
+    widened = []
+    for name, sql_type in target_types:
+        if sql_type.startswith('ENUM('):
+            current = conn.execute(f"SELECT enum_range(NULL::{sql_type})").fetchone()[0]
+            added = set(next(values) or []) - set(current)
+            if not added:
+                continue
+            merged = sorted([*current, *added])
+            if len(merged) > ENUM_MAX_CARDINALITY:
+                widened.append((name, 'VARCHAR'))
+            else:
+                widened.append((name, "ENUM(" + ", ".join(quote_literal(value) for value in merged) + ")"))
+        elif sql_type in ('TINYINT', 'SMALLINT', 'INTEGER'):
+            min_value, max_value = next(values), next(values)
+            needed = _narrowest_integer_type(min_value, max_value, 'BIGINT')
+            if integer_ranks.index(needed) > integer_ranks.index(sql_type):
+                widened.append((name, needed))
+
+    return widened
@@ -0,0 +1,118 @@
+"""
+Cube de pré-agrégats construit à l'ingestion : sommes et comptages partiels par combinaison
+des dimensions filtrables. Les KPIs s'en déduisent sans relire la table brute, en un temps
+qui ne dépend que du nombre de combinaisons et non du nombre de lignes.
+"""
+from app.database.connection import get_connection, get_table_version, session_cache
+from app.utils.constants import AGGREGATE_CUBE_ENABLED
+
+
+# Requêtes de construction du cube de chaque dataset ({source} : table nettoyée)
+CUBE_QUERIES = {
+    'shopping': """
+        SELECT
+            Category,
+            Season,
+            Gender,
+            Location,
+            "Payment Method",
+            CASE
+                WHEN Age < 25 THEN '18-24'
+                WHEN Age < 35 THEN '25-34'
+                WHEN Age < 45 THEN '35-44'
+                WHEN Age < 55 THEN '45-54'
+                ELSE '55+'
+            END as tranche_age,
+            SUM("Purchase Amount (USD)") as total_ventes,
+            COUNT("Purchase Amount (USD)") as nb_montants,
+            COUNT(*) as nb_lignes
+        FROM {source}
+        GROUP BY ALL
+    """,
+    'airbnb': """
+        SELECT
+            "neighbourhood group",
+            "room type",
+            cancellation_policy,
+            SUM(price) as somme_prix,
+            COUNT(price) as nb_prix,
+            SUM("availability 365") as somme_disponibilite,
+            COUNT("availability 365") as nb_disponibilite,
+            SUM("review rate number") as somme_notes,
+            COUNT("review rate number") as nb_notes,
+            COUNT(*) as nb_logements
+        FROM {source}
+        GROUP BY ALL
+    """,
+}
+
+# Mesures additives de chaque cube : le cube d'un ensemble de lignes est la somme des cubes de ses parties
+CUBE_MEASURES = {
+    'shopping': ['total_ventes', 'nb_montants', 'nb_lignes'],
+    'airbnb': [
+        'somme_prix', 'nb_prix', 'somme_disponibilite', 'nb_disponibilite',
+        'somme_notes', 'nb_notes', 'nb_logements'
+    ],
+}
+
+# Cube de chaque dataset ouvert de la session, indexé par dataset :
+# (version du dataset, table du cube, cube utilisé même hors mode cube).
+# Cache de session : supprimé à la fermeture de la session
+CUBES_CACHE = 'cubes'
+
+
+def build_cube(dataset_type: str, source: str, cube_table: str) -> bool:
+    """
+    Construit le cube du dataset à partir de sa table nettoyée
+
+    Returns:
+        False si le dataset n'a pas de cube (type inconnu)
+    """
+    if dataset_type not in CUBE_QUERIES:
+        return False
+
+    conn = get_connection()
+    conn.execute(f"CREATE OR REPLACE TABLE {cube_table} AS {CUBE_QUERIES[dataset_type].format(source=source)}")
+    return True
+
+
+def update_cube(dataset_type: str, delta_source: str, base_cube: str, cube_table: str) -> None:
+    """
+    Crée le cube de la table complétée : les agrégats partiels du delta sont fusionnés
+    avec ceux du cube de la base, qui n'est pas modifié. Seules les nouvelles lignes sont lues,
+    pas la table complète.
+    """
+    conn = get_connection()
+    measures = ", ".join(f"SUM({name}) AS {name}" for name in CUBE_MEASURES[dataset_type])
+    delta_cube = CUBE_QUERIES[dataset_type].format(source=delta_source)
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {cube_table} AS
+        SELECT * EXCLUDE ({', '.join(CUBE_MEASURES[dataset_type])}), {measures}
+        FROM (SELECT * FROM {base_cube} UNION ALL BY NAME {delta_cube})
+        GROUP BY ALL
+    """)
+
+
+def attach_cube(dataset_type: str, cube_table: str, always: bool = False) -> None:
+    """
+    Associe le cube à la version courante du dataset dans la session.
+    Si le dataset est remplacé ensuite, le cube est ignoré jusqu'au prochain attach_cube.
+
+    Args:
+        always: Cube utilisé même si le mode cube est désactivé (dataset complété en mode ajout)
+    """
+    cube = (get_table_version(dataset_type), cube_table, always)
+    session_cache(CUBES_CACHE, len(CUBE_QUERIES)).put(dataset_type, cube)
+
+
+def get_cube_table(dataset_type: str) -> str | None:
+    """
+    Table du cube à interroger pour ce dataset, ou None si le mode cube est désactivé
+    (sauf pour un dataset complété en mode ajout) ou si le cube ne correspond pas aux données
+    actuellement ouvertes
+    """
+    cube = session_cache(CUBES_CACHE, len(CUBE_QUERIES)).get(dataset_type)
+    if cube is None or cube[0] != get_table_version(dataset_type):
+        return None
+    _, table, always = cube
+    return table if AGGREGATE_CUBE_ENABLED or always else None
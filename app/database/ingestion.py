@@ -0,0 +1,363 @@
+"""
+Ingestion native DuckDB : lecture parallèle du CSV et preprocessing en SQL.
+Alternative au pipeline pandas (pd.read_csv + data_processing.py), même schéma nettoyé.
+Ingestion par blocs : nettoyage pandas bloc par bloc, en mémoire bornée, puis dédoublonnage dans DuckDB
+sur les valeurs brutes du fichier.
+Chaque ingestion dédoublonne selon DEDUP_STRATEGY et retourne le nombre de doublons supprimés.
+"""
+import os
+import tempfile
+from typing import Callable
+
+import pandas as pd
+
+from app.database.connection import get_connection, materialize_table, quote_identifier, quote_literal
+from app.utils.constants import DEDUP_STRATEGY, INGESTION_MEMORY_BUDGET
+from app.utils.data_processing import (
+    convert_airbnb_values,
+    dedup_columns,
+    detect_dataset_type_from_columns,
+    read_options,
+    schema_columns,
+    sniff_csv
+)
+
+
+# Valeurs considérées comme manquantes par pd.read_csv, reprises pour obtenir les mêmes NULL
+PANDAS_NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+
+# Types candidats du sniffer : comme pandas, on ne convertit pas les dates automatiquement
+TYPE_CANDIDATES = ['BOOLEAN', 'BIGINT', 'DOUBLE', 'VARCHAR']
+
+# Colonnes Airbnb réécrites par convert_airbnb_values : leurs valeurs brutes sont conservées dans le staging
+# (préfixe RAW_PREFIX) pour dédoublonner comme le preprocessing, avant nettoyage ("$1,200" et "$1200",
+# NaN et 0 restent distincts)
+CLEANED_COLUMNS = ['price', 'service fee', 'reviews per month']
+RAW_PREFIX = '__brut__'
+
+# Colonnes techniques : position de la ligne dans le fichier (première ligne de chaque clé en stratégie 'key')
+# et nombre de lignes du fichier représentées par chaque ligne dédoublonnée
+POSITION_COLUMN = '__position'
+OCCURRENCES_COLUMN = '__occurrences'
+
+# Facteur entre la taille d'un bloc et le pic mémoire de son traitement
+# (buffers du parseur, copies du nettoyage, conversion vers DuckDB)
+STREAM_MEMORY_FACTOR = 4
+
+
+def ingest_upload(
+    uploaded_file,
+    table_name: str | None = None,
+    dedup_strategy: str = DEDUP_STRATEGY
+) -> tuple[str, int]:
+    """
+    Ingère un fichier téléversé avec DuckDB.
+    Le lecteur CSV de DuckDB travaille sur un fichier : l'upload est écrit
+    dans un fichier temporaire supprimé après l'ingestion.
+
+    Returns:
+        Tuple (type de dataset détecté, nombre de doublons supprimés)
+    """
+    with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as tmp:
+        tmp.write(uploaded_file.getvalue())
+        tmp_path = tmp.name
+
+    try:
+        return ingest_csv(tmp_path, table_name, dedup_strategy)
+    finally:
+        os.remove(tmp_path)
+
+
+def ingest_csv(csv_path: str, table_name: str | None = None, dedup_strategy: str = DEDUP_STRATEGY) -> tuple[str, int]:
+    """
+    Lit le CSV avec le lecteur parallèle de DuckDB, détecte le type de dataset
+    et crée la table nettoyée correspondante, sans passer par pandas.
+
+    Args:
+        csv_path: Chemin du fichier CSV
+        table_name: Table à créer (par défaut, le type de dataset détecté)
+        dedup_strategy: Stratégie de dédoublonnage (cf. DEDUP_STRATEGY)
+
+    Returns:
+        Tuple (type de dataset détecté, nombre de doublons supprimés)
+    """
+    conn = get_connection()
+    source = _read_csv_source(csv_path)
+
+    columns = [row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+    dataset_type = detect_dataset_type_from_columns(columns)
+    columns = schema_columns(dataset_type, columns)
+
+    # Dédoublonnage et nettoyage dans une table temporaire (lignes incomplètes comprises, pour compter
+    # les doublons comme le preprocessing pandas), puis copie typée des lignes complètes dans la table finale
+    staging = f"{dataset_type}__staging"
+    deduplicated = build_dedup_query(source, columns, dataset_type, dedup_strategy)
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE {staging} AS
+        SELECT {_cleaned_select(columns, dataset_type)}, {OCCURRENCES_COLUMN} FROM ({deduplicated})
+    """)
+    try:
+        duplicates_removed = _count_duplicates(conn, staging)
+        materialize_table(f"({_complete_rows(staging, columns, dataset_type)})", table_name or dataset_type)
+    finally:
+        conn.execute(f"DROP TABLE IF EXISTS {staging}")
+
+    return dataset_type, duplicates_removed
+
+
+def ingest_stream(
+    file,
+    table_name: str | None = None,
+    memory_budget: int = INGESTION_MEMORY_BUDGET,
+    on_progress: Callable[[int, int, int], None] | None = None,
+    dedup_strategy: str = DEDUP_STRATEGY
+) -> tuple[str, int]:
+    """
+    Ingère le CSV par blocs de lignes : chaque bloc est converti avec pandas (étapes ligne à ligne
+    du preprocessing) puis ajouté à une table de staging DuckDB. Le dédoublonnage global est fait
+    ensuite par DuckDB, sur les valeurs brutes des colonnes converties et dans l'ordre du fichier,
+    avant la suppression des lignes incomplètes : même résultat que preprocess_airbnb / preprocess_shopping.
+    La taille des blocs est choisie pour que les DataFrames en mémoire restent dans le budget,
+    quelle que soit la taille du fichier.
+
+    Args:
+        file: Fichier CSV ouvert en binaire (upload Streamlit ou fichier local)
+        table_name: Table à créer (par défaut, le type de dataset détecté)
+        memory_budget: Mémoire maximale (en octets) des blocs en cours de traitement
+        on_progress: Appelée après chaque bloc avec (lignes lues, octets lus, taille du fichier)
+        dedup_strategy: Stratégie de dédoublonnage (cf. DEDUP_STRATEGY)
+
+    Returns:
+        Tuple (type de dataset détecté, nombre de doublons supprimés)
+    """
+    conn = get_connection()
+    total_bytes = file.seek(0, os.SEEK_END)
+
+    # En-tête et échantillon : type de dataset, schéma de lecture et taille des blocs
+    dataset_type, sample = sniff_csv(file)
+    options = read_options(dataset_type, sample)
+    chunk_rows = _stream_chunk_rows(sample[options.get('usecols', sample.columns)], memory_budget)
+    del sample
+
+    staging = "stream__staging"
+    deduplicated = "stream__dedoublonne"
+    try:
+        try:
+            n_rows = _stream_chunks(conn, file, staging, dataset_type, chunk_rows, options, on_progress, total_bytes)
+        except ValueError:
+            # Valeur hors du type vu dans l'échantillon : reprise avec l'inférence de pandas
+            file.seek(0)
+            options.pop('dtype', None)
+            n_rows = _stream_chunks(conn, file, staging, dataset_type, chunk_rows, options, on_progress, total_bytes)
+
+        if n_rows == 0:
+            raise ValueError("Le fichier ne contient aucune ligne.")
+
+        # Dédoublonnage global dans DuckDB (valeurs converties et brutes), puis suppression des lignes
+        # incomplètes et copie typée des colonnes du schéma
+        columns = [row[0] for row in conn.execute(f"DESCRIBE {staging}").fetchall() if row[0] != POSITION_COLUMN]
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE {deduplicated} AS
+            {build_dedup_query(staging, columns, dataset_type, dedup_strategy, position=POSITION_COLUMN)}
+        """)
+        conn.execute(f"DROP TABLE {staging}")
+        duplicates_removed = _count_duplicates(conn, deduplicated)
+        materialize_table(
+            f"({_complete_rows(deduplicated, schema_columns(dataset_type, columns), dataset_type)})",
+            table_name or dataset_type
+        )
+    finally:
+        conn.execute(f"DROP TABLE IF EXISTS {staging}")
+        conn.execute(f"DROP TABLE IF EXISTS {deduplicated}")
+
+    return dataset_type, duplicates_removed
+
+
+def build_preprocessing_query(
+    source: str,
+    columns: list[str],
+    dataset_type: str,
+    dedup_strategy: str = DEDUP_STRATEGY
+) -> str:
+    """
+    Traduit en SQL les étapes de preprocess_airbnb / preprocess_shopping.
+
+    Args:
+        source: Expression FROM des données brutes (table, vue ou read_csv)
+        columns: Colonnes présentes dans la source
+        dataset_type: 'airbnb', 'shopping' ou 'unknown'
+        dedup_strategy: Stratégie de dédoublonnage (cf. DEDUP_STRATEGY)
+
+    Returns:
+        Requête SELECT produisant les données nettoyées
+    """
+    # Colonnes du schéma déclaré : les autres ne sont pas parsées (projection du lecteur CSV)
+    columns = schema_columns(dataset_type, columns)
+    deduplicated = build_dedup_query(source, columns, dataset_type, dedup_strategy)
+    return _complete_rows(f"(SELECT {_cleaned_select(columns, dataset_type)} FROM ({deduplicated}))", columns, dataset_type)
+
+
+def build_dedup_query(
+    source: str,
+    columns: list[str],
+    dataset_type: str,
+    dedup_strategy: str = DEDUP_STRATEGY,
+    position: str | None = None
+) -> str:
+    """
+    Traduit en SQL le dédoublonnage du preprocessing (duplicated_rows), avant nettoyage :
+    lignes identiques sur toutes les colonnes ('full_row', 'hash', 'duckdb'), ou première ligne
+    de chaque clé naturelle dans l'ordre du fichier ('key').
+
+    Args:
+        source: Expression FROM des données brutes
+        columns: Colonnes conservées et comparées
+        dataset_type: 'airbnb' ou 'shopping' (clé naturelle de la stratégie 'key')
+        dedup_strategy: Stratégie de dédoublonnage (cf. DEDUP_STRATEGY)
+        position: Colonne de la source donnant l'ordre du fichier (par défaut, l'ordre de lecture)
+
+    Returns:
+        Requête SELECT des lignes conservées, avec OCCURRENCES_COLUMN : nombre de lignes
+        de la source qu'elle représente
+    """
+    select = ", ".join(quote_identifier(col) for col in columns)
+    keys = dedup_columns(columns, dataset_type, dedup_strategy)
+
+    if keys == columns:
+        return f"SELECT {select}, COUNT(*) AS {OCCURRENCES_COLUMN} FROM {source} GROUP BY ALL"
+
+    # Une clé nettoyée par le preprocessing est comparée sur sa valeur brute, comme dans pandas
+    partition = ", ".join(
+        quote_identifier(RAW_PREFIX + key if RAW_PREFIX + key in columns else key) for key in keys
+    )
+    if position is None:
+        source = f"(SELECT *, row_number() OVER () AS {POSITION_COLUMN} FROM {source})"
+        position = POSITION_COLUMN
+    return f"""
+        SELECT {select}, COUNT(*) OVER (PARTITION BY {partition}) AS {OCCURRENCES_COLUMN}
+        FROM {source}
+        QUALIFY row_number() OVER (PARTITION BY {partition} ORDER BY {position}) = 1
+    """
+
+
+def _cleaned_select(columns: list[str], dataset_type: str) -> str:
+    """
+    Liste SELECT des conversions du preprocessing Airbnb (colonnes inchangées pour Shopping)
+    """
+    select = []
+    for col in columns:
+        # Conversion de price et service fee en float, NaN de reviews per month remplacés par 0
+        if dataset_type == 'airbnb' and col in ['price', 'service fee']:
+            select.append(
+                f"CAST(regexp_replace(CAST({quote_identifier(col)} AS VARCHAR), '[$,]', '', 'g') AS DOUBLE) AS {quote_identifier(col)}"
+            )
+        elif dataset_type == 'airbnb' and col == 'reviews per month':
+            select.append('COALESCE("reviews per month", 0) AS "reviews per month"')
+        else:
+            select.append(quote_identifier(col))
+    return ", ".join(select)
+
+
+def _complete_rows(source: str, columns: list[str], dataset_type: str) -> str:
+    """
+    Requête des colonnes du schéma, sans les lignes Airbnb sans price ou neighbourhood group
+    """
+    select = ", ".join(quote_identifier(col) for col in columns)
+    where = 'WHERE price IS NOT NULL AND "neighbourhood group" IS NOT NULL' if dataset_type == 'airbnb' else ''
+    return f"SELECT {select} FROM {source} {where}"
+
+
+def _count_duplicates(conn, deduplicated: str) -> int:
+    """
+    Doublons supprimés : lignes de la source (somme des occurrences) moins lignes conservées
+    """
+    return int(conn.execute(
+        f"SELECT COALESCE(SUM({OCCURRENCES_COLUMN}), 0) - COUNT(*) FROM {deduplicated}"
+    ).fetchone()[0])
+
+
+def _read_csv_source(csv_path: str) -> str:
+    """
+    Expression read_csv alignée sur les conventions de pd.read_csv
+    """
+    na_values = ", ".join(quote_literal(value) for value in PANDAS_NA_VALUES)
+    candidates = ", ".join(quote_literal(value) for value in TYPE_CANDIDATES)
+    return (
+        f"read_csv({quote_literal(csv_path)}, header = true, nullstr = [{na_values}], "
+        f"auto_type_candidates = [{candidates}])"
+    )
+
+
+def _stream_chunks(
+    conn,
+    file,
+    staging: str,
+    dataset_type: str,
+    chunk_rows: int,
+    options: dict,
+    on_progress: Callable[[int, int, int], None] | None,
+    total_bytes: int
+) -> int:
+    """
+    Lit le fichier bloc par bloc et ajoute chaque bloc converti à la table de staging,
+    avec la position de chaque ligne dans le fichier
+
+    Returns:
+        Nombre de lignes lues
+    """
+    conn.execute(f"DROP TABLE IF EXISTS {staging}")
+    n_rows = 0
+
+    for chunk in pd.read_csv(file, chunksize=chunk_rows, **options):
+        chunk[POSITION_COLUMN] = range(n_rows, n_rows + len(chunk))
+        n_rows += len(chunk)
+        if dataset_type == 'airbnb':
+            raw = chunk[[col for col in CLEANED_COLUMNS if col in chunk.columns]].add_prefix(RAW_PREFIX)
+            chunk = convert_airbnb_values(chunk).join(raw)
+            del raw
+        _append_chunk(conn, staging, chunk)
+        del chunk
+
+        if on_progress is not None:
+            on_progress(n_rows, file.tell(), total_bytes)
+
+    return n_rows
+
+
+def _stream_chunk_rows(sample: pd.DataFrame, memory_budget: int) -> int:
+    """
+    Nombre de lignes par bloc, estimé à partir de la mémoire occupée par les lignes de l'échantillon
+    """
+    bytes_per_row = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    return max(1, int(memory_budget / (bytes_per_row * STREAM_MEMORY_FACTOR)))
+
+
+def _append_chunk(conn, staging: str, chunk: pd.DataFrame) -> None:
+    """
+    Ajoute un bloc à la table de staging. Le type d'une colonne peut varier d'un bloc
+    à l'autre (entiers puis décimaux, nombres puis texte) : la colonne est alors élargie.
+    """
+    conn.register('stream__chunk', chunk)
+    try:
+        if not conn.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE temporary AND table_name = ?", [staging]
+        ).fetchone()[0]:
+            conn.execute(f"CREATE TEMP TABLE {staging} AS SELECT * FROM stream__chunk")
+            return
+
+        staged_types = dict(conn.execute(f"SELECT column_name, column_type FROM (DESCRIBE {staging})").fetchall())
+        for name, chunk_type in conn.execute("SELECT column_name, column_type FROM (DESCRIBE stream__chunk)").fetchall():
+            staged_type = staged_types[name]
+            # Une colonne entièrement vide dans ce bloc ne renseigne pas sur son type
+            if chunk_type == staged_type or chunk[name].isna().all():
+                continue
+            widened = 'DOUBLE' if {chunk_type, staged_type} <= {'BIGINT', 'DOUBLE'} else 'VARCHAR'
+            if widened != staged_type:
+                conn.execute(f"ALTER TABLE {staging} ALTER {quote_identifier(name)} TYPE {widened}")
+
+        conn.execute(f"INSERT INTO {staging} BY NAME SELECT * FROM stream__chunk")
+    finally:
+        conn.unregister('stream__chunk')
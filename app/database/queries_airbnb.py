@@ -1,125 +1,375 @@
 
 import pandas as pd
-from app.database.connection import execute_query
+import pyarrow as pa
+from app.database.connection import (
+    cached_result,
+    execute_query,
+    filter_conditions,
+    filter_params,
+    get_connection,
+    get_table_version,
+    run_concurrently,
+    session_cache
+)
+from app.database.cube import get_cube_table
+from app.utils.cache import LRUCache
+from app.utils.constants import APPROXIMATE_KPIS_ENABLED, APPROXIMATE_MIN_ROWS, APPROXIMATE_SAMPLE_ROWS
+
+
+# Options de filtres de la session, par version de la table (version courante et précédente,
+# cf. merge_filter_options) : un cache par session, les sessions ne s'évincent pas entre elles
+FILTER_OPTIONS_CACHE = 'airbnb_filter_options'
+FILTER_OPTIONS_MAX_ENTRIES = 4
+
+# Colonne filtrée (table brute ou cube) par chaque filtre de valeurs du dashboard
+FILTER_COLUMNS = {
+    'neighbourhood': '"neighbourhood group"',
+    'room_type': '"room type"',
+    'cancellation_policy': 'cancellation_policy',
+}
+
+# Bornes du filtre de prix (table brute seulement : le prix n'est pas une dimension du cube)
+PRICE_BOUNDS = {'price_min': 'price >= $price_min', 'price_max': 'price <= $price_max'}
+
+# Quantile de la loi normale pour les intervalles de confiance à 95 % des estimations
+Z_95 = 1.96
 
 
 def get_filter_options() -> dict:
     """
-    Retourne les valeurs uniques pour les filtres
+    Retourne les valeurs uniques pour les filtres, avec le nombre de lignes par valeur.
+    Calculées en une seule requête puis mises en cache jusqu'au prochain changement de la table.
     """
-    neighbourhoods = execute_query(
-        'SELECT DISTINCT "neighbourhood group" FROM airbnb ORDER BY "neighbourhood group"'
-    )
-    room_types = execute_query(
-        'SELECT DISTINCT "room type" FROM airbnb ORDER BY "room type"'
-    )
-    cancellation = execute_query(
-        'SELECT DISTINCT cancellation_policy FROM airbnb WHERE cancellation_policy IS NOT NULL ORDER BY cancellation_policy'
-    )
+    version = get_table_version('airbnb')
+    options = _filter_options_cache().get(version)
 
-    return {
-        'neighbourhoods': neighbourhoods['neighbourhood group'].tolist(),
-        'room_types': room_types['room type'].tolist(),
-        'cancellation_policies': cancellation['cancellation_policy'].tolist()
+    if options is None:
+        options = _filter_options(_filter_counts('airbnb'))
+        _filter_options_cache().put(version, options)
+
+    return options
+
+
+def merge_filter_options(previous_version: int, delta_source: str) -> None:
+    """
+    Mode ajout : options de filtres de la table complétée, déduites de celles de sa version
+    précédente (si elles sont en cache) et des comptages du delta seul, sans relire la table complète
+
+    Args:
+        previous_version: Version de la table avant l'ouverture du dataset complété
+        delta_source: Expression FROM des lignes ajoutées
+    """
+    previous = _filter_options_cache().get(previous_version)
+    if previous is None:
+        return
+
+    delta = _filter_counts(delta_source)
+    counts = {
+        key: dict(sorted({
+            value: values.get(value, 0) + delta[key].get(value, 0) for value in {*values, *delta[key]}
+        }.items()))
+        for key, values in previous['counts'].items()
     }
+    _filter_options_cache().put(get_table_version('airbnb'), _filter_options(counts))
+
+
+def _filter_options_cache() -> LRUCache:
+    """
+    Cache des options de filtres de la session courante
+    """
+    return session_cache(FILTER_OPTIONS_CACHE, FILTER_OPTIONS_MAX_ENTRIES)
+
+
+def _filter_counts(source: str) -> dict[str, dict]:
+    """
+    Nombre de lignes par valeur de chaque filtre, en une requête
+    """
+    histograms = get_connection().execute(f"""
+        SELECT histogram("neighbourhood group"), histogram("room type"), histogram(cancellation_policy)
+        FROM {source}
+    """).fetchone()
+    keys = ['neighbourhoods', 'room_types', 'cancellation_policies']
+    # Delta vide : histogram() retourne NULL
+    return {key: dict(sorted((histogram or {}).items())) for key, histogram in zip(keys, histograms)}
 
 
-def get_avg_price_by_neighbourhood(filters: dict = None) -> pd.DataFrame:
+def _filter_options(counts: dict[str, dict]) -> dict:
+    """
+    Options de filtres (valeurs triées) et leurs comptages
+    """
+    options = {key: list(values) for key, values in counts.items()}
+    options['counts'] = counts
+    return options
+
+
+def get_avg_price_by_neighbourhood(filters: dict = None, arrow: bool = False) -> pd.DataFrame | pa.Table:
     """
     Prix moyen par quartier
     """
-    where_clause = _build_where_clause(filters)
+    cube = _get_cube(filters)
+    if cube is not None:
+        query = f"""
+            SELECT
+                "neighbourhood group" as quartier,
+                ROUND(SUM(somme_prix) / NULLIF(SUM(nb_prix), 0), 2) as prix_moyen
+            FROM {cube}
+            {_where_clause(filters, with_price=False)}
+            GROUP BY "neighbourhood group"
+            ORDER BY prix_moyen DESC
+        """
+        return execute_query(query, _build_params(filters, with_price=False), arrow=arrow)
+
     query = f"""
         SELECT 
             "neighbourhood group" as quartier,
             ROUND(AVG(price), 2) as prix_moyen
         FROM airbnb
-        {where_clause}
+        {_where_clause(filters)}
         GROUP BY "neighbourhood group"
         ORDER BY prix_moyen DESC
     """
-    return execute_query(query)
+    return execute_query(query, _build_params(filters), arrow=arrow)
 
 
-def get_room_type_distribution(filters: dict = None) -> pd.DataFrame:
+def get_room_type_distribution(filters: dict = None, arrow: bool = False) -> pd.DataFrame | pa.Table:
     """
     Distribution des types de logement
     """
-    where_clause = _build_where_clause(filters)
+    cube = _get_cube(filters)
+    if cube is not None:
+        query = f"""
+            SELECT
+                "room type" as type_logement,
+                SUM(nb_logements)::BIGINT as nb_logements
+            FROM {cube}
+            {_where_clause(filters, with_price=False)}
+            GROUP BY "room type"
+            ORDER BY nb_logements DESC
+        """
+        return execute_query(query, _build_params(filters, with_price=False), arrow=arrow)
+
     query = f"""
         SELECT 
             "room type" as type_logement,
             COUNT(*) as nb_logements
         FROM airbnb
-        {where_clause}
+        {_where_clause(filters)}
         GROUP BY "room type"
         ORDER BY nb_logements DESC
     """
-    return execute_query(query)
+    return execute_query(query, _build_params(filters), arrow=arrow)
 
 
-def get_avg_availability_by_neighbourhood(filters: dict = None) -> pd.DataFrame:
+def get_avg_availability_by_neighbourhood(filters: dict = None, arrow: bool = False) -> pd.DataFrame | pa.Table:
     """
     Disponibilité moyenne par quartier
     """
-    where_clause = _build_where_clause(filters)
+    cube = _get_cube(filters)
+    if cube is not None:
+        query = f"""
+            SELECT
+                "neighbourhood group" as quartier,
+                ROUND(SUM(somme_disponibilite) / NULLIF(SUM(nb_disponibilite), 0), 0) as disponibilite_moyenne
+            FROM {cube}
+            {_where_clause(filters, with_price=False)}
+            GROUP BY "neighbourhood group"
+            ORDER BY disponibilite_moyenne DESC
+        """
+        return execute_query(query, _build_params(filters, with_price=False), arrow=arrow)
+
     query = f"""
         SELECT 
             "neighbourhood group" as quartier,
             ROUND(AVG("availability 365"), 0) as disponibilite_moyenne
         FROM airbnb
-        {where_clause}
+        {_where_clause(filters)}
         GROUP BY "neighbourhood group"
         ORDER BY disponibilite_moyenne DESC
     """
-    return execute_query(query)
+    return execute_query(query, _build_params(filters), arrow=arrow)
 
 
-def get_avg_rating_by_room_type(filters: dict = None) -> pd.DataFrame:
+def get_avg_rating_by_room_type(filters: dict = None, arrow: bool = False) -> pd.DataFrame | pa.Table:
     """
     Note moyenne par type de logement
     """
-    where_clause = _build_where_clause(filters)
+    cube = _get_cube(filters)
+    if cube is not None:
+        query = f"""
+            SELECT
+                "room type" as type_logement,
+                ROUND(SUM(somme_notes) / NULLIF(SUM(nb_notes), 0), 2) as note_moyenne
+            FROM {cube}
+            {_where_clause(filters, with_price=False)}
+            GROUP BY "room type"
+            ORDER BY note_moyenne DESC
+        """
+        return execute_query(query, _build_params(filters, with_price=False), arrow=arrow)
+
     query = f"""
         SELECT 
             "room type" as type_logement,
             ROUND(AVG("review rate number"), 2) as note_moyenne
         FROM airbnb
-        {where_clause}
+        {_where_clause(filters)}
         GROUP BY "room type"
         ORDER BY note_moyenne DESC
     """
-    return execute_query(query)
+    return execute_query(query, _build_params(filters), arrow=arrow)
+
+
+def get_dashboard_kpis(filters: dict = None) -> dict[str, pd.DataFrame]:
+    """
+    Calcule les 4 KPIs du dashboard en un seul parcours de la table (GROUPING SETS).
+    Retourne les mêmes DataFrames que les 4 fonctions get_* ci-dessus, indexés par KPI.
+    En mode cube, les 4 requêtes lisent le cube de pré-agrégats, en même temps : le parcours groupé est inutile.
+    """
+    if _get_cube(filters) is not None:
+        return dict(run_concurrently({
+            'avg_price_by_neighbourhood': lambda: get_avg_price_by_neighbourhood(filters),
+            'room_type_distribution': lambda: get_room_type_distribution(filters),
+            'avg_availability_by_neighbourhood': lambda: get_avg_availability_by_neighbourhood(filters),
+            'avg_rating_by_room_type': lambda: get_avg_rating_by_room_type(filters),
+        }))
+
+    return cached_result('airbnb_dashboard', filters, lambda: _compute_dashboard_kpis(filters))
+
+
+def _compute_dashboard_kpis(filters: dict = None) -> dict[str, pd.DataFrame]:
+    query = f"""
+        SELECT
+            GROUPING("neighbourhood group") = 0 as par_quartier,
+            "neighbourhood group" as quartier,
+            "room type" as type_logement,
+            ROUND(AVG(price), 2) as prix_moyen,
+            ROUND(AVG("availability 365"), 0) as disponibilite_moyenne,
+            COUNT(*) as nb_logements,
+            ROUND(AVG("review rate number"), 2) as note_moyenne
+        FROM airbnb
+        {_where_clause(filters)}
+        GROUP BY GROUPING SETS (("neighbourhood group"), ("room type"))
+    """
+    # Le résultat découpé est mis en cache par cached_result, pas la requête brute
+    df = execute_query(query, _build_params(filters), use_cache=False)
+    by_neighbourhood = df[df['par_quartier']]
+    by_room_type = df[~df['par_quartier']]
+
+    return {
+        'avg_price_by_neighbourhood': _split_kpi(by_neighbourhood, ['quartier', 'prix_moyen']),
+        'room_type_distribution': _split_kpi(by_room_type, ['type_logement', 'nb_logements']),
+        'avg_availability_by_neighbourhood': _split_kpi(by_neighbourhood, ['quartier', 'disponibilite_moyenne']),
+        'avg_rating_by_room_type': _split_kpi(by_room_type, ['type_logement', 'note_moyenne']),
+    }
+
+
+def get_dashboard_estimates(filters: dict = None) -> dict[str, pd.DataFrame] | None:
+    """
+    Estime les 4 KPIs du dashboard sur un échantillon d'environ APPROXIMATE_SAMPLE_ROWS lignes,
+    en un seul parcours de l'échantillon. Chaque DataFrame a les colonnes du KPI exact,
+    plus 'marge' : demi-largeur de l'intervalle de confiance à 95 % de la valeur.
+
+    Retourne None quand les requêtes exactes sont assez rapides pour être attendues :
+    mode désactivé, table sous APPROXIMATE_MIN_ROWS lignes ou KPIs lus dans le cube.
+    """
+    if not APPROXIMATE_KPIS_ENABLED or _get_cube(filters) is not None:
+        return None
+
+    total_rows = int(execute_query("SELECT COUNT(*) AS nb_lignes FROM airbnb")['nb_lignes'].iloc[0])
+    if total_rows < APPROXIMATE_MIN_ROWS:
+        return None
+
+    fraction = min(1.0, APPROXIMATE_SAMPLE_ROWS / total_rows)
+    return cached_result('airbnb_estimates', filters, lambda: _compute_dashboard_estimates(filters, fraction))
+
+
+def _compute_dashboard_estimates(filters: dict | None, fraction: float) -> dict[str, pd.DataFrame]:
+    """
+    Échantillonnage 'bernoulli' de DuckDB : chaque ligne est tirée indépendamment avec la
+    probabilité fraction. La table est parcourue, mais les agrégats ne portent que sur l'échantillon.
+    Contrairement au tirage de blocs ('system'), l'ordre du fichier (trié par quartier, par date…)
+    n'affecte pas la précision, et le tirage reste valide sur les vues du catalogue et du mode ajout.
+
+    Une moyenne a pour marge Z_95 * racine(1 - fraction) * écart-type / racine(n), avec l'écart-type
+    corrigé de l'échantillon (n - 1). Un nombre de logements est extrapolé (n / fraction),
+    avec la marge d'un tirage de Bernoulli : Z_95 * racine(n * (1 - fraction)) / fraction.
+    """
+    query = f"""
+        SELECT
+            GROUPING("neighbourhood group") = 0 as par_quartier,
+            "neighbourhood group" as quartier,
+            "room type" as type_logement,
+            ROUND(AVG(price), 2) as prix_moyen,
+            ROUND({Z_95} * SQRT((1 - $fraction) / COUNT(price)) * STDDEV_SAMP(price), 2) as marge_prix,
+            ROUND(AVG("availability 365"), 0) as disponibilite_moyenne,
+            ROUND({Z_95} * SQRT((1 - $fraction) / COUNT("availability 365")) * STDDEV_SAMP("availability 365"), 0)
+                as marge_disponibilite,
+            ROUND(COUNT(*) / $fraction)::BIGINT as nb_logements,
+            ROUND({Z_95} * SQRT(COUNT(*) * (1 - $fraction)) / $fraction)::BIGINT as marge_logements,
+            ROUND(AVG("review rate number"), 2) as note_moyenne,
+            ROUND({Z_95} * SQRT((1 - $fraction) / COUNT("review rate number")) * STDDEV_SAMP("review rate number"), 2)
+                as marge_notes
+        FROM (SELECT * FROM airbnb TABLESAMPLE {fraction * 100:.6f}% (bernoulli))
+        {_where_clause(filters)}
+        GROUP BY GROUPING SETS (("neighbourhood group"), ("room type"))
+    """
+    df = execute_query(query, {**_build_params(filters), 'fraction': fraction}, use_cache=False)
+    by_neighbourhood = df[df['par_quartier']]
+    by_room_type = df[~df['par_quartier']]
+
+    return {
+        'avg_price_by_neighbourhood': _split_estimate(by_neighbourhood, ['quartier', 'prix_moyen'], 'marge_prix'),
+        'room_type_distribution': _split_estimate(by_room_type, ['type_logement', 'nb_logements'], 'marge_logements'),
+        'avg_availability_by_neighbourhood': _split_estimate(by_neighbourhood, ['quartier', 'disponibilite_moyenne'], 'marge_disponibilite'),
+        'avg_rating_by_room_type': _split_estimate(by_room_type, ['type_logement', 'note_moyenne'], 'marge_notes'),
+    }
 
 
-def _build_where_clause(filters: dict = None) -> str:
+def _split_estimate(df: pd.DataFrame, columns: list[str], margin: str) -> pd.DataFrame:
     """
-    Construit la clause WHERE à partir des filtres.
+    Comme _split_kpi, avec la marge de la valeur estimée renommée en 'marge'
     """
-    if not filters:
-        return ""
+    kpi = _split_kpi(df, [*columns, margin])
+    return kpi.rename(columns={margin: 'marge'})
 
-    conditions = []
 
-    if filters.get('neighbourhood'):
-        neighbourhoods = "', '".join(filters['neighbourhood'])
-        conditions.append(f"\"neighbourhood group\" IN ('{neighbourhoods}')")
+def _split_kpi(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    """
+    Extrait les colonnes d'un KPI, triées par valeur décroissante comme sa requête dédiée
+    """
+    return (
+        df[columns]
+        .sort_values(columns[-1], ascending=False, kind='stable')
+        .reset_index(drop=True)
+    )
 
-    if filters.get('room_type'):
-        room_types = "', '".join(filters['room_type'])
-        conditions.append(f"\"room type\" IN ('{room_types}')")
 
-    if filters.get('cancellation_policy'):
-        policies = "', '".join(filters['cancellation_policy'])
-        conditions.append(f"cancellation_policy IN ('{policies}')")
+def _get_cube(filters: dict = None) -> str | None:
+    """
+    Table du cube si le mode cube est actif et sans filtre de prix :
+    le prix n'étant pas une dimension du cube, ces requêtes lisent la table brute
+    """
+    filters = filters or {}
+    if filters.get('price_min') is not None or filters.get('price_max') is not None:
+        return None
+    return get_cube_table('airbnb')
 
-    if filters.get('price_min') is not None:
-        conditions.append(f"price >= {filters['price_min']}")
 
-    if filters.get('price_max') is not None:
-        conditions.append(f"price <= {filters['price_max']}")
+def _where_clause(filters: dict = None, with_price: bool = True) -> str:
+    """
+    Clause WHERE paramétrée des filtres renseignés (vide sans filtre), sans le prix pour le cube
+    """
+    conditions = filter_conditions(filters, FILTER_COLUMNS)
+    if with_price:
+        conditions += [condition for name, condition in PRICE_BOUNDS.items() if (filters or {}).get(name) is not None]
+    return "WHERE " + " AND ".join(conditions) if conditions else ""
 
-    if conditions:
-        return "WHERE " + " AND ".join(conditions)
 
-    return ""
+def _build_params(filters: dict = None, with_price: bool = True) -> dict:
+    """
+    Valeurs des paramètres de _where_clause à partir des filtres
+    """
+    filters = filters or {}
+    params = filter_params(filters, FILTER_COLUMNS)
+    if with_price:
+        params.update({name: filters[name] for name in PRICE_BOUNDS if filters.get(name) is not None})
+    return params
@@ -3,32 +3,85 @@ Requêtes SQL pour Customer Shopping Behavior
 KPIs: Ventes par catégorie, Genre/Saison, Panier moyen par âge, Méthodes de paiement
 """
 import pandas as pd
-from app.database.connection import execute_query
+import pyarrow as pa
+from app.database.connection import (
+    cached_result,
+    execute_query,
+    filter_conditions,
+    filter_params,
+    get_connection,
+    get_table_version,
+    run_concurrently,
+    session_cache
+)
+from app.database.cube import get_cube_table
+from app.utils.cache import LRUCache
 
 
-def get_sales_by_category(filters: dict = None) -> pd.DataFrame:
+# Options de filtres de la session, par version de la table (version courante et précédente,
+# cf. merge_filter_options) : un cache par session, les sessions ne s'évincent pas entre elles
+FILTER_OPTIONS_CACHE = 'shopping_filter_options'
+FILTER_OPTIONS_MAX_ENTRIES = 4
+
+# Colonne filtrée (table brute ou cube) par chaque filtre du dashboard
+FILTER_COLUMNS = {
+    'location': 'Location',
+    'category': 'Category',
+    'season': 'Season',
+    'gender': 'Gender',
+}
+
+
+def get_sales_by_category(filters: dict = None, arrow: bool = False) -> pd.DataFrame | pa.Table:
     """
     Total des ventes par catégorie de produit
     """
-    where_clause = _build_where_clause(filters)
+    cube = get_cube_table('shopping')
+    if cube is not None:
+        query = f"""
+            SELECT
+                Category as categorie,
+                SUM(total_ventes) as total_ventes,
+                SUM(nb_lignes)::BIGINT as nb_transactions
+            FROM {cube}
+            {_where_clause(filters)}
+            GROUP BY Category
+            ORDER BY total_ventes DESC
+        """
+        return execute_query(query, _build_params(filters), arrow=arrow)
+
     query = f"""
         SELECT
             Category as categorie,
             SUM("Purchase Amount (USD)") as total_ventes,
             COUNT(*) as nb_transactions
         FROM shopping
-        {where_clause}
+        {_where_clause(filters)}
         GROUP BY Category
         ORDER BY total_ventes DESC
     """
-    return execute_query(query)
+    return execute_query(query, _build_params(filters), arrow=arrow)
 
 
-def get_sales_by_gender_season(filters: dict = None) -> pd.DataFrame:
+def get_sales_by_gender_season(filters: dict = None, arrow: bool = False) -> pd.DataFrame | pa.Table:
     """
     Ventes par genre et par saison
     """
-    where_clause = _build_where_clause(filters)
+    cube = get_cube_table('shopping')
+    if cube is not None:
+        query = f"""
+            SELECT
+                Gender as genre,
+                Season as saison,
+                SUM(total_ventes) as total_ventes,
+                SUM(nb_lignes)::BIGINT as nb_transactions
+            FROM {cube}
+            {_where_clause(filters)}
+            GROUP BY Gender, Season
+            ORDER BY genre, saison
+        """
+        return execute_query(query, _build_params(filters), arrow=arrow)
+
     query = f"""
         SELECT
             Gender as genre,
@@ -36,18 +89,31 @@ def get_sales_by_gender_season(filters: dict = None) -> pd.DataFrame:
             SUM("Purchase Amount (USD)") as total_ventes,
             COUNT(*) as nb_transactions
         FROM shopping
-        {where_clause}
+        {_where_clause(filters)}
         GROUP BY Gender, Season
         ORDER BY genre, saison
     """
-    return execute_query(query)
+    return execute_query(query, _build_params(filters), arrow=arrow)
 
 
-def get_avg_basket_by_age(filters: dict = None) -> pd.DataFrame:
+def get_avg_basket_by_age(filters: dict = None, arrow: bool = False) -> pd.DataFrame | pa.Table:
     """
     Panier moyen par tranche d'âge
     """
-    where_clause = _build_where_clause(filters)
+    cube = get_cube_table('shopping')
+    if cube is not None:
+        query = f"""
+            SELECT
+                tranche_age,
+                ROUND(SUM(total_ventes) / NULLIF(SUM(nb_montants), 0), 2) as panier_moyen,
+                SUM(nb_lignes)::BIGINT as nb_clients
+            FROM {cube}
+            {_where_clause(filters)}
+            GROUP BY tranche_age
+            ORDER BY tranche_age
+        """
+        return execute_query(query, _build_params(filters), arrow=arrow)
+
     query = f"""
         SELECT
             CASE
@@ -60,74 +126,207 @@ def get_avg_basket_by_age(filters: dict = None) -> pd.DataFrame:
             ROUND(AVG("Purchase Amount (USD)"), 2) as panier_moyen,
             COUNT(*) as nb_clients
         FROM shopping
-        {where_clause}
+        {_where_clause(filters)}
         GROUP BY tranche_age
         ORDER BY tranche_age
     """
-    return execute_query(query)
+    return execute_query(query, _build_params(filters), arrow=arrow)
 
 
-def get_payment_methods(filters: dict = None) -> pd.DataFrame:
+def get_payment_methods(filters: dict = None, arrow: bool = False) -> pd.DataFrame | pa.Table:
     """
     Répartition des méthodes de paiement
     """
-    where_clause = _build_where_clause(filters)
+    cube = get_cube_table('shopping')
+    if cube is not None:
+        query = f"""
+            SELECT
+                "Payment Method" as methode_paiement,
+                SUM(nb_lignes)::BIGINT as nb_transactions,
+                ROUND(SUM(nb_lignes) * 100.0 / SUM(SUM(nb_lignes)) OVER(), 2) as pourcentage
+            FROM {cube}
+            {_where_clause(filters)}
+            GROUP BY "Payment Method"
+            ORDER BY nb_transactions DESC
+        """
+        return execute_query(query, _build_params(filters), arrow=arrow)
+
     query = f"""
         SELECT
             "Payment Method" as methode_paiement,
             COUNT(*) as nb_transactions,
             ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER(), 2) as pourcentage
         FROM shopping
-        {where_clause}
+        {_where_clause(filters)}
         GROUP BY "Payment Method"
         ORDER BY nb_transactions DESC
     """
-    return execute_query(query)
+    return execute_query(query, _build_params(filters), arrow=arrow)
 
 
-def get_filter_options() -> dict:
+def get_dashboard_kpis(filters: dict = None) -> dict[str, pd.DataFrame]:
     """
-    Retourne les valeurs uniques pour les filtres
+    Calcule les 4 KPIs du dashboard en un seul parcours de la table (GROUPING SETS).
+    Retourne les mêmes DataFrames que les 4 fonctions get_* ci-dessus, indexés par KPI.
+    En mode cube, les 4 requêtes lisent le cube de pré-agrégats, en même temps : le parcours groupé est inutile.
     """
-    locations = execute_query("SELECT DISTINCT Location FROM shopping ORDER BY Location")
-    categories = execute_query("SELECT DISTINCT Category FROM shopping ORDER BY Category")
-    seasons = execute_query("SELECT DISTINCT Season FROM shopping ORDER BY Season")
-    genders = execute_query("SELECT DISTINCT Gender FROM shopping ORDER BY Gender")
+    if get_cube_table('shopping') is not None:
+        return dict(run_concurrently({
+            'sales_by_category': lambda: get_sales_by_category(filters),
+            'sales_by_gender_season': lambda: get_sales_by_gender_season(filters),
+            'avg_basket_by_age': lambda: get_avg_basket_by_age(filters),
+            'payment_methods': lambda: get_payment_methods(filters),
+        }))
+
+    return cached_result('shopping_dashboard', filters, lambda: _compute_dashboard_kpis(filters))
+
+
+def _compute_dashboard_kpis(filters: dict = None) -> dict[str, pd.DataFrame]:
+    query = f"""
+        SELECT
+            CASE
+                WHEN GROUPING(Category) = 0 THEN 'sales_by_category'
+                WHEN GROUPING(Gender) = 0 THEN 'sales_by_gender_season'
+                WHEN GROUPING(tranche_age) = 0 THEN 'avg_basket_by_age'
+                ELSE 'payment_methods'
+            END as kpi,
+            Category as categorie,
+            Gender as genre,
+            Season as saison,
+            tranche_age,
+            "Payment Method" as methode_paiement,
+            SUM("Purchase Amount (USD)") as total_ventes,
+            ROUND(AVG("Purchase Amount (USD)"), 2) as panier_moyen,
+            COUNT(*) as nb_transactions,
+            ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER(
+                PARTITION BY GROUPING_ID(Category, Gender, Season, tranche_age, "Payment Method")
+            ), 2) as pourcentage
+        FROM (
+            SELECT
+                *,
+                CASE
+                    WHEN Age < 25 THEN '18-24'
+                    WHEN Age < 35 THEN '25-34'
+                    WHEN Age < 45 THEN '35-44'
+                    WHEN Age < 55 THEN '45-54'
+                    ELSE '55+'
+                END as tranche_age
+            FROM shopping
+            {_where_clause(filters)}
+        )
+        GROUP BY GROUPING SETS ((Category), (Gender, Season), (tranche_age), ("Payment Method"))
+    """
+    # Le résultat découpé est mis en cache par cached_result, pas la requête brute
+    df = execute_query(query, _build_params(filters), use_cache=False)
 
     return {
-        'locations': locations['Location'].tolist(),
-        'categories': categories['Category'].tolist(),
-        'seasons': seasons['Season'].tolist(),
-        'genders': genders['Gender'].tolist()
+        'sales_by_category': _split_kpi(
+            df, 'sales_by_category', ['categorie', 'total_ventes', 'nb_transactions'],
+            sort_by='total_ventes', ascending=False
+        ),
+        'sales_by_gender_season': _split_kpi(
+            df, 'sales_by_gender_season', ['genre', 'saison', 'total_ventes', 'nb_transactions'],
+            sort_by=['genre', 'saison']
+        ),
+        'avg_basket_by_age': _split_kpi(
+            df, 'avg_basket_by_age', ['tranche_age', 'panier_moyen', 'nb_transactions'],
+            sort_by='tranche_age'
+        ).rename(columns={'nb_transactions': 'nb_clients'}),
+        'payment_methods': _split_kpi(
+            df, 'payment_methods', ['methode_paiement', 'nb_transactions', 'pourcentage'],
+            sort_by='nb_transactions', ascending=False
+        ),
     }
 
 
-def _build_where_clause(filters: dict = None) -> str:
+def get_filter_options() -> dict:
     """
-    Construit la clause WHERE à partir des filtres
+    Retourne les valeurs uniques pour les filtres, avec le nombre de lignes par valeur.
+    Calculées en une seule requête puis mises en cache jusqu'au prochain changement de la table.
     """
-    if not filters:
-        return ""
+    version = get_table_version('shopping')
+    options = _filter_options_cache().get(version)
 
-    conditions = []
+    if options is None:
+        options = _filter_options(_filter_counts('shopping'))
+        _filter_options_cache().put(version, options)
 
-    if filters.get('location'):
-        locations = "', '".join(filters['location'])
-        conditions.append(f"Location IN ('{locations}')")
+    return options
 
-    if filters.get('category'):
-        categories = "', '".join(filters['category'])
-        conditions.append(f"Category IN ('{categories}')")
 
-    if filters.get('season'):
-        seasons = "', '".join(filters['season'])
-        conditions.append(f"Season IN ('{seasons}')")
+def merge_filter_options(previous_version: int, delta_source: str) -> None:
+    """
+    Mode ajout : options de filtres de la table complétée, déduites de celles de sa version
+    précédente (si elles sont en cache) et des comptages du delta seul, sans relire la table complète
 
-    if filters.get('gender'):
-        genders = "', '".join(filters['gender'])
-        conditions.append(f"Gender IN ('{genders}')")
+    Args:
+        previous_version: Version de la table avant l'ouverture du dataset complété
+        delta_source: Expression FROM des lignes ajoutées
+    """
+    previous = _filter_options_cache().get(previous_version)
+    if previous is None:
+        return
+
+    delta = _filter_counts(delta_source)
+    counts = {
+        key: dict(sorted({
+            value: values.get(value, 0) + delta[key].get(value, 0) for value in {*values, *delta[key]}
+        }.items()))
+        for key, values in previous['counts'].items()
+    }
+    _filter_options_cache().put(get_table_version('shopping'), _filter_options(counts))
+
+
+def _filter_options_cache() -> LRUCache:
+    """
+    Cache des options de filtres de la session courante
+    """
+    return session_cache(FILTER_OPTIONS_CACHE, FILTER_OPTIONS_MAX_ENTRIES)
+
+
+def _filter_counts(source: str) -> dict[str, dict]:
+    """
+    Nombre de lignes par valeur de chaque filtre, en une requête
+    """
+    histograms = get_connection().execute(f"""
+        SELECT histogram(Location), histogram(Category), histogram(Season), histogram(Gender)
+        FROM {source}
+    """).fetchone()
+    keys = ['locations', 'categories', 'seasons', 'genders']
+    # Delta vide : histogram() retourne NULL
+    return {key: dict(sorted((histogram or {}).items())) for key, histogram in zip(keys, histograms)}
+
+
+def _filter_options(counts: dict[str, dict]) -> dict:
+    """
+    Options de filtres (valeurs triées) et leurs comptages
+    """
+    options = {key: list(values) for key, values in counts.items()}
+    options['counts'] = counts
+    return options
+
+
+def _split_kpi(df: pd.DataFrame, kpi: str, columns: list[str], sort_by, ascending: bool = True) -> pd.DataFrame:
+    """
+    Extrait du résultat GROUPING SETS les lignes et colonnes d'un KPI, triées comme sa requête dédiée
+    """
+    return (
+        df.loc[df['kpi'] == kpi, columns]
+        .sort_values(sort_by, ascending=ascending, kind='stable')
+        .reset_index(drop=True)
+    )
 
-    if conditions:
-        return "WHERE " + " AND ".join(conditions)
 
-    return ""
+def _where_clause(filters: dict = None) -> str:
+    """
+    Clause WHERE paramétrée des filtres renseignés (vide sans filtre)
+    """
+    conditions = filter_conditions(filters, FILTER_COLUMNS)
+    return "WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def _build_params(filters: dict = None) -> dict:
+    """
+    Valeurs des paramètres de _where_clause à partir des filtres
+    """
+    return filter_params(filters, FILTER_COLUMNS)
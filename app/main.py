@@ -1,6 +1,11 @@
 """
 Application streamlit
 """
+import time
+
+# Début du script : le premier rerun du processus mesure le démarrage, imports compris
+_script_started = time.perf_counter()
+
 import streamlit as st
 
 import sys
@@ -11,8 +16,12 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.components.file_uploader import render_file_uploader
 from app.components.sidebar import render_sidebar_filters
-from app.visualizations.chart_shopping import render_shopping_dashboard
-from app.visualizations.chart_airbnb import render_airbnb_dashboard
+from app.utils.constants import PROFILING_LOG_PATH, STARTUP_LOG_PATH
+from app.utils.lazy_loading import load_dashboard, record_startup, start_warmup
+from app.utils.profiling import finish_rerun, start_rerun
+
+# Fin des imports : graphiques et requêtes de chaque dataset sont importés à la demande (load_dashboard)
+_imports_done = time.perf_counter()
 
 
 # Paramètres de la page
@@ -28,6 +37,11 @@ def main():
     Fonction principale de l'application avec choix automatique du dashboard en fonction du dataset inséré
 
     """
+    # Profilage du rerun (panneau de la barre latérale et/ou journal)
+    profiling = st.sidebar.toggle("Profilage des reruns", key='profiling')
+    if profiling or PROFILING_LOG_PATH is not None:
+        start_rerun()
+
     # Titre principal
     st.title("Consumer Insights Dashboard")
     st.markdown("Analyse interactive de données avec DuckDB et Streamlit")
@@ -44,16 +58,17 @@ def main():
         # Filtres
         filters = render_sidebar_filters(dataset_type)
 
-        # Affichage du dashboard selon le type de dataset
-        if dataset_type == 'shopping':
-            render_shopping_dashboard(filters)
-        elif dataset_type == 'airbnb':
-            render_airbnb_dashboard(filters)
+        # Affichage du dashboard selon le type de dataset, module chargé au premier affichage
+        load_dashboard(dataset_type)(filters)
 
-    elif df is not None and dataset_type == 'unknown':
-        st.warning("Les données n'ont pas été reconnues. Veuillez insérer un fichier au format CSV compatible.")
-        st.info("Fichiers supportés : Customer Shopping Behavior, Airbnb Open Data")
+    rerun = finish_rerun(PROFILING_LOG_PATH)
+    if profiling and rerun is not None:
+        from app.components.profiling_panel import render_profiling_panel
+        render_profiling_panel(rerun)
 
 
 if __name__ == "__main__":
     main()
+    record_startup(_script_started, _imports_done, STARTUP_LOG_PATH)
+    # Plotly préchauffé en arrière-plan une fois la page affichée, pendant le choix du fichier
+    start_warmup()
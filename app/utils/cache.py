@@ -0,0 +1,103 @@
+"""
+Cache LRU borné pour éviter de recalculer les étapes coûteuses entre deux reruns
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """
+    Cache clé/valeur avec éviction de l'entrée la moins récemment utilisée.
+    Partageable entre les threads des sessions Streamlit.
+
+    Args:
+        max_entries: Nombre maximal d'entrées conservées
+        max_bytes: Budget mémoire total (optionnel), mesuré avec sizeof
+        sizeof: Fonction donnant la taille en octets d'une valeur
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int | None = None, sizeof: Callable[[Any], int] | None = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._sizes: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Retourne la valeur associée à la clé et la marque comme récente
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Ajoute ou remplace une entrée puis évince les plus anciennes si besoin.
+        Une valeur plus grosse que le budget mémoire n'est pas conservée.
+        """
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.total_bytes += size
+
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.total_bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def evict(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Supprime les entrées dont la clé vérifie le prédicat
+
+        Returns:
+            Nombre d'entrées supprimées
+        """
+        with self._lock:
+            stale_keys = [key for key in self._entries if predicate(key)]
+            for key in stale_keys:
+                self._remove(key)
+            return len(stale_keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Compteurs du cache : hits, misses, nombre d'entrées et octets utilisés
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'bytes': self.total_bytes
+        }
+
+    def _remove(self, key: Hashable) -> None:
+        if key in self._entries:
+            del self._entries[key]
+            self.total_bytes -= self._sizes.pop(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
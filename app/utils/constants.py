@@ -1 +1,85 @@
 # Constantes de l'application (couleurs, labels, configurations)
+from pathlib import Path
+
+# Version du preprocessing : à incrémenter à chaque modification de data_processing.py
+# pour invalider les fichiers déjà nettoyés du cache d'ingestion
+PREPROCESSING_VERSION = 4
+
+# Dédoublonnage de tous les moteurs d'ingestion (la stratégie fait partie de la clé du catalogue
+# et du cache d'ingestion : en changer suffit à relire les fichiers) :
+# - 'full_row' : lignes identiques sur toutes les colonnes (drop_duplicates)
+# - 'hash' : même résultat, via une empreinte 64 bits de chaque ligne (mémoire réduite sur les lignes larges)
+# - 'key' : même clé naturelle (DEDUP_KEYS), la première ligne de chaque clé est conservée
+# - 'duckdb' : même résultat que 'full_row', calculé par DuckDB
+DEDUP_STRATEGIES = ['full_row', 'hash', 'key', 'duckdb']
+DEDUP_STRATEGY = 'full_row'
+
+# Processus du preprocessing pandas parallèle (1 : preprocessing en série). Désactivé par défaut :
+# benchmarks/bench_preprocessing.py le mesure plus lent que le chemin série (x0.52 à x0.58) ;
+# à relever sur une machine où il mesure un gain
+PREPROCESSING_WORKERS = 1
+
+# En dessous de ce nombre de lignes, le coût du pool de processus dépasse le gain : preprocessing en série
+PARALLEL_PREPROCESSING_MIN_ROWS = 200_000
+
+# Lignes lues avant la lecture complète d'un CSV pour détecter son type et choisir son schéma
+SNIFF_SAMPLE_ROWS = 1000
+
+# Nombre de fichiers nettoyés conservés par session dans le cache d'ingestion
+INGESTION_CACHE_MAX_ENTRIES = 3
+
+# Moteurs d'ingestion disponibles : DuckDB natif (par défaut), pipeline pandas historique,
+# pandas avec le parseur pyarrow (colonnes Arrow) ou pandas par blocs (mémoire bornée, très gros fichiers)
+INGESTION_ENGINES = ['duckdb', 'pandas', 'arrow', 'streaming']
+
+# Budget mémoire des DataFrames de l'ingestion par blocs : fixe la taille des blocs de lignes
+INGESTION_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Au-delà de ce nombre de valeurs distinctes, une colonne texte n'est pas stockée en ENUM
+ENUM_MAX_CARDINALITY = 1000
+
+# Catalogue persistant des datasets nettoyés, rouvert au démarrage de l'application
+CATALOG_PATH = Path(__file__).resolve().parents[2] / 'data' / 'catalog' / 'catalog.duckdb'
+
+# Taille du catalogue : au-delà de CATALOG_MAX_DATASETS datasets, ou après CATALOG_MAX_AGE_DAYS jours
+# sans ouverture, les datasets les moins récemment ouverts sont supprimés (tables comprises)
+CATALOG_MAX_DATASETS = 20
+CATALOG_MAX_AGE_DAYS = 30
+
+# Exécution des requêtes des 4 graphiques d'un dashboard :
+# - 'concurrent' : 4 requêtes lancées en même temps sur des curseurs distincts, graphiques affichés à l'arrivée
+# - 'batched' : les 4 KPIs en une seule requête (GROUPING SETS)
+# - 'sequential' : 4 requêtes l'une après l'autre
+DASHBOARD_QUERY_MODE = 'concurrent'
+
+# Threads des requêtes concurrentes, partagés par toutes les sessions
+CONCURRENT_QUERY_THREADS = 8
+
+# Figures Plotly conservées (une par graphique et contenu de résultat)
+FIGURE_CACHE_MAX_ENTRIES = 256
+
+# Cache des résultats de requêtes : nombre d'entrées et budget mémoire
+QUERY_CACHE_MAX_ENTRIES = 512
+QUERY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Durée d'inactivité (en secondes) après laquelle le curseur et les tables d'une session sont libérés
+SESSION_IDLE_TIMEOUT = 30 * 60
+
+# Mode cube : pré-agrégats calculés à l'ingestion, les KPIs sont lus dans le cube et non dans la table brute
+AGGREGATE_CUBE_ENABLED = False
+
+# Mode approché (Airbnb) : sur une grande table, les KPIs sont d'abord estimés sur un échantillon
+# (intervalle de confiance à 95 %), puis remplacés par les résultats exacts dès qu'ils arrivent
+APPROXIMATE_KPIS_ENABLED = True
+APPROXIMATE_MIN_ROWS = 2_000_000
+APPROXIMATE_SAMPLE_ROWS = 200_000
+
+# Reruns profilés conservés par session (panneau de profilage et export JSON)
+PROFILING_MAX_RERUNS = 20
+
+# Journal JSON Lines des reruns profilés (ex. data/profiling/reruns.jsonl) : quand il est défini,
+# tous les reruns sont profilés et journalisés, même sans activer le panneau
+PROFILING_LOG_PATH = None
+
+# Journal JSON Lines de la durée du premier rerun de chaque processus (ex. data/profiling/startup.jsonl)
+STARTUP_LOG_PATH = None
@@ -2,38 +2,131 @@
 Fonctions de nettoyage et transformation des données
 pour les datasets Customer Shopping et Airbnb
 """
-import pandas as pd
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Iterable
 
+import duckdb
+import numpy as np
+import pandas as pd
 
-def preprocess_airbnb(df: pd.DataFrame) -> pd.DataFrame:
+from app.database.connection import quote_identifier
+from app.utils.constants import (
+    DEDUP_STRATEGY,
+    ENUM_MAX_CARDINALITY,
+    PARALLEL_PREPROCESSING_MIN_ROWS,
+    PREPROCESSING_WORKERS,
+    SNIFF_SAMPLE_ROWS
+)
+
+
+# Schéma déclaré de chaque dataset : colonnes lues et conservées, avec leur type à la lecture.
+# Identifiant de ligne, colonnes des dashboards et des filtres, colonnes nettoyées par le preprocessing.
+# Les autres colonnes du fichier ne sont jamais parsées.
+DATASET_SCHEMAS = {
+    'shopping': {
+        'Customer ID': 'BIGINT',
+        'Age': 'BIGINT',
+        'Gender': 'VARCHAR',
+        'Category': 'VARCHAR',
+        'Purchase Amount (USD)': 'BIGINT',
+        'Location': 'VARCHAR',
+        'Season': 'VARCHAR',
+        'Payment Method': 'VARCHAR',
+    },
+    'airbnb': {
+        'id': 'BIGINT',
+        'neighbourhood group': 'VARCHAR',
+        'room type': 'VARCHAR',
+        'cancellation_policy': 'VARCHAR',
+        # Montants au format "$1,200", convertis en float par le preprocessing
+        'price': 'VARCHAR',
+        'service fee': 'VARCHAR',
+        'reviews per month': 'DOUBLE',
+        'review rate number': 'BIGINT',
+        'availability 365': 'BIGINT',
+    },
+}
+
+# Clé naturelle de chaque dataset (DEDUP_STRATEGY = 'key') : une annonce par id,
+# un achat par client et attributs de l'achat
+DEDUP_KEYS = {
+    'shopping': ['Customer ID', 'Category', 'Purchase Amount (USD)', 'Season', 'Payment Method'],
+    'airbnb': ['id'],
+}
+
+# Types pandas à backend Arrow correspondant aux types du schéma
+ARROW_DTYPES = {'BIGINT': 'int64[pyarrow]', 'DOUBLE': 'double[pyarrow]', 'VARCHAR': 'string[pyarrow]'}
+
+# Types numpy pour le parseur C de pandas. Les entiers sont laissés à l'inférence (rapide) :
+# le type entier nullable de pandas est plusieurs fois plus lent à parser
+NUMPY_DTYPES = {'DOUBLE': 'float64', 'VARCHAR': 'str'}
+
+
+def preprocess_airbnb(df: pd.DataFrame, dedup_strategy: str = DEDUP_STRATEGY) -> pd.DataFrame:
     """
     Nettoie et transforme le dataset Airbnb Open Data.
 
     Étapes:
-    - Suppression des doublons
-    - Suppression des colonnes inutiles (license, house_rules)
+    - Sélection des colonnes du schéma déclaré (DATASET_SCHEMAS)
+    - Suppression des doublons (selon dedup_strategy)
     - Suppression des lignes sans price ou neighbourhood group
     - Remplacement des NaN dans reviews per month par 0
     - Conversion de price et service fee en float
 
     Args:
         df: DataFrame brut du CSV Airbnb
+        dedup_strategy: Stratégie de dédoublonnage (cf. DEDUP_STRATEGY)
 
     Returns:
-        DataFrame nettoyé
+        DataFrame nettoyé, nombre de doublons supprimés dans attrs['duplicates_removed']
     """
-    df = df.copy()
+    # Sélection des colonnes utiles (les autres ne participent pas au dédoublonnage,
+    # ce qui permet de ne pas les lire du tout, cf. read_options)
+    df = df[schema_columns('airbnb', df.columns)]
 
     # Suppression des doublons
-    df = df.drop_duplicates(ignore_index=True)
+    duplicated = duplicated_rows(df, 'airbnb', dedup_strategy)
+    df = df[~duplicated].reset_index(drop=True)
+
+    df = clean_airbnb_rows(df)
+    df.attrs['duplicates_removed'] = int(duplicated.sum())
+    return df
+
 
-    # Suppression des colonnes inutiles
-    columns_to_drop = ['license', 'house_rules']
-    df = df.drop(columns=[col for col in columns_to_drop if col in df.columns])
+def clean_airbnb_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Étapes ligne à ligne du preprocessing Airbnb, appliquées après le dédoublonnage
+    (une clé naturelle conserve sa première ligne, même incomplète).
 
+    Étapes:
+    - Suppression des lignes sans price ou neighbourhood group
+    - Remplacement des NaN dans reviews per month par 0
+    - Conversion de price et service fee en float
+
+    Args:
+        df: DataFrame Airbnb (fichier complet ou bloc de lignes)
+
+    Returns:
+        DataFrame nettoyé
+    """
     # Suppression des lignes sans price ou neighbourhood group
     df = df.dropna(subset=['price', 'neighbourhood group'])
+    return convert_airbnb_values(df)
+
+
+def convert_airbnb_values(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Conversions ligne à ligne du preprocessing Airbnb, sans suppression de lignes
+    (ingestion par blocs : les lignes incomplètes sont écartées après le dédoublonnage).
+    Les colonnes converties sont remplacées dans df.
+
+    Args:
+        df: DataFrame Airbnb (fichier complet ou bloc de lignes)
 
+    Returns:
+        DataFrame converti
+    """
     # Remplacement des NaN dans reviews per month par 0
     if 'reviews per month' in df.columns:
         df['reviews per month'] = df['reviews per month'].fillna(0)
@@ -48,7 +141,7 @@ def preprocess_airbnb(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def preprocess_shopping(df: pd.DataFrame) -> pd.DataFrame:
+def preprocess_shopping(df: pd.DataFrame, dedup_strategy: str = DEDUP_STRATEGY) -> pd.DataFrame:
     """
     Nettoie et transforme le dataset Customer Shopping Behavior.
 
@@ -57,18 +150,103 @@ def preprocess_shopping(df: pd.DataFrame) -> pd.DataFrame:
 
     Args:
         df: DataFrame brut du CSV Shopping
+        dedup_strategy: Stratégie de dédoublonnage (cf. DEDUP_STRATEGY)
 
     Returns:
-        DataFrame nettoyé
+        DataFrame nettoyé, nombre de doublons supprimés dans attrs['duplicates_removed']
     """
-    df = df.copy()
+    # Sélection des colonnes du schéma déclaré
+    df = df[schema_columns('shopping', df.columns)]
 
     # Suppression des doublons (par précaution)
-    df = df.drop_duplicates(ignore_index=True)
+    duplicated = duplicated_rows(df, 'shopping', dedup_strategy)
+    df = df[~duplicated].reset_index(drop=True)
 
+    df.attrs['duplicates_removed'] = int(duplicated.sum())
     return df
 
 
+def duplicated_rows(df: pd.DataFrame, dataset_type: str, strategy: str = DEDUP_STRATEGY) -> np.ndarray:
+    """
+    Repère les doublons à supprimer : toutes les occurrences d'une ligne (ou d'une clé) sauf la première.
+    'full_row', 'hash' et 'duckdb' repèrent exactement les mêmes lignes que drop_duplicates.
+
+    Args:
+        df: DataFrame à dédoublonner
+        dataset_type: 'airbnb' ou 'shopping' (clé naturelle de la stratégie 'key')
+        strategy: 'full_row', 'hash', 'key' ou 'duckdb' (cf. DEDUP_STRATEGY)
+
+    Returns:
+        Masque booléen des lignes à supprimer
+    """
+    if strategy == 'full_row':
+        return df.duplicated().to_numpy()
+    elif strategy == 'hash':
+        return _hash_duplicated_rows(df)
+    elif strategy == 'key':
+        return df.duplicated(subset=dedup_columns(df.columns, dataset_type, strategy)).to_numpy()
+    elif strategy == 'duckdb':
+        return _duckdb_duplicated_rows(df)
+    else:
+        raise ValueError(f"Stratégie de dédoublonnage inconnue : {strategy}")
+
+
+def dedup_columns(columns: Iterable[str], dataset_type: str, strategy: str = DEDUP_STRATEGY) -> list[str]:
+    """
+    Colonnes comparées par le dédoublonnage : la clé naturelle en stratégie 'key'
+    (toutes les colonnes si le fichier ne la contient pas), sinon toutes les colonnes
+    """
+    columns = list(columns)
+    keys = DEDUP_KEYS.get(dataset_type, [])
+    if strategy == 'key' and keys and all(col in columns for col in keys):
+        return keys
+    return columns
+
+
+def _hash_duplicated_rows(df: pd.DataFrame) -> np.ndarray:
+    """
+    Doublons repérés sur une empreinte 64 bits de chaque ligne : une colonne uint64
+    au lieu de la factorisation de chaque colonne par drop_duplicates.
+    Chaque doublon est comparé à la ligne dont il partage l'empreinte ; en cas de collision
+    (lignes différentes de même empreinte), le dédoublonnage exact est utilisé.
+    """
+    digests = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    duplicated = pd.Series(digests).duplicated().to_numpy()
+    if not duplicated.any():
+        return duplicated
+
+    # Première ligne de chaque empreinte
+    first_rows = pd.Series(np.flatnonzero(~duplicated), index=digests[~duplicated])
+    candidates = np.flatnonzero(duplicated)
+    originals = first_rows.loc[digests[candidates]].to_numpy()
+
+    candidate_rows = df.iloc[candidates].reset_index(drop=True)
+    original_rows = df.iloc[originals].reset_index(drop=True)
+    same = (candidate_rows == original_rows).fillna(False) | (candidate_rows.isna() & original_rows.isna())
+    if not same.to_numpy(dtype=bool).all():
+        return df.duplicated().to_numpy()
+
+    return duplicated
+
+
+def _duckdb_duplicated_rows(df: pd.DataFrame) -> np.ndarray:
+    """
+    Doublons repérés par DuckDB (GROUP BY sur toutes les colonnes, multithread) :
+    la première position de chaque groupe est conservée
+    """
+    columns = ', '.join(quote_identifier(col) for col in df.columns)
+    conn = duckdb.connect()
+    try:
+        conn.register('lignes', df.assign(__position=np.arange(len(df))))
+        kept = conn.execute(f"SELECT min(__position) AS position FROM lignes GROUP BY {columns}").fetchnumpy()['position']
+    finally:
+        conn.close()
+
+    duplicated = np.ones(len(df), dtype=bool)
+    duplicated[kept] = False
+    return duplicated
+
+
 def detect_dataset_type(df: pd.DataFrame) -> str:
     """
     Détecte automatiquement le type de dataset (airbnb ou shopping)
@@ -80,7 +258,21 @@ def detect_dataset_type(df: pd.DataFrame) -> str:
     Returns:
         'airbnb', 'shopping' ou 'unknown'
     """
-    columns = set(df.columns.str.lower())
+    return detect_dataset_type_from_columns(df.columns)
+
+
+def detect_dataset_type_from_columns(columns: Iterable[str]) -> str:
+    """
+    Détecte le type de dataset à partir des seuls noms de colonnes,
+    sans avoir besoin des données (utilisé par l'ingestion DuckDB).
+
+    Args:
+        columns: Noms des colonnes du fichier
+
+    Returns:
+        'airbnb', 'shopping' ou 'unknown'
+    """
+    columns = {str(col).lower() for col in columns}
 
     # Colonnes spécifiques à Airbnb
     airbnb_markers = {'neighbourhood group', 'room type', 'host id', 'availability 365'}
@@ -96,22 +288,247 @@ def detect_dataset_type(df: pd.DataFrame) -> str:
     return 'unknown'
 
 
-def preprocess_auto(df: pd.DataFrame) -> tuple[pd.DataFrame, str]:
+def sniff_csv(file: IO[bytes], n_rows: int = SNIFF_SAMPLE_ROWS) -> tuple[str, pd.DataFrame]:
+    """
+    Lit l'en-tête et les premières lignes du CSV pour détecter le type de dataset
+    et les colonnes présentes, sans parser le fichier complet.
+    Le fichier est rembobiné pour la lecture complète.
+
+    Args:
+        file: Fichier CSV ouvert en binaire
+        n_rows: Nombre de lignes de l'échantillon
+
+    Returns:
+        Tuple (type de dataset, échantillon)
+    """
+    file.seek(0)
+    sample = pd.read_csv(file, nrows=n_rows)
+    file.seek(0)
+    return detect_dataset_type(sample), sample
+
+
+def schema_columns(dataset_type: str, columns: Iterable[str]) -> list[str]:
+    """
+    Colonnes du schéma déclaré présentes dans le fichier, dans l'ordre du schéma
+    (toutes les colonnes, dans leur ordre, pour un dataset inconnu)
+    """
+    columns = list(columns)
+    if dataset_type not in DATASET_SCHEMAS:
+        return columns
+    return [col for col in DATASET_SCHEMAS[dataset_type] if col in columns]
+
+
+def read_options(dataset_type: str, sample: pd.DataFrame, arrow: bool = False) -> dict:
+    """
+    Options de pd.read_csv pour la lecture complète d'un dataset connu, tirées du schéma déclaré :
+    seules ses colonnes sont parsées (usecols), avec leur type (dtype), sans inférence.
+
+    Args:
+        dataset_type: Type détecté par sniff_csv
+        sample: Échantillon retourné par sniff_csv (colonnes présentes dans le fichier)
+        arrow: Parseur multithread de pyarrow et colonnes Arrow, plutôt que le parseur C de pandas
+
+    Returns:
+        Arguments nommés pour pd.read_csv (vide pour un dataset inconnu)
+    """
+    if dataset_type not in DATASET_SCHEMAS:
+        return {}
+
+    schema = DATASET_SCHEMAS[dataset_type]
+    usecols = schema_columns(dataset_type, sample.columns)
+
+    if arrow:
+        return {
+            'usecols': usecols,
+            'dtype': {col: ARROW_DTYPES[schema[col]] for col in usecols},
+            'engine': 'pyarrow',
+            'dtype_backend': 'pyarrow',
+        }
+
+    return {
+        'usecols': usecols,
+        'dtype': {col: NUMPY_DTYPES[schema[col]] for col in usecols if schema[col] in NUMPY_DTYPES},
+        'low_memory': False,
+    }
+
+
+def read_csv_sniffed(file: IO[bytes], options: dict, **kwargs) -> pd.DataFrame:
+    """
+    pd.read_csv avec les options de read_options. Si une valeur sort du type déclaré
+    (texte dans une colonne numérique), la lecture reprend avec l'inférence de pandas
+    sur les seules colonnes du schéma.
+    """
+    try:
+        return pd.read_csv(file, **options, **kwargs)
+    except ValueError:
+        file.seek(0)
+        options = {key: value for key, value in options.items() if key != 'dtype'}
+        return pd.read_csv(file, **options, **kwargs)
+
+
+def preprocess_auto(
+    df: pd.DataFrame,
+    workers: int = PREPROCESSING_WORKERS,
+    dedup_strategy: str = DEDUP_STRATEGY
+) -> tuple[pd.DataFrame, str]:
     """
     Détecte automatiquement le type de dataset et applique
     le preprocessing approprié.
 
     Args:
         df: DataFrame brut
+        workers: Processus du preprocessing parallèle, utilisé au-delà de PARALLEL_PREPROCESSING_MIN_ROWS lignes
+        dedup_strategy: Stratégie de dédoublonnage (cf. DEDUP_STRATEGY)
 
     Returns:
-        Tuple (DataFrame nettoyé, type de dataset)
+        Tuple (DataFrame nettoyé, type de dataset). Le nombre de doublons supprimés
+        est dans attrs['duplicates_removed'] du DataFrame nettoyé.
     """
     dataset_type = detect_dataset_type(df)
 
-    if dataset_type == 'airbnb':
-        return preprocess_airbnb(df), dataset_type
+    if workers > 1 and len(df) >= PARALLEL_PREPROCESSING_MIN_ROWS and dataset_type in DATASET_SCHEMAS:
+        cleaned = preprocess_parallel(df, dataset_type, workers, dedup_strategy)
+    elif dataset_type == 'airbnb':
+        cleaned = preprocess_airbnb(df, dedup_strategy)
     elif dataset_type == 'shopping':
-        return preprocess_shopping(df), dataset_type
+        cleaned = preprocess_shopping(df, dedup_strategy)
     else:
         return df, dataset_type
+
+    compact = compact_dataframe(cleaned)
+    compact.attrs['duplicates_removed'] = cleaned.attrs['duplicates_removed']
+    return compact, dataset_type
+
+
+def preprocess_parallel(
+    df: pd.DataFrame,
+    dataset_type: str,
+    workers: int,
+    dedup_strategy: str = DEDUP_STRATEGY
+) -> pd.DataFrame:
+    """
+    Preprocessing réparti sur plusieurs processus, de résultat identique
+    à preprocess_airbnb / preprocess_shopping (mêmes lignes, même ordre, même index).
+
+    Les lignes sont réparties par hachage des colonnes dédoublonnées (ligne entière ou clé) :
+    deux doublons tombent toujours dans la même partition, le dédoublonnage de chaque
+    partition est donc global.
+    Chaque processus dédoublonne et nettoie sa partition, puis les lignes sont remises
+    dans l'ordre du fichier.
+
+    Args:
+        df: DataFrame brut
+        dataset_type: 'airbnb' ou 'shopping'
+        workers: Nombre de processus (et de partitions)
+        dedup_strategy: Stratégie de dédoublonnage (cf. DEDUP_STRATEGY)
+
+    Returns:
+        DataFrame nettoyé, nombre de doublons supprimés dans attrs['duplicates_removed']
+    """
+    df = df[schema_columns(dataset_type, df.columns)]
+    n_rows = len(df)
+
+    # Partition de chaque ligne, l'index de chaque partition garde la position d'origine des lignes
+    subset = df[dedup_columns(df.columns, dataset_type, dedup_strategy)]
+    partition_ids = pd.util.hash_pandas_object(subset, index=False).to_numpy() % workers
+    del subset
+    positions = [np.flatnonzero(partition_ids == i) for i in range(workers)]
+    partitions = [df.iloc[rows].set_axis(rows) for rows in positions]
+    del df
+
+    # Processus démarrés par un serveur forkserver : un fork du serveur Streamlit (threads tornado,
+    # DuckDB, requêtes concurrentes) pourrait hériter d'un verrou tenu par un autre thread
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver')) as pool:
+        results = list(pool.map(_preprocess_partition, [dataset_type] * workers, [dedup_strategy] * workers, partitions))
+
+    # Index du chemin série : rang de chaque ligne parmi les lignes dédoublonnées
+    deduplicated = np.sort(np.concatenate([kept for kept, _ in results]))
+    cleaned = pd.concat([part for _, part in results]).sort_index()
+    cleaned.index = deduplicated.searchsorted(cleaned.index.to_numpy())
+
+    if dataset_type == 'shopping':
+        cleaned = cleaned.reset_index(drop=True)
+    cleaned.attrs['duplicates_removed'] = n_rows - len(deduplicated)
+    return cleaned
+
+
+def _preprocess_partition(dataset_type: str, dedup_strategy: str, part: pd.DataFrame) -> tuple[np.ndarray, pd.DataFrame]:
+    """
+    Dédoublonne puis nettoie une partition dans un processus du pool
+
+    Returns:
+        Tuple (positions des lignes conservées par le dédoublonnage, partition nettoyée)
+    """
+    part = part[~duplicated_rows(part, dataset_type, dedup_strategy)]
+    kept = part.index.to_numpy()
+    if dataset_type == 'airbnb':
+        part = clean_airbnb_rows(part)
+    return kept, part
+
+
+def compact_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Représentation mémoire compacte d'un DataFrame nettoyé, sans changer ses valeurs.
+
+    Étapes:
+    - Colonnes texte à faible cardinalité (dimensions) en category
+    - Autres colonnes texte en chaînes Arrow
+    - Entiers réduits au plus petit type qui contient leurs valeurs
+    - Décimaux en float32 lorsque la conversion est exacte
+
+    Args:
+        df: DataFrame nettoyé
+
+    Returns:
+        DataFrame compact
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            columns[col] = series
+        elif pd.api.types.is_string_dtype(series):
+            n_unique = series.nunique()
+            if n_unique <= ENUM_MAX_CARDINALITY and n_unique <= len(series) // 2:
+                columns[col] = series.astype('category')
+            else:
+                columns[col] = series.astype('string[pyarrow]')
+        elif pd.api.types.is_bool_dtype(series):
+            columns[col] = series
+        elif pd.api.types.is_integer_dtype(series):
+            columns[col] = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_float_dtype(series):
+            downcast = pd.to_numeric(series, downcast='float')
+            # Conversion conservée seulement si elle ne perd aucune décimale (0.1 n'est pas exact en float32)
+            exact = (downcast.astype(series.dtype) == series) | series.isna()
+            columns[col] = downcast if exact.all() else series
+        else:
+            columns[col] = series
+
+    return pd.DataFrame(columns, index=df.index)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mémoire occupée par chaque colonne avant et après compact_dataframe
+
+    Args:
+        before: DataFrame tel que lu dans le CSV
+        after: DataFrame nettoyé et compact
+
+    Returns:
+        Une ligne par colonne lue : types et octets avant/après, gain en %
+        (une colonne supprimée par le preprocessing a 0 octet après)
+    """
+    bytes_before = before.memory_usage(deep=True, index=False)
+    bytes_after = after.memory_usage(deep=True, index=False).reindex(bytes_before.index, fill_value=0)
+
+    report = pd.DataFrame({
+        'colonne': bytes_before.index,
+        'type_avant': [str(before[col].dtype) for col in bytes_before.index],
+        'octets_avant': bytes_before.values,
+        'type_apres': [str(after[col].dtype) if col in after.columns else '-' for col in bytes_before.index],
+        'octets_apres': bytes_after.values,
+    })
+    report['gain_pct'] = (100 * (1 - report['octets_apres'] / report['octets_avant'].where(report['octets_avant'] > 0))).round(1)
+    return report
@@ -0,0 +1,116 @@
+"""
+Chargement différé des modules de chaque dataset et préchauffage des imports lourds.
+
+Une session n'affiche qu'un dashboard : son module de graphiques et son module de requêtes
+ne sont importés qu'une fois le type de dataset détecté. Plotly (import et première figure,
+la plus lente) est préchauffé dans un thread dès le démarrage, pendant que l'utilisateur
+choisit son fichier.
+"""
+import importlib
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from types import ModuleType
+from typing import Callable
+
+
+# Module de graphiques et fonction du dashboard de chaque dataset
+DASHBOARDS = {
+    'shopping': ('app.visualizations.chart_shopping', 'render_shopping_dashboard'),
+    'airbnb': ('app.visualizations.chart_airbnb', 'render_airbnb_dashboard'),
+}
+
+# Module de requêtes de chaque dataset
+QUERY_MODULES = {
+    'shopping': 'app.database.queries_shopping',
+    'airbnb': 'app.database.queries_airbnb',
+}
+
+_warmup_lock = threading.Lock()
+_warmup_thread: threading.Thread | None = None
+
+# Mesure du démarrage du processus : premier rerun, enregistrée une seule fois
+_startup: dict | None = None
+
+
+def load_dashboard(dataset_type: str) -> Callable[[dict], None]:
+    """
+    Fonction d'affichage du dashboard du dataset, importée au premier appel
+    """
+    module_name, function_name = DASHBOARDS[dataset_type]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def load_queries(dataset_type: str) -> ModuleType:
+    """
+    Module de requêtes du dataset, importé au premier appel
+    """
+    return importlib.import_module(QUERY_MODULES[dataset_type])
+
+
+def start_warmup() -> None:
+    """
+    Lance, une fois par processus, le préchauffage de Plotly en arrière-plan
+    """
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_warm_up, name='warmup', daemon=True)
+            _warmup_thread.start()
+
+
+def record_startup(script_started: float, imports_done: float, log_path: Path | None = None) -> dict | None:
+    """
+    Enregistre la durée du premier rerun du processus (imports de l'application compris)
+    et l'ajoute, si demandé, à un journal JSON Lines à suivre d'une version à l'autre.
+    Les reruns suivants ne sont pas mesurés.
+
+    Args:
+        script_started: perf_counter() au début du script
+        imports_done: perf_counter() après les imports de l'application
+
+    Returns:
+        Mesure du démarrage, ou None si elle a déjà été enregistrée
+    """
+    global _startup
+    if _startup is not None:
+        return None
+
+    now = time.perf_counter()
+    _startup = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'imports_seconds': round(imports_done - script_started, 6),
+        'first_rerun_seconds': round(now - script_started, 6),
+    }
+    if log_path is not None:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, 'a') as f:
+            f.write(json.dumps(_startup) + '\n')
+
+    return _startup
+
+
+def get_startup() -> dict | None:
+    """
+    Mesure du démarrage du processus (None avant la fin du premier rerun)
+    """
+    return _startup
+
+
+def _warm_up() -> None:
+    """
+    Importe Plotly Express et construit deux petites figures : la première figure
+    charge les validateurs de Plotly, bien plus lente que les suivantes
+    """
+    try:
+        import pandas as pd
+        import plotly.express as px
+
+        df = pd.DataFrame({'x': ['a', 'b'], 'y': [1, 2]})
+        px.bar(df, x='x', y='y', color='y', text='y')
+        px.pie(df, values='y', names='x', hole=0.4)
+    except Exception:
+        # Le préchauffage n'est qu'une optimisation : le dashboard importera Plotly lui-même
+        pass
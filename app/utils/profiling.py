@@ -0,0 +1,97 @@
+"""
+Profilage des reruns : durée, lignes retournées et lignes lues de chaque étape
+(lecture du CSV, preprocessing, requêtes, figures, rendu des graphiques).
+
+Le rerun profilé est porté par une variable de contexte : les étapes exécutées dans
+les threads de run_concurrently (qui copient le contexte) sont rattachées au même rerun.
+Hors d'un rerun profilé, profile_step ne fait que mesurer, sans rien conserver.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+
+# Rerun en cours de profilage dans ce contexte (None : profilage désactivé)
+_current_rerun: ContextVar[dict | None] = ContextVar('current_rerun', default=None)
+
+
+def start_rerun() -> dict:
+    """
+    Démarre le profilage d'un rerun dans le contexte courant
+
+    Returns:
+        Rerun profilé, complété par les étapes au fil de l'exécution
+    """
+    rerun = {'started_at': datetime.now().isoformat(timespec='milliseconds'), 'seconds': None, 'steps': []}
+    rerun['_start'] = time.perf_counter()
+    _current_rerun.set(rerun)
+    return rerun
+
+
+def finish_rerun(log_path: Path | None = None) -> dict | None:
+    """
+    Termine le rerun profilé du contexte courant et l'ajoute, si demandé,
+    au journal JSON Lines (une ligne par rerun)
+
+    Returns:
+        Rerun terminé, ou None si aucun rerun n'était profilé
+    """
+    rerun = _current_rerun.get()
+    if rerun is None:
+        return None
+
+    _current_rerun.set(None)
+    rerun['seconds'] = round(time.perf_counter() - rerun['_start'], 6)
+
+    if log_path is not None:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, 'a') as f:
+            f.write(json.dumps(_public(rerun), default=str) + '\n')
+
+    return rerun
+
+
+def export_reruns(reruns: list[dict]) -> str:
+    """
+    Reruns profilés au format JSON (sans les champs internes)
+    """
+    return json.dumps([_public(rerun) for rerun in reruns], indent=2, default=str)
+
+
+def is_profiling() -> bool:
+    """
+    True si le contexte courant exécute un rerun profilé
+    """
+    return _current_rerun.get() is not None
+
+
+@contextmanager
+def profile_step(name: str, kind: str) -> Iterator[dict]:
+    """
+    Mesure une étape du rerun en cours. L'appelant peut compléter le dict retourné
+    (rows_returned, rows_scanned, cache, query...) avant la fin du bloc.
+
+    Args:
+        name: Nom de l'étape (requête, graphique...)
+        kind: Catégorie de l'étape ('ingestion', 'query', 'figure', 'render')
+    """
+    rerun = _current_rerun.get()
+    step = {'step': name, 'kind': kind, 'thread': threading.current_thread().name}
+    start = time.perf_counter()
+    try:
+        yield step
+    finally:
+        if rerun is not None:
+            step['start'] = round(start - rerun['_start'], 6)
+            step['seconds'] = round(time.perf_counter() - start, 6)
+            # list.append est atomique : les threads de requêtes écrivent dans le même rerun
+            rerun['steps'].append(step)
+
+
+def _public(rerun: dict) -> dict:
+    return {key: value for key, value in rerun.items() if not key.startswith('_')}
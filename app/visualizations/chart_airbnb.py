@@ -1,6 +1,8 @@
 """
 Visualisations pour le dataset Airbnb Open Data : 4 KPI avec graphiques Plotly
 """
+import pandas as pd
+import pyarrow as pa
 import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
@@ -9,8 +11,11 @@ from app.database.queries_airbnb import (
     get_avg_price_by_neighbourhood,
     get_room_type_distribution,
     get_avg_availability_by_neighbourhood,
-    get_avg_rating_by_room_type
+    get_avg_rating_by_room_type,
+    get_dashboard_estimates,
+    get_dashboard_kpis
 )
+from app.visualizations.common_charts import MARGIN_COLUMN, is_estimate, render_chart, render_dashboard_charts
 
 
 def render_airbnb_dashboard(filters: dict = None) -> None:
@@ -18,120 +23,157 @@ def render_airbnb_dashboard(filters: dict = None) -> None:
     """
 
     Affiche le dashboard complet pour Airbnb.
+    Sur une grande table, les graphiques affichent d'abord une estimation sur échantillon.
     """
     st.header("Dashboard Airbnb Open Data")
 
-    # Ligne 1: 2 graphiques
-    col1, col2 = st.columns(2)
+    # Ligne 1 : prix et types de logement, ligne 2 : disponibilité et notes
+    render_dashboard_charts(filters, {
+        'avg_price_by_neighbourhood': (get_avg_price_by_neighbourhood, render_avg_price_by_neighbourhood),
+        'room_type_distribution': (get_room_type_distribution, render_room_type_distribution),
+        'avg_availability_by_neighbourhood': (get_avg_availability_by_neighbourhood, render_avg_availability),
+        'avg_rating_by_room_type': (get_avg_rating_by_room_type, render_avg_rating_by_room_type),
+    }, get_dashboard_kpis, get_dashboard_estimates)
 
-    with col1:
-        render_avg_price_by_neighbourhood(filters)
 
-    with col2:
-        render_room_type_distribution(filters)
+def render_avg_price_by_neighbourhood(filters: dict = None, df: pd.DataFrame | pa.Table = None) -> None:
+    """
+    KPI 1: Bar chart du prix moyen par quartier
+    """
+
+
+    st.subheader("Prix Moyen par Quartier")
+
 
-    # Ligne 2: 2 graphiques
-    col3, col4 = st.columns(2)
 
-    with col3:
-        render_avg_availability(filters)
+    if df is None:
+        df = get_avg_price_by_neighbourhood(filters, arrow=True)
 
-    with col4:
-        render_avg_rating_by_room_type(filters)
+    render_chart('avg_price_by_neighbourhood', df, _avg_price_by_neighbourhood_figure)
 
 
-def render_avg_price_by_neighbourhood(filters: dict = None) -> None:
+def render_room_type_distribution(filters: dict = None, df: pd.DataFrame | pa.Table = None) -> None:
     """
-    KPI 1: Bar chart du prix moyen par quartier
+    KPI 2 : distribution des types de logement (pie chart)
     """
+    st.subheader("Types de Logement")
 
+    if df is None:
+        df = get_room_type_distribution(filters, arrow=True)
 
-    st.subheader("Prix Moyen par Quartier")
+    render_chart('room_type_distribution', df, _room_type_distribution_figure)
+
+
+def render_avg_availability(filters: dict = None, df: pd.DataFrame | pa.Table = None) -> None:
+    """
+    KPI 3: bar chart de la disponibilité moyenne par quartier
+    """
+    
+    st.subheader("Disponibilité Moyenne (jours/an)")
+
+    if df is None:
+        df = get_avg_availability_by_neighbourhood(filters, arrow=True)
+
+    render_chart('avg_availability_by_neighbourhood', df, _avg_availability_by_neighbourhood_figure)
 
 
+def render_avg_rating_by_room_type(filters: dict = None, df: pd.DataFrame | pa.Table = None) -> None:
+    
+    
+    """
+    KPI 4: Bar chart des notes moyennes par type de logement
+    """
+    st.subheader("Note Moyenne par Type de Logement")
 
-    df = get_avg_price_by_neighbourhood(filters)
+    if df is None:
+        df = get_avg_rating_by_room_type(filters, arrow=True)
 
+    render_chart('avg_rating_by_room_type', df, _avg_rating_by_room_type_figure)
+
+
+def _avg_price_by_neighbourhood_figure(df: pd.DataFrame | pa.Table) -> go.Figure:
+    """
+    Figure du KPI 1 : bar chart du prix moyen par quartier
+    """
     fig = px.bar(
         df,
         x='quartier',
         y='prix_moyen',
         color='prix_moyen',
         text='prix_moyen',
+        error_y=_margin(df),
         labels={'quartier': 'Quartier', 'prix_moyen': 'Prix moyen ($)'},
         color_continuous_scale='Reds'
     )
     fig.update_traces(texttemplate='$%{text:.0f}', textposition='outside')
     fig.update_layout(showlegend=False, height=400)
+    return fig
 
-    st.plotly_chart(fig, use_container_width=True)
 
-
-def render_room_type_distribution(filters: dict = None) -> None:
+def _room_type_distribution_figure(df: pd.DataFrame | pa.Table) -> go.Figure:
     """
-    KPI 2 : distribution des types de logement (pie chart)
+    Figure du KPI 2 : distribution des types de logement (pie chart)
     """
-    st.subheader("Types de Logement")
-
-    df = get_room_type_distribution(filters)
-
+    estimate = is_estimate(df)
     fig = px.pie(
         df,
         values='nb_logements',
         names='type_logement',
         hole=0.4,
+        custom_data=[MARGIN_COLUMN] if estimate else None,
         labels={'type_logement': 'Type', 'nb_logements': 'Logements'}
     )
     fig.update_traces(textposition='inside', textinfo='percent+label')
+    if estimate:
+        # Pas de barres d'erreur sur un camembert : la marge du nombre de logements est écrite dans chaque part
+        fig.update_traces(
+            texttemplate='%{value:,.0f} ± %{customdata[0]:,.0f}<br>%{label}',
+            hovertemplate='%{label}<br>%{value:,.0f} ± %{customdata[0]:,.0f} logements (IC 95 %)<extra></extra>'
+        )
     fig.update_layout(height=400)
-
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 
-def render_avg_availability(filters: dict = None) -> None:
+def _avg_availability_by_neighbourhood_figure(df: pd.DataFrame | pa.Table) -> go.Figure:
     """
-    KPI 3: bar chart de la disponibilité moyenne par quartier
+    Figure du KPI 3 : bar chart de la disponibilité moyenne par quartier
     """
-    
-    st.subheader("Disponibilité Moyenne (jours/an)")
-
-    df = get_avg_availability_by_neighbourhood(filters)
-
     fig = px.bar(
         df,
         x='quartier',
         y='disponibilite_moyenne',
         color='disponibilite_moyenne',
         text='disponibilite_moyenne',
+        error_y=_margin(df),
         labels={'quartier': 'Quartier', 'disponibilite_moyenne': 'Jours disponibles'},
         color_continuous_scale='Greens'
     )
     fig.update_traces(texttemplate='%{text:.0f}j', textposition='outside')
     fig.update_layout(showlegend=False, height=400)
-
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 
-def render_avg_rating_by_room_type(filters: dict = None) -> None:
-    
-    
+def _avg_rating_by_room_type_figure(df: pd.DataFrame | pa.Table) -> go.Figure:
     """
-    KPI 4: Bar chart des notes moyennes par type de logement
+    Figure du KPI 4 : bar chart des notes moyennes par type de logement
     """
-    st.subheader("Note Moyenne par Type de Logement")
-
-    df = get_avg_rating_by_room_type(filters)
-
     fig = px.bar(
         df,
         x='type_logement',
         y='note_moyenne',
         color='note_moyenne',
         text='note_moyenne',
+        error_y=_margin(df),
         labels={'type_logement': 'Type', 'note_moyenne': 'Note moyenne'},
         color_continuous_scale='Purples'
     )
     fig.update_traces(texttemplate='%{text:.2f}', textposition='outside')
     fig.update_layout(showlegend=False, height=400, yaxis_range=[0, 5])
+    return fig
 
-    st.plotly_chart(fig, use_container_width=True)
+
+def _margin(df: pd.DataFrame | pa.Table) -> str | None:
+    """
+    Barres d'erreur (intervalle de confiance à 95 %) d'un résultat estimé
+    """
+    return MARGIN_COLUMN if is_estimate(df) else None
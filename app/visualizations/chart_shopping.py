@@ -1,6 +1,8 @@
 """
 Visualisations pour le dataset Customer Shopping Behavior - 4 KPI
 """
+import pandas as pd
+import pyarrow as pa
 import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
@@ -9,8 +11,10 @@ from app.database.queries_shopping import (
     get_sales_by_category,
     get_sales_by_gender_season,
     get_avg_basket_by_age,
-    get_payment_methods
+    get_payment_methods,
+    get_dashboard_kpis
 )
+from app.visualizations.common_charts import render_chart, render_dashboard_charts
 
 
 def render_shopping_dashboard(filters: dict = None) -> None:
@@ -21,34 +25,72 @@ def render_shopping_dashboard(filters: dict = None) -> None:
 
     st.header("Dashboard Customer Shopping Behavior")
 
-    # Ligne 1 2 graphiques
-    col1, col2 = st.columns(2)
+    # Ligne 1 : catégories et paiements, ligne 2 : panier moyen et genre / saison
+    render_dashboard_charts(filters, {
+        'sales_by_category': (get_sales_by_category, render_sales_by_category),
+        'payment_methods': (get_payment_methods, render_payment_methods),
+        'avg_basket_by_age': (get_avg_basket_by_age, render_avg_basket_by_age),
+        'sales_by_gender_season': (get_sales_by_gender_season, render_sales_by_gender_season),
+    }, get_dashboard_kpis)
 
-    with col1:
-        render_sales_by_category(filters)
 
-    with col2:
-        render_payment_methods(filters)
+def render_sales_by_category(filters: dict = None, df: pd.DataFrame | pa.Table = None) -> None:
+    
+    """
+    Bar chart des ventes par catégorie
+    """
+    st.subheader("Ventes par Catégorie")
+
+    if df is None:
+        df = get_sales_by_category(filters, arrow=True)
+
+    render_chart('sales_by_category', df, _sales_by_category_figure)
 
-    # Ligne 2 avec 2 graphiques
-    col3, col4 = st.columns(2)
 
-    with col3:
-        render_avg_basket_by_age(filters)
+def render_sales_by_gender_season(filters: dict = None, df: pd.DataFrame | pa.Table = None) -> None:
+    """
+    Heatmap ventes par genre et saison
+    """
 
-    with col4:
-        render_sales_by_gender_season(filters)
 
+    st.subheader("Ventes par Genre et Saison")
 
-def render_sales_by_category(filters: dict = None) -> None:
-    
+    if df is None:
+        df = get_sales_by_gender_season(filters, arrow=True)
+
+    render_chart('sales_by_gender_season', df, _sales_by_gender_season_figure)
+
+
+def render_avg_basket_by_age(filters: dict = None, df: pd.DataFrame | pa.Table = None) -> None:
     """
-    Bar chart des ventes par catégorie
+    Bar chart du panier moyen par tranche d'âge
     """
-    st.subheader("Ventes par Catégorie")
 
-    df = get_sales_by_category(filters)
+    st.subheader("Panier Moyen par Tranche d'Âge")
+
+    if df is None:
+        df = get_avg_basket_by_age(filters, arrow=True)
+
+    render_chart('avg_basket_by_age', df, _avg_basket_by_age_figure)
 
+
+def render_payment_methods(filters: dict = None, df: pd.DataFrame | pa.Table = None) -> None:
+    """
+    
+    Pie chart des méthodes de paiement
+    """
+    st.subheader("Méthodes de Paiement")
+
+    if df is None:
+        df = get_payment_methods(filters, arrow=True)
+
+    render_chart('payment_methods', df, _payment_methods_figure)
+
+
+def _sales_by_category_figure(df: pd.DataFrame | pa.Table) -> go.Figure:
+    """
+    Figure du bar chart des ventes par catégorie
+    """
     fig = px.bar(
         df,
         x='categorie',
@@ -59,21 +101,16 @@ def render_sales_by_category(filters: dict = None) -> None:
     )
     fig.update_traces(texttemplate='$%{text:,.0f}', textposition='outside')
     fig.update_layout(showlegend=False, height=400)
-
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 
-def render_sales_by_gender_season(filters: dict = None) -> None:
+def _sales_by_gender_season_figure(df: pd.DataFrame | pa.Table) -> go.Figure:
     """
-    Heatmap ventes par genre et saison
+    Figure de la heatmap des ventes par genre et saison
     """
-
-
-    st.subheader("Ventes par Genre et Saison")
-
-    df = get_sales_by_gender_season(filters)
-
-    # Pivot pour la heatmap
+    # Pivot pour la heatmap : seule étape qui a besoin d'un DataFrame pandas
+    if isinstance(df, pa.Table):
+        df = df.to_pandas()
     pivot_df = df.pivot(index='genre', columns='saison', values='total_ventes')
 
     fig = px.imshow(
@@ -83,19 +120,13 @@ def render_sales_by_gender_season(filters: dict = None) -> None:
         text_auto='.0f'
     )
     fig.update_layout(height=400)
+    return fig
 
-    st.plotly_chart(fig, use_container_width=True)
 
-
-def render_avg_basket_by_age(filters: dict = None) -> None:
+def _avg_basket_by_age_figure(df: pd.DataFrame | pa.Table) -> go.Figure:
     """
-    Bar chart du panier moyen par tranche d'âge
+    Figure du bar chart du panier moyen par tranche d'âge
     """
-
-    st.subheader("Panier Moyen par Tranche d'Âge")
-
-    df = get_avg_basket_by_age(filters)
-
     fig = px.bar(
         df,
         x='tranche_age',
@@ -107,19 +138,13 @@ def render_avg_basket_by_age(filters: dict = None) -> None:
     )
     fig.update_traces(texttemplate='$%{text:.2f}', textposition='outside')
     fig.update_layout(showlegend=False, height=400)
-
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 
-def render_payment_methods(filters: dict = None) -> None:
+def _payment_methods_figure(df: pd.DataFrame | pa.Table) -> go.Figure:
     """
-    
-    Pie chart des méthodes de paiement
+    Figure du pie chart des méthodes de paiement
     """
-    st.subheader("Méthodes de Paiement")
-
-    df = get_payment_methods(filters)
-
     fig = px.pie(
         df,
         values='nb_transactions',
@@ -129,5 +154,4 @@ def render_payment_methods(filters: dict = None) -> None:
     )
     fig.update_traces(textposition='inside', textinfo='percent+label')
     fig.update_layout(height=400)
-
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
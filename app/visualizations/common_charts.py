@@ -1 +1,163 @@
 # Graphiques et composants de visualisation réutilisables
+import hashlib
+import itertools
+from functools import partial
+from typing import Callable
+
+import pandas as pd
+import plotly.graph_objects as go
+import pyarrow as pa
+import streamlit as st
+
+from app.database.connection import run_concurrently
+from app.utils.cache import LRUCache
+from app.utils.constants import DASHBOARD_QUERY_MODE, FIGURE_CACHE_MAX_ENTRIES
+from app.utils.profiling import profile_step
+
+
+# Clé du résultat des estimations dans render_dashboard_charts
+ESTIMATES = 'estimates'
+
+# Colonne des résultats estimés : demi-largeur de l'intervalle de confiance à 95 % de la valeur
+MARGIN_COLUMN = 'marge'
+
+# Figures Plotly déjà construites, indexées par (graphique, empreinte du résultat affiché)
+_figure_cache = LRUCache(FIGURE_CACHE_MAX_ENTRIES)
+
+
+def render_dashboard_charts(
+    filters: dict | None,
+    charts: dict[str, tuple[Callable[..., pd.DataFrame | pa.Table], Callable[[dict, pd.DataFrame | pa.Table], None]]],
+    get_dashboard_kpis: Callable[[dict], dict[str, pd.DataFrame]],
+    get_dashboard_estimates: Callable[[dict], dict[str, pd.DataFrame] | None] | None = None
+) -> None:
+    """
+    Affiche les 4 graphiques d'un dashboard sur 2 lignes de 2 colonnes.
+    Les requêtes sont exécutées selon DASHBOARD_QUERY_MODE ; en mode concurrent,
+    chaque graphique est affiché dans sa colonne dès que son résultat arrive.
+
+    Avec get_dashboard_estimates, un graphique encore sans résultat exact affiche d'abord
+    l'estimation sur échantillon, remplacée dans sa colonne par le résultat exact à son arrivée.
+
+    Args:
+        filters: Filtres du dashboard
+        charts: Par KPI, dans l'ordre d'affichage : (fonction de requête acceptant arrow=True, fonction d'affichage)
+        get_dashboard_kpis: Calcul des 4 KPIs en une requête (mode 'batched')
+        get_dashboard_estimates: Estimation des KPIs sur échantillon (None si les résultats exacts suffisent)
+    """
+    # Résultats des requêtes individuelles en tables Arrow : Plotly les lit sans passer par pandas
+    row1, row2 = st.columns(2), st.columns(2)
+    slots = {kpi: column.empty() for kpi, column in zip(charts, [*row1, *row2])}
+
+    if DASHBOARD_QUERY_MODE == 'concurrent':
+        tasks = {kpi: partial(query, filters, arrow=True) for kpi, (query, _) in charts.items()}
+        if get_dashboard_estimates is not None:
+            tasks[ESTIMATES] = partial(get_dashboard_estimates, filters)
+        results = run_concurrently(tasks)
+    else:
+        if DASHBOARD_QUERY_MODE == 'batched':
+            results = get_dashboard_kpis(filters).items()
+        else:
+            results = ((kpi, query(filters, arrow=True)) for kpi, (query, _) in charts.items())
+        if get_dashboard_estimates is not None:
+            results = itertools.chain([(ESTIMATES, get_dashboard_estimates(filters))], results)
+
+    exact = set()
+    for kpi, df in results:
+        if kpi != ESTIMATES:
+            exact.add(kpi)
+            with slots[kpi].container():
+                charts[kpi][1](filters, df)
+            continue
+
+        # Estimations : seulement pour les graphiques dont le résultat exact n'est pas encore arrivé
+        for estimated_kpi, estimate in (df or {}).items():
+            if estimated_kpi not in exact:
+                with slots[estimated_kpi].container():
+                    charts[estimated_kpi][1](filters, estimate)
+
+
+def render_chart(
+    chart_id: str,
+    df: pd.DataFrame | pa.Table,
+    build: Callable[[pd.DataFrame | pa.Table], go.Figure]
+) -> None:
+    """
+    Affiche le graphique : figure reprise du cache ou construite (cached_figure), puis st.plotly_chart.
+    Un résultat estimé (colonne MARGIN_COLUMN) est signalé au-dessus et dans la figure.
+    """
+    if is_estimate(df):
+        st.caption("≈ Estimation sur échantillon (intervalle de confiance à 95 %), résultat exact en cours de calcul…")
+        build = partial(_estimated_figure, build)
+
+    fig = cached_figure(chart_id, df, build)
+    with profile_step(chart_id, 'render'):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def cached_figure(
+    chart_id: str,
+    df: pd.DataFrame | pa.Table,
+    build: Callable[[pd.DataFrame | pa.Table], go.Figure]
+) -> go.Figure:
+    """
+    Figure du graphique pour ce résultat : construite (Plotly Express, pivot éventuel) une seule fois
+    par contenu de résultat, puis réutilisée tant que les données affichées ne changent pas.
+    La figure en cache est déjà validée : st.plotly_chart la sérialise sans la reconstruire.
+    Elle ne doit pas être modifiée par l'appelant.
+
+    Args:
+        chart_id: Identifiant du graphique
+        df: Résultat de la requête du graphique (DataFrame ou table Arrow)
+        build: Construction de la figure à partir du résultat
+    """
+    with profile_step(chart_id, 'figure') as step:
+        key = (chart_id, result_fingerprint(df))
+        fig = _figure_cache.get(key)
+        step['cache'] = fig is not None
+
+        if fig is None:
+            fig = build(df)
+            _figure_cache.put(key, fig)
+
+    return fig
+
+
+def result_fingerprint(df: pd.DataFrame | pa.Table) -> str:
+    """
+    Empreinte du contenu d'un résultat : noms et types des colonnes, valeurs ligne par ligne.
+    Une table Arrow est hachée sous sa forme sérialisée (format IPC), sans conversion pandas.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    if isinstance(df, pa.Table):
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, df.schema) as writer:
+            writer.write_table(df)
+        digest.update(sink.getvalue())
+        return 'arrow:' + digest.hexdigest()
+
+    digest.update(repr([(name, str(dtype)) for name, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def is_estimate(df: pd.DataFrame | pa.Table) -> bool:
+    """
+    True si le résultat est une estimation sur échantillon (colonne MARGIN_COLUMN)
+    """
+    columns = df.column_names if isinstance(df, pa.Table) else df.columns
+    return MARGIN_COLUMN in columns
+
+
+def _estimated_figure(build: Callable[[pd.DataFrame | pa.Table], go.Figure], df: pd.DataFrame | pa.Table) -> go.Figure:
+    """
+    Figure d'une estimation : valeurs affichées préfixées de « ≈ » et titre « Estimation ».
+    Les marges sont tracées par chaque figure (barres d'erreur, ou valeur ± marge dans un camembert).
+    """
+    fig = build(df)
+    for trace in fig.data:
+        if getattr(trace, 'texttemplate', None):
+            trace.texttemplate = '≈' + trace.texttemplate
+    fig.update_layout(title=dict(text="Estimation (IC 95 %)", font=dict(size=13)))
+    return fig
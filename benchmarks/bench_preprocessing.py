@@ -0,0 +1,63 @@
+"""
+Benchmark du preprocessing pandas : chemin série contre preprocessing parallèle par partitions.
+Vérifie que les deux chemins produisent le même DataFrame avant de comparer les temps.
+
+Usage : python benchmarks/bench_preprocessing.py data/Airbnb_Open_Data.csv --workers 2 4
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.utils.data_processing import (  # noqa: E402
+    compact_dataframe,
+    detect_dataset_type,
+    preprocess_airbnb,
+    preprocess_parallel,
+    preprocess_shopping
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('csv', help="Fichier CSV (Airbnb Open Data ou Customer Shopping Behavior)")
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4], help="Nombres de processus à mesurer")
+    parser.add_argument('--repeat', type=int, default=3, help="Mesures par configuration (meilleur temps retenu)")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, low_memory=False)
+    dataset_type = detect_dataset_type(df)
+    serial = {'airbnb': preprocess_airbnb, 'shopping': preprocess_shopping}.get(dataset_type)
+    if serial is None:
+        sys.exit("Type de dataset non reconnu.")
+
+    print(f"{args.csv} : {len(df):,} lignes, dataset {dataset_type}, {os.cpu_count()} CPU")
+
+    reference, elapsed = _best_of(args.repeat, lambda: compact_dataframe(serial(df)))
+    print(f"  série       : {elapsed:7.3f} s")
+
+    for workers in args.workers:
+        result, elapsed_parallel = _best_of(
+            args.repeat, lambda: compact_dataframe(preprocess_parallel(df, dataset_type, workers))
+        )
+        pd.testing.assert_frame_equal(result, reference)
+        print(f"  {workers} processus : {elapsed_parallel:7.3f} s (x{elapsed / elapsed_parallel:.2f}, résultat identique)")
+
+
+def _best_of(repeat: int, run):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Générateur déterministe de CSV Customer Shopping Behavior et Airbnb Open Data pour les benchmarks.
+Mêmes colonnes et mêmes formats que les fichiers d'origine (prix "$1,200 ", valeurs manquantes,
+doublons exacts) : les fichiers générés passent par detect_dataset_type et le preprocessing réel.
+Une même graine et un même nombre de lignes produisent toujours le même fichier.
+
+Usage : python benchmarks/generate_data.py airbnb 1000000 --output benchmarks/data/airbnb_1000000.csv
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# Lignes générées et écrites à la fois : la mémoire reste bornée pour 10M de lignes
+CHUNK_ROWS = 200_000
+
+# Proportion de lignes réécrites à l'identique (doublons exacts à supprimer par le preprocessing)
+DUPLICATE_RATE = {'shopping': 0.001, 'airbnb': 0.005}
+
+STATES = [
+    'Alabama', 'Alaska', 'Arizona', 'Arkansas', 'California', 'Colorado', 'Connecticut', 'Delaware',
+    'Florida', 'Georgia', 'Hawaii', 'Idaho', 'Illinois', 'Indiana', 'Iowa', 'Kansas', 'Kentucky',
+    'Louisiana', 'Maine', 'Maryland', 'Massachusetts', 'Michigan', 'Minnesota', 'Mississippi',
+    'Missouri', 'Montana', 'Nebraska', 'Nevada', 'New Hampshire', 'New Jersey', 'New Mexico',
+    'New York', 'North Carolina', 'North Dakota', 'Ohio', 'Oklahoma', 'Oregon', 'Pennsylvania',
+    'Rhode Island', 'South Carolina', 'South Dakota', 'Tennessee', 'Texas', 'Utah', 'Vermont',
+    'Virginia', 'Washington', 'West Virginia', 'Wisconsin', 'Wyoming'
+]
+
+ITEMS = {
+    'Clothing': ['Blouse', 'Sweater', 'Jeans', 'Shirt', 'Shorts', 'Dress', 'Skirt', 'Pants', 'Hoodie', 'T-shirt', 'Socks'],
+    'Footwear': ['Sneakers', 'Shoes', 'Sandals', 'Boots'],
+    'Outerwear': ['Coat', 'Jacket'],
+    'Accessories': ['Handbag', 'Jewelry', 'Belt', 'Scarf', 'Hat', 'Sunglasses', 'Gloves', 'Backpack'],
+}
+
+NEIGHBOURHOODS = {
+    'Manhattan': ['Harlem', 'Midtown', 'Upper West Side', 'East Village', "Hell's Kitchen", 'Chelsea'],
+    'Brooklyn': ['Williamsburg', 'Bedford-Stuyvesant', 'Bushwick', 'Crown Heights', 'Park Slope'],
+    'Queens': ['Astoria', 'Long Island City', 'Flushing', 'Ridgewood'],
+    'Bronx': ['Mott Haven', 'Fordham', 'Concourse'],
+    'Staten Island': ['St. George', 'Tompkinsville'],
+}
+
+
+def generate_csv(dataset_type: str, n_rows: int, path: str | Path, seed: int = 0) -> Path:
+    """
+    Écrit un CSV synthétique de n_rows lignes (doublons compris)
+
+    Args:
+        dataset_type: 'shopping' ou 'airbnb'
+        n_rows: Nombre de lignes du fichier
+        path: Fichier à écrire
+        seed: Graine du générateur
+
+    Returns:
+        Chemin du fichier écrit
+    """
+    generate_chunk = {'shopping': _shopping_chunk, 'airbnb': _airbnb_chunk}[dataset_type]
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path, 'w', newline='') as f:
+        for index, start in enumerate(range(0, n_rows, CHUNK_ROWS)):
+            size = min(CHUNK_ROWS, n_rows - start)
+            # Une graine par bloc : le contenu d'un bloc ne dépend pas de la taille des autres
+            rng = np.random.default_rng([seed, index])
+            chunk = _with_duplicates(generate_chunk(rng, start, size), rng, DUPLICATE_RATE[dataset_type])
+            chunk.to_csv(f, index=False, header=index == 0)
+
+    return path
+
+
+def _with_duplicates(df: pd.DataFrame, rng: np.random.Generator, rate: float) -> pd.DataFrame:
+    """
+    Remplace une partie des lignes par des copies exactes de lignes précédentes du bloc
+    """
+    n_rows = len(df)
+    duplicated = np.flatnonzero(rng.random(n_rows) < rate)
+    duplicated = duplicated[duplicated > 0]
+    if len(duplicated) == 0:
+        return df
+
+    rows = np.arange(n_rows)
+    rows[duplicated] = (rng.random(len(duplicated)) * duplicated).astype(np.int64)
+    return df.iloc[rows]
+
+
+def _shopping_chunk(rng: np.random.Generator, start: int, n_rows: int) -> pd.DataFrame:
+    categories = rng.choice(list(ITEMS), n_rows, p=[0.45, 0.15, 0.08, 0.32])
+    items = np.empty(n_rows, dtype=object)
+    for category, names in ITEMS.items():
+        mask = categories == category
+        items[mask] = rng.choice(names, mask.sum())
+
+    return pd.DataFrame({
+        'Customer ID': np.arange(start + 1, start + n_rows + 1),
+        'Age': rng.integers(18, 71, n_rows),
+        'Gender': rng.choice(['Male', 'Female'], n_rows, p=[0.68, 0.32]),
+        'Item Purchased': items,
+        'Category': categories,
+        'Purchase Amount (USD)': rng.integers(20, 101, n_rows),
+        'Location': rng.choice(STATES, n_rows),
+        'Size': rng.choice(['S', 'M', 'L', 'XL'], n_rows, p=[0.17, 0.45, 0.27, 0.11]),
+        'Color': rng.choice(['Gray', 'Maroon', 'Turquoise', 'White', 'Charcoal', 'Silver', 'Pink', 'Purple', 'Olive', 'Black'], n_rows),
+        'Season': rng.choice(['Spring', 'Fall', 'Winter', 'Summer'], n_rows),
+        'Review Rating': rng.integers(25, 51, n_rows) / 10,
+        'Subscription Status': rng.choice(['Yes', 'No'], n_rows, p=[0.27, 0.73]),
+        'Shipping Type': rng.choice(['Free Shipping', 'Standard', 'Store Pickup', 'Next Day Air', 'Express', '2-Day Shipping'], n_rows),
+        'Discount Applied': rng.choice(['Yes', 'No'], n_rows, p=[0.43, 0.57]),
+        'Promo Code Used': rng.choice(['Yes', 'No'], n_rows, p=[0.43, 0.57]),
+        'Previous Purchases': rng.integers(1, 51, n_rows),
+        'Payment Method': rng.choice(['PayPal', 'Credit Card', 'Cash', 'Debit Card', 'Venmo', 'Bank Transfer'], n_rows),
+        'Frequency of Purchases': rng.choice(['Every 3 Months', 'Annually', 'Quarterly', 'Monthly', 'Bi-Weekly', 'Fortnightly', 'Weekly'], n_rows),
+    })
+
+
+def _airbnb_chunk(rng: np.random.Generator, start: int, n_rows: int) -> pd.DataFrame:
+    groups = rng.choice(list(NEIGHBOURHOODS), n_rows, p=[0.42, 0.41, 0.13, 0.025, 0.015]).astype(object)
+    neighbourhoods = np.empty(n_rows, dtype=object)
+    for group, names in NEIGHBOURHOODS.items():
+        mask = groups == group
+        neighbourhoods[mask] = rng.choice(names, mask.sum())
+    # Fautes de saisie et valeurs manquantes du fichier d'origine
+    groups[rng.random(n_rows) < 0.0002] = 'brookln'
+    groups[rng.random(n_rows) < 0.0003] = None
+
+    price = rng.integers(50, 1201, n_rows)
+    service_fee = np.round(price * 0.2).astype(np.int64)
+    price_text = pd.Series([f"${value:,} " for value in price], dtype=object)
+    fee_text = pd.Series([f"${value:,} " for value in service_fee], dtype=object)
+    price_text[rng.random(n_rows) < 0.002] = None
+    fee_text[rng.random(n_rows) < 0.003] = None
+
+    reviews_per_month = np.round(rng.gamma(1.2, 1.0, n_rows), 2)
+    reviews_per_month[rng.random(n_rows) < 0.15] = np.nan
+
+    return pd.DataFrame({
+        'id': np.arange(1_000_000 + start, 1_000_000 + start + n_rows),
+        'NAME': rng.choice(['Cozy flat', 'Sunny room near the park', 'Big loft, great view', 'Quiet studio', 'Spacious apartment'], n_rows),
+        'host id': rng.integers(10**9, 10**10, n_rows),
+        'host_identity_verified': rng.choice(['verified', 'unconfirmed'], n_rows),
+        'host name': rng.choice(['Ann', 'Bob', 'Carlos', 'Diane', 'Emma', 'Farid'], n_rows),
+        'neighbourhood group': groups,
+        'neighbourhood': neighbourhoods,
+        'lat': np.round(40.5 + rng.random(n_rows) * 0.4, 5),
+        'long': np.round(-74.25 + rng.random(n_rows) * 0.5, 5),
+        'country': 'United States',
+        'country code': 'US',
+        'instant_bookable': rng.choice([True, False], n_rows),
+        'cancellation_policy': rng.choice(['strict', 'moderate', 'flexible'], n_rows),
+        'room type': rng.choice(['Entire home/apt', 'Private room', 'Shared room', 'Hotel room'], n_rows, p=[0.52, 0.45, 0.02, 0.01]),
+        'Construction year': rng.integers(2003, 2023, n_rows),
+        'price': price_text,
+        'service fee': fee_text,
+        'minimum nights': rng.integers(1, 31, n_rows),
+        'number of reviews': rng.integers(0, 500, n_rows),
+        'last review': (pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 1000, n_rows), unit='D')).strftime('%m/%d/%Y'),
+        'reviews per month': reviews_per_month,
+        'review rate number': rng.integers(1, 6, n_rows),
+        'calculated host listings count': rng.integers(1, 20, n_rows),
+        'availability 365': rng.integers(0, 366, n_rows),
+        'house_rules': rng.choice(['No smoking, no parties.', 'Please respect the neighbours and keep the place clean.', None], n_rows),
+        'license': None,
+    })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('dataset_type', choices=['shopping', 'airbnb'])
+    parser.add_argument('rows', type=int, help="Nombre de lignes")
+    parser.add_argument('--output', help="Fichier à écrire (par défaut benchmarks/data/<type>_<lignes>.csv)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    output = args.output or Path(__file__).parent / 'data' / f"{args.dataset_type}_{args.rows}.csv"
+    print(generate_csv(args.dataset_type, args.rows, output, args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Suite de benchmarks de l'application sur des CSV générés à plusieurs échelles :
+lecture et preprocessing pandas (avec chaque stratégie de dédoublonnage), enregistrement de la table, ingestion DuckDB,
+chaque fonction de requête de queries_shopping / queries_airbnb et un rerun complet du dashboard.
+Le démarrage de l'application (premier rerun d'un processus neuf, chargement de chaque dashboard)
+est mesuré à part, dans des processus séparés.
+Les résultats sont écrits en JSON pour comparer deux runs (--baseline).
+
+Usage :
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --rows 10000 1000000 --baseline benchmarks/results/avant.json
+"""
+import argparse
+import inspect
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from functools import partial
+from importlib.metadata import version
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.database import queries_airbnb, queries_shopping  # noqa: E402
+from app.database.connection import bump_table_version, register_dataframe  # noqa: E402
+from app.database.ingestion import ingest_csv  # noqa: E402
+from app.utils import constants  # noqa: E402
+from app.utils.data_processing import preprocess_auto, read_csv_sniffed, read_options, sniff_csv  # noqa: E402
+from app.visualizations import common_charts  # noqa: E402
+from app.visualizations.chart_airbnb import render_airbnb_dashboard  # noqa: E402
+from app.visualizations.chart_shopping import render_shopping_dashboard  # noqa: E402
+from generate_data import generate_csv  # noqa: E402
+
+
+SCALES = [10_000, 1_000_000, 10_000_000]
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+
+QUERY_MODULES = {'shopping': queries_shopping, 'airbnb': queries_airbnb}
+
+DASHBOARDS = {'shopping': render_shopping_dashboard, 'airbnb': render_airbnb_dashboard}
+
+# Mesure du démarrage dans un processus neuf : Streamlit est déjà importé, comme dans le serveur
+STARTUP_SCRIPT = """
+import json, logging, time
+from streamlit.testing.v1 import AppTest
+from app.utils.lazy_loading import DASHBOARDS, load_dashboard
+
+logging.disable(logging.WARNING)
+start = time.perf_counter()
+AppTest.from_file('app/main.py', default_timeout=120).run()
+timings = {'app_first_rerun': time.perf_counter() - start}
+for dataset_type in DASHBOARDS:
+    start = time.perf_counter()
+    load_dashboard(dataset_type)
+    timings['load_dashboard_' + dataset_type] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=SCALES, help="Échelles (nombre de lignes des CSV)")
+    parser.add_argument('--datasets', nargs='+', choices=list(QUERY_MODULES), default=list(QUERY_MODULES))
+    parser.add_argument('--repeat', type=int, default=3, help="Mesures par étape (meilleur temps retenu)")
+    parser.add_argument('--data-dir', type=Path, default=BENCHMARK_DIR / 'data', help="CSV générés, réutilisés d'un run à l'autre")
+    parser.add_argument('--output', type=Path, help="Fichier JSON des résultats (par défaut benchmarks/results/<date>.json)")
+    parser.add_argument('--baseline', type=Path, help="Résultats JSON d'un run précédent, à comparer")
+    args = parser.parse_args()
+
+    # Hors d'une session Streamlit, les appels st.* du dashboard préviennent à chaque élément
+    logging.disable(logging.WARNING)
+
+    results = []
+    print("Démarrage de l'application")
+    for step, runs in run_startup(args.repeat):
+        results.append({'dataset': 'app', 'rows': 0, 'step': step, 'seconds': min(runs), 'runs': runs})
+        print(f"  {step:<52} {min(runs):9.4f} s")
+
+    for rows in args.rows:
+        for dataset_type in args.datasets:
+            csv_path = args.data_dir / f"{dataset_type}_{rows}.csv"
+            if not csv_path.exists():
+                print(f"Génération de {csv_path}…")
+                generate_csv(dataset_type, rows, csv_path)
+
+            print(f"{dataset_type}, {rows:,} lignes")
+            for step, runs in run_dataset(dataset_type, csv_path, args.repeat):
+                results.append({'dataset': dataset_type, 'rows': rows, 'step': step, 'seconds': min(runs), 'runs': runs})
+                print(f"  {step:<52} {min(runs):9.4f} s")
+
+    output = args.output or BENCHMARK_DIR / 'results' / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({'meta': _run_metadata(args.repeat), 'results': results}, indent=2))
+    print(f"Résultats : {output}")
+
+    if args.baseline:
+        compare(json.loads(args.baseline.read_text()), results)
+
+
+def run_dataset(dataset_type: str, csv_path: Path, repeat: int) -> list[tuple[str, list[float]]]:
+    """
+    Mesure chaque étape sur un fichier
+
+    Returns:
+        Liste de tuples (étape, durées en secondes)
+    """
+    timings = []
+
+    # Pipeline pandas : chaque mesure repart du fichier
+    def read() -> Any:
+        with open(csv_path, 'rb') as f:
+            detected, sample = sniff_csv(f)
+            return read_csv_sniffed(f, read_options(detected, sample))
+
+    timings.append(('read_csv', _measure(read, repeat)))
+    df_raw = read()
+    timings.append(('preprocess_auto', _measure(lambda: preprocess_auto(df_raw), repeat)))
+    for strategy in constants.DEDUP_STRATEGIES:
+        preprocess = partial(preprocess_auto, df_raw, dedup_strategy=strategy)
+        timings.append((f'preprocess_auto[{strategy}]', _measure(preprocess, repeat)))
+    df_clean, _ = preprocess_auto(df_raw)
+    del df_raw
+    timings.append(('register_dataframe', _measure(lambda: register_dataframe(df_clean, dataset_type), repeat)))
+    del df_clean
+
+    # Moteur DuckDB : la table interrogée ensuite est celle de l'ingestion native
+    timings.append(('ingest_csv', _measure(lambda: ingest_csv(str(csv_path), dataset_type), repeat)))
+
+    # Chaque fonction de requête, caches vidés avant chaque mesure (nouvelle version de la table)
+    module = QUERY_MODULES[dataset_type]
+    module_name = module.__name__.rsplit('.', 1)[-1]
+    for name, function in inspect.getmembers(module, inspect.isfunction):
+        if name.startswith('get_') and function.__module__ == module.__name__:
+            runs = _measure(function, repeat, before=lambda: bump_table_version(dataset_type))
+            timings.append((f"{module_name}.{name}", runs))
+
+    # Rerun complet : options des filtres puis dashboard (requêtes, figures, sérialisation Streamlit)
+    def rerun() -> None:
+        module.get_filter_options()
+        DASHBOARDS[dataset_type](None)
+
+    def invalidate() -> None:
+        bump_table_version(dataset_type)
+        common_charts._figure_cache.clear()
+
+    timings.append(('dashboard_rerun_cold', _measure(rerun, repeat, before=invalidate)))
+    timings.append(('dashboard_rerun_warm', _measure(rerun, repeat)))
+
+    return timings
+
+
+def run_startup(repeat: int) -> list[tuple[str, list[float]]]:
+    """
+    Mesure le premier rerun de l'application (sans fichier chargé) et le chargement
+    de chaque dashboard, chaque mesure dans un nouveau processus Python
+
+    Returns:
+        Liste de tuples (étape, durées en secondes)
+    """
+    timings: dict[str, list[float]] = {}
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT], cwd=BENCHMARK_DIR.parent,
+            capture_output=True, text=True, check=True
+        )
+        for step, seconds in json.loads(result.stdout.strip().splitlines()[-1]).items():
+            timings.setdefault(step, []).append(round(seconds, 6))
+    return list(timings.items())
+
+
+def compare(baseline: dict, results: list[dict]) -> None:
+    """
+    Affiche, pour chaque étape mesurée dans les deux runs, le rapport des durées (courant / référence)
+    """
+    reference = {(r['dataset'], r['rows'], r['step']): r['seconds'] for r in baseline['results']}
+    print(f"\nComparaison avec le run du {baseline['meta']['date']} ({baseline['meta'].get('git_commit') or '?'})")
+    for r in results:
+        before = reference.get((r['dataset'], r['rows'], r['step']))
+        if before:
+            print(f"  {r['dataset']:<8} {r['rows']:>10,} {r['step']:<52} {before:9.4f} s -> {r['seconds']:9.4f} s  x{r['seconds'] / before:.2f}")
+
+
+def _measure(function: Callable[[], Any], repeat: int, before: Callable[[], Any] | None = None) -> list[float]:
+    runs = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        function()
+        runs.append(round(time.perf_counter() - start, 6))
+    return runs
+
+
+def _run_metadata(repeat: int) -> dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': {name: version(name) for name in ('duckdb', 'pandas', 'pyarrow', 'plotly', 'streamlit')},
+        'repeat': repeat,
+        'dashboard_query_mode': constants.DASHBOARD_QUERY_MODE,
+        'aggregate_cube_enabled': constants.AGGREGATE_CUBE_ENABLED,
+        'dedup_strategy': constants.DEDUP_STRATEGY,
+    }
+
+
+if __name__ == '__main__':
+    main()
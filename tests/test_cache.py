@@ -0,0 +1,45 @@
+# Tests pour le cache LRU
+from app.utils.cache import LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert len(cache) == 2
+
+
+def test_lru_counts_hits_and_misses():
+    cache = LRUCache(max_entries=2)
+    cache.put('a', 1)
+
+    assert cache.get('a') == 1
+    assert cache.get('z') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_evict_with_predicate():
+    cache = LRUCache(max_entries=5)
+    cache.put(('x', 1), 'old')
+    cache.put(('y', 2), 'new')
+
+    assert cache.evict(lambda key: key[1] != 2) == 1
+    assert ('y', 2) in cache
+
+
+def test_lru_respects_memory_budget():
+    cache = LRUCache(max_entries=10, max_bytes=10, sizeof=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'yyyy')
+    cache.put('c', 'zzzz')
+
+    assert 'a' not in cache
+    assert cache.stats()['bytes'] == 8
+
+    cache.put('big', 'x' * 11)
+    assert 'big' not in cache
@@ -0,0 +1,47 @@
+# Tests pour les composants de visualisation
+import pandas as pd
+
+from app.visualizations.chart_airbnb import _avg_price_by_neighbourhood_figure, _room_type_distribution_figure
+from app.visualizations.chart_shopping import _sales_by_gender_season_figure
+from app.visualizations.common_charts import _estimated_figure, cached_figure
+
+
+def test_figure_is_rebuilt_only_when_the_result_changes():
+    df = pd.DataFrame({
+        'genre': ['Female', 'Female', 'Male', 'Male'],
+        'saison': ['Fall', 'Winter', 'Fall', 'Winter'],
+        'total_ventes': [120, 80, 95, 60],
+    })
+    builds = []
+
+    def build(result: pd.DataFrame):
+        builds.append(len(result))
+        return _sales_by_gender_season_figure(result)
+
+    fig = cached_figure('test_gender_season', df, build)
+    # Même contenu (autre DataFrame, comme après un rerun) : figure réutilisée
+    assert cached_figure('test_gender_season', df.copy(), build) is fig
+    assert len(builds) == 1
+
+    changed = df.assign(total_ventes=[120, 80, 95, 61])
+    assert cached_figure('test_gender_season', changed, build) is not fig
+    assert len(builds) == 2
+
+
+def test_estimated_figure_shows_error_bars_and_marker():
+    exact = pd.DataFrame({'quartier': ['Brooklyn', 'Manhattan'], 'prix_moyen': [640.5, 612.25]})
+    estimate = exact.assign(marge=[12.4, 9.8])
+
+    fig = _avg_price_by_neighbourhood_figure(exact)
+    assert fig.data[0].error_y.array is None
+
+    fig = _estimated_figure(_avg_price_by_neighbourhood_figure, estimate)
+    assert list(fig.data[0].error_y.array) == [12.4, 9.8]
+    assert fig.data[0].texttemplate.startswith('≈')
+    assert 'Estimation' in fig.layout.title.text
+
+    # Camembert : pas de barres d'erreur, la marge est écrite dans chaque part
+    estimate = pd.DataFrame({'type_logement': ['Private room', 'Shared room'], 'nb_logements': [1200, 300], 'marge': [40, 20]})
+    fig = _estimated_figure(_room_type_distribution_figure, estimate)
+    assert '± %{customdata[0]' in fig.data[0].texttemplate
+    assert [list(row) for row in fig.data[0].customdata] == [[40], [20]]
@@ -0,0 +1,61 @@
+# Tests pour le calcul des KPIs en ligne de commande
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from app import cli
+from tests.test_database import AIRBNB_CSV
+
+
+def test_cli_does_not_import_streamlit_or_plotly():
+    code = "import sys, app.cli; print(sorted({m.split('.')[0] for m in sys.modules} & {'streamlit', 'plotly'}))"
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=Path(__file__).resolve().parents[1],
+        capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == '[]'
+
+
+def test_cli_writes_every_kpi_of_each_file(tmp_path):
+    inputs = tmp_path / 'csv'
+    inputs.mkdir()
+    (inputs / 'airbnb.csv').write_text(AIRBNB_CSV)
+    (inputs / 'inconnu.csv').write_text("a,b\n1,2\n")
+    # Reconnu comme Airbnb, mais sans les colonnes attendues par le preprocessing
+    (inputs / 'incomplet.csv').write_text("room type,foo\nPrivate room,1\n")
+
+    # Un fichier non reconnu ou incomplet est signalé sans empêcher le traitement des autres
+    assert cli.main([str(inputs), '--output', str(tmp_path / 'json'), '--workers', '1']) == 1
+    document = json.loads((tmp_path / 'json' / 'airbnb.json').read_text())
+    assert not (tmp_path / 'json' / 'inconnu.json').exists()
+    assert not (tmp_path / 'json' / 'incomplet.json').exists()
+
+    assert document['dataset_type'] == 'airbnb'
+    assert set(document['kpis']) == {
+        'avg_price_by_neighbourhood', 'room_type_distribution',
+        'avg_availability_by_neighbourhood', 'avg_rating_by_room_type'
+    }
+    # Doublon exact et lignes incomplètes supprimés par le preprocessing, comme dans l'application
+    assert sum(row['nb_logements'] for row in document['kpis']['room_type_distribution']) == document['rows'] == 2
+
+    filters = '{"room_type": ["Private room"]}'
+    assert cli.main([str(inputs / 'airbnb.csv'), '--filters', filters, '--format', 'parquet', '--output', str(tmp_path / 'parquet')]) == 0
+    room_types = pd.read_parquet(tmp_path / 'parquet' / 'airbnb' / 'room_type_distribution.parquet')
+    assert room_types.to_dict('records') == [{'type_logement': 'Private room', 'nb_logements': 1}]
+
+
+def test_cli_keeps_results_of_files_with_the_same_name(tmp_path):
+    for folder in ['a', 'b']:
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / 'listings.csv').write_text(AIRBNB_CSV)
+
+    files = [tmp_path / 'a' / 'listings.csv', tmp_path / 'b' / 'listings.csv', tmp_path / 'a' / 'listings.csv']
+    assert cli.output_names(files) == ['a_listings', 'b_listings', 'a_listings_2']
+
+    # Un résultat par fichier, aucun n'écrase l'autre
+    assert cli.main([str(tmp_path / 'a'), str(tmp_path / 'b'), '--output', str(tmp_path / 'json'), '--workers', '1']) == 0
+    sources = {json.loads(path.read_text())['source'] for path in (tmp_path / 'json').glob('*.json')}
+    assert sources == {str(tmp_path / 'a' / 'listings.csv'), str(tmp_path / 'b' / 'listings.csv')}
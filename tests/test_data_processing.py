@@ -1 +1,115 @@
 # Tests pour les fonctions de traitement des données
+import io
+
+import pandas as pd
+import pytest
+
+from app.utils.data_processing import (
+    compact_dataframe,
+    detect_dataset_type_from_columns,
+    duplicated_rows,
+    memory_report,
+    preprocess_airbnb,
+    preprocess_parallel,
+    preprocess_shopping,
+    read_csv_sniffed,
+    read_options,
+    sniff_csv
+)
+
+
+def test_detect_dataset_type_from_columns():
+    assert detect_dataset_type_from_columns(['id', 'Room Type', 'price']) == 'airbnb'
+    assert detect_dataset_type_from_columns(['Customer ID', 'Category']) == 'shopping'
+    assert detect_dataset_type_from_columns(['foo', 'bar']) == 'unknown'
+
+
+def test_sniff_reads_only_a_sample_and_picks_read_schema():
+    rows = "".join(f"{i},Loft {i},Brooklyn,Private room,$1{i:02d} ,rules {i},\n" for i in range(50))
+    csv = io.BytesIO(("id,NAME,neighbourhood group,room type,price,house_rules,license\n" + rows).encode())
+
+    dataset_type, sample = sniff_csv(csv, n_rows=10)
+    options = read_options(dataset_type, sample)
+
+    assert dataset_type == 'airbnb'
+    assert len(sample) == 10 and csv.tell() == 0
+    assert options['usecols'] == ['id', 'neighbourhood group', 'room type', 'price']
+    assert options['dtype'] == {'neighbourhood group': 'str', 'room type': 'str', 'price': 'str'}
+    assert read_options('unknown', sample) == {}
+
+    df = read_csv_sniffed(csv, read_options(dataset_type, sample, arrow=True))
+    assert list(df.columns) == options['usecols'] and len(df) == 50
+    assert str(df['id'].dtype) == 'int64[pyarrow]'
+
+
+def test_read_csv_sniffed_falls_back_when_declared_types_are_wrong():
+    csv = io.BytesIO(b"Customer ID,Category,Purchase Amount (USD)\n1,Clothing,20\n2,Footwear,30\n3,Outerwear,N/C\n")
+
+    dataset_type, sample = sniff_csv(csv)
+    df = read_csv_sniffed(csv, read_options(dataset_type, sample, arrow=True))
+
+    assert df['Purchase Amount (USD)'].tolist() == ['20', '30', 'N/C']
+
+
+def test_compact_dataframe_keeps_values_and_reports_memory():
+    df = pd.DataFrame({
+        'Category': ['Clothing', 'Footwear'] * 50,
+        'Customer ID': range(100),
+        'price': [1200.0, 80.5] * 50,
+        'reviews per month': [0.1, 0.2] * 50,
+        'comment': [f'text {i}' for i in range(100)],
+    }).astype({'Category': object, 'comment': object})
+
+    compact = compact_dataframe(df)
+
+    assert isinstance(compact['Category'].dtype, pd.CategoricalDtype)
+    assert str(compact['Customer ID'].dtype) == 'int8'
+    assert str(compact['price'].dtype) == 'float32'
+    # 0.1 n'est pas représentable exactement en float32 : la colonne reste en float64
+    assert str(compact['reviews per month'].dtype) == 'float64'
+    assert str(compact['comment'].dtype) == 'string'
+    pd.testing.assert_frame_equal(compact.astype(object), df.astype(object))
+
+    report = memory_report(df, compact.drop(columns=['comment']))
+    assert report.set_index('colonne').loc['comment', 'octets_apres'] == 0
+    assert report['octets_apres'].sum() < report['octets_avant'].sum() / 2
+
+
+def test_preprocess_parallel_matches_serial_preprocessing():
+    rows = [(i % 40, 'Brooklyn' if i % 7 else None, 'Private room', f'${100 + i % 40:,}' if i % 9 else None) for i in range(200)]
+    airbnb = pd.DataFrame(rows, columns=['id', 'neighbourhood group', 'room type', 'price'])
+    shopping = pd.DataFrame({
+        'Customer ID': [i % 30 for i in range(100)],
+        'Category': ['Clothing', 'Footwear'] * 50,
+        'Purchase Amount (USD)': [i % 30 for i in range(100)],
+    })
+
+    # Les doublons sont répartis dans la même partition : même résultat que le chemin série
+    pd.testing.assert_frame_equal(preprocess_parallel(airbnb, 'airbnb', workers=3), preprocess_airbnb(airbnb))
+    pd.testing.assert_frame_equal(preprocess_parallel(shopping, 'shopping', workers=3), preprocess_shopping(shopping))
+
+
+def test_dedup_strategies_match_full_row_or_natural_key():
+    airbnb = pd.DataFrame({
+        'id': [1, 2, 1, 3, 2, 1],
+        'neighbourhood group': ['Brooklyn', 'Queens', 'Brooklyn', None, 'Queens', 'Manhattan'],
+        'room type': ['Private room'] * 6,
+        'price': ['$100', '$80', '$100', None, '$85', '$120'],
+    })
+
+    # 'hash' et 'duckdb' suppriment exactement les mêmes lignes que drop_duplicates (valeurs manquantes comprises)
+    expected = preprocess_airbnb(airbnb, 'full_row')
+    assert expected.attrs['duplicates_removed'] == 1
+    for strategy in ['hash', 'duckdb']:
+        assert duplicated_rows(airbnb, 'airbnb', strategy).tolist() == airbnb.duplicated().tolist()
+        pd.testing.assert_frame_equal(preprocess_airbnb(airbnb, strategy), expected)
+
+    # 'key' : une annonce par id, la première rencontrée
+    by_key = preprocess_airbnb(airbnb, 'key')
+    assert by_key['id'].tolist() == [1, 2]
+    assert by_key.attrs['duplicates_removed'] == 3
+    pd.testing.assert_frame_equal(preprocess_parallel(airbnb, 'airbnb', workers=2, dedup_strategy='key'), by_key)
+    assert preprocess_parallel(airbnb, 'airbnb', workers=2, dedup_strategy='key').attrs['duplicates_removed'] == 3
+
+    with pytest.raises(ValueError):
+        duplicated_rows(airbnb, 'airbnb', 'inconnue')
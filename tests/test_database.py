@@ -1 +1,602 @@
 # Tests pour les fonctions de base de données
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.database import queries_airbnb, queries_shopping
+
+from app.database.connection import execute_query, register_dataframe
+from app.database.ingestion import ingest_csv
+from app.utils.data_processing import preprocess_auto
+
+
+AIRBNB_CSV = """id,NAME,host id,neighbourhood group,room type,cancellation_policy,price,service fee,reviews per month,review rate number,availability 365,house_rules,license
+1,Loft,10,Brooklyn,Private room,strict,"$1,200 ",$240 ,0.5,4,120,No smoking,
+1,Loft,10,Brooklyn,Private room,strict,"$1,200 ",$240 ,0.5,4,120,No smoking,
+2,Flat,11,Manhattan,Entire home/apt,flexible,$80 ,$16 ,,5,30,,
+3,Room,12,,Shared room,moderate,$55 ,$11 ,1.2,3,200,,
+4,Studio,13,Queens,Private room,,,$20 ,0.1,2,10,,
+"""
+
+
+def _shopping_frame(n_rows: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'Customer ID': np.arange(n_rows),
+        'Age': rng.integers(18, 71, n_rows),
+        'Gender': rng.choice(['Male', 'Female'], n_rows),
+        'Category': rng.choice(['Clothing', 'Footwear', 'Outerwear', 'Accessories'], n_rows),
+        'Purchase Amount (USD)': rng.integers(20, 101, n_rows),
+        'Location': rng.choice(['Maine', 'Hawaii', "O'Brien"], n_rows),
+        'Season': rng.choice(['Winter', 'Spring', 'Summer', 'Fall'], n_rows),
+        'Payment Method': rng.choice(['Cash', 'PayPal', 'Venmo'], n_rows),
+    })
+
+
+def _airbnb_frame(n_rows: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        'id': np.arange(n_rows),
+        'neighbourhood group': rng.choice(['Brooklyn', 'Manhattan', 'Queens'], n_rows),
+        'room type': rng.choice(['Private room', 'Entire home/apt', 'Shared room'], n_rows),
+        'cancellation_policy': rng.choice(['strict', 'moderate', 'flexible'], n_rows),
+        'price': rng.integers(50, 1200, n_rows).astype(float),
+        'availability 365': rng.integers(0, 366, n_rows),
+        'review rate number': rng.integers(1, 6, n_rows),
+    })
+
+
+@pytest.fixture
+def shopping_table():
+    register_dataframe(_shopping_frame(), 'shopping')
+
+
+@pytest.fixture
+def airbnb_table():
+    register_dataframe(_airbnb_frame(), 'airbnb')
+
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    return df.astype(str).sort_values(list(df.columns)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('filters', [None, {'category': ['Clothing', 'Footwear'], 'location': ["O'Brien"]}])
+def test_shopping_dashboard_kpis_match_individual_queries(shopping_table, filters):
+    kpis = queries_shopping.get_dashboard_kpis(filters)
+
+    pd.testing.assert_frame_equal(_sorted(kpis['sales_by_category']), _sorted(queries_shopping.get_sales_by_category(filters)))
+    pd.testing.assert_frame_equal(_sorted(kpis['sales_by_gender_season']), _sorted(queries_shopping.get_sales_by_gender_season(filters)))
+    pd.testing.assert_frame_equal(_sorted(kpis['avg_basket_by_age']), _sorted(queries_shopping.get_avg_basket_by_age(filters)))
+    pd.testing.assert_frame_equal(_sorted(kpis['payment_methods']), _sorted(queries_shopping.get_payment_methods(filters)))
+
+
+@pytest.mark.parametrize('filters', [None, {'room_type': ['Private room'], 'price_min': 100, 'price_max': 900}])
+def test_airbnb_dashboard_kpis_match_individual_queries(airbnb_table, filters):
+    kpis = queries_airbnb.get_dashboard_kpis(filters)
+
+    pd.testing.assert_frame_equal(_sorted(kpis['avg_price_by_neighbourhood']), _sorted(queries_airbnb.get_avg_price_by_neighbourhood(filters)))
+    pd.testing.assert_frame_equal(_sorted(kpis['room_type_distribution']), _sorted(queries_airbnb.get_room_type_distribution(filters)))
+    pd.testing.assert_frame_equal(_sorted(kpis['avg_availability_by_neighbourhood']), _sorted(queries_airbnb.get_avg_availability_by_neighbourhood(filters)))
+    pd.testing.assert_frame_equal(_sorted(kpis['avg_rating_by_room_type']), _sorted(queries_airbnb.get_avg_rating_by_room_type(filters)))
+
+
+def test_arrow_results_match_pandas_results(shopping_table):
+    import pyarrow as pa
+
+    table = queries_shopping.get_sales_by_category(arrow=True)
+
+    assert isinstance(table, pa.Table)
+    # SUM d'entiers (HUGEINT) : float64 comme avec .df(), et non Decimal
+    assert table.schema.field('total_ventes').type == pa.float64()
+    pd.testing.assert_frame_equal(_sorted(table.to_pandas()), _sorted(queries_shopping.get_sales_by_category()))
+
+
+def test_estimates_on_a_full_sample_match_exact_kpis(airbnb_table, monkeypatch):
+    # Table de 300 lignes sous le seuil : pas d'estimation, les résultats exacts suffisent
+    assert queries_airbnb.get_dashboard_estimates() is None
+
+    # Échantillon couvrant toute la table : estimations égales aux KPIs exacts
+    monkeypatch.setattr(queries_airbnb, 'APPROXIMATE_MIN_ROWS', 0)
+    filters = {'room_type': ['Private room', 'Shared room']}
+    estimates = queries_airbnb.get_dashboard_estimates(filters)
+    exact = queries_airbnb.get_dashboard_kpis(filters)
+
+    for kpi, df in exact.items():
+        pd.testing.assert_frame_equal(_sorted(estimates[kpi].drop(columns='marge')), _sorted(df))
+    # Toute la table est lue : aucune incertitude
+    for kpi in estimates.values():
+        assert (kpi['marge'] == 0).all()
+
+
+def test_estimate_margins_cover_exact_kpis_on_clustered_rows():
+    # Fichier trié : prix et quartier constants sur chaque bloc de 2048 lignes consécutives
+    frame = _airbnb_frame(50 * 2048)
+    block = np.arange(len(frame)) // 2048
+    frame['neighbourhood group'] = np.array(['Brooklyn', 'Manhattan', 'Queens'])[block % 3]
+    frame['price'] = np.random.default_rng(2).integers(50, 1200, block.max() + 1).astype(float)[block]
+    register_dataframe(frame, 'airbnb')
+    exact = frame.groupby('neighbourhood group')['price'].mean()
+    counts = frame['room type'].value_counts()
+
+    covered = []
+    for _ in range(100):
+        estimates = queries_airbnb._compute_dashboard_estimates(None, 0.1)
+        for row in estimates['avg_price_by_neighbourhood'].itertuples():
+            covered.append(abs(row.prix_moyen - exact[row.quartier]) <= row.marge + 0.01)
+        for row in estimates['room_type_distribution'].itertuples():
+            covered.append(abs(row.nb_logements - counts[row.type_logement]) <= row.marge + 1)
+
+    # Marges à 95 % : environ 95 % des intervalles contiennent la valeur exacte
+    assert np.mean(covered) >= 0.9
+
+
+def test_duckdb_ingestion_matches_pandas(tmp_path):
+    csv_path = tmp_path / 'airbnb.csv'
+    csv_path.write_text(AIRBNB_CSV)
+
+    df_pandas, _ = preprocess_auto(pd.read_csv(csv_path, low_memory=False))
+    register_dataframe(df_pandas, 'airbnb_pandas')
+    expected = execute_query("SELECT * FROM airbnb_pandas ORDER BY id")
+
+    assert ingest_csv(str(csv_path)) == ('airbnb', df_pandas.attrs['duplicates_removed'])
+    result = execute_query("SELECT * FROM airbnb ORDER BY id")
+
+    assert list(result.columns) == list(expected.columns)
+    assert result['price'].tolist() == expected['price'].tolist() == [1200.0, 80.0]
+    assert result['reviews per month'].tolist() == expected['reviews per month'].tolist()
+
+
+def test_register_dataframe_materializes_compact_types():
+    df = pd.DataFrame({
+        'Category': ['Clothing', 'Footwear', 'Clothing'],
+        'Age': [18, 45, 70],
+        'Purchase Amount (USD)': [20.5, 99.0, 53.25],
+    })
+    register_dataframe(df, 'typed_shopping')
+
+    types = dict(execute_query("DESCRIBE typed_shopping")[['column_name', 'column_type']].values)
+    assert types['Category'] == "ENUM('Clothing', 'Footwear')"
+    assert types['Age'] == 'TINYINT'
+    assert types['Purchase Amount (USD)'] == 'DOUBLE'
+    assert execute_query("SELECT COUNT(*) AS n FROM typed_shopping WHERE Category = 'Clothing'")['n'][0] == 2
+
+
+def test_catalog_round_trip(tmp_path, monkeypatch):
+    from app.database import catalog
+    monkeypatch.setattr(catalog, 'CATALOG_PATH', tmp_path / 'catalog.duckdb')
+
+    catalog.attach_catalog()
+    csv_path = tmp_path / 'airbnb.csv'
+    csv_path.write_text(AIRBNB_CSV)
+    dataset_type, _ = ingest_csv(str(csv_path), catalog.dataset_table('abc123'))
+    catalog.save_dataset('abc123', dataset_type, 'airbnb.csv')
+
+    entry = catalog.find_dataset('abc123')
+    assert entry['dataset_type'] == 'airbnb'
+    assert entry['n_rows'] == 2
+    assert 'abc123' in catalog.list_datasets()['digest'].tolist()
+
+    catalog.open_dataset(entry)
+    assert execute_query("SELECT COUNT(*) AS n FROM airbnb")['n'][0] == 2
+
+
+def test_catalog_is_bounded_and_listed_per_session(tmp_path, monkeypatch):
+    from app.database import catalog
+    monkeypatch.setattr(catalog, 'CATALOG_PATH', tmp_path / 'catalog.duckdb')
+    monkeypatch.setattr(catalog, 'CATALOG_MAX_DATASETS', 2)
+    monkeypatch.setattr(catalog, 'SESSION_IDLE_TIMEOUT', 0)
+
+    catalog.attach_catalog()
+    for digest in ['d1', 'd2', 'd3']:
+        register_dataframe(_shopping_frame(10), catalog.dataset_table(digest))
+        catalog.save_dataset(digest, 'shopping', f'{digest}.csv')
+
+    # Le moins récemment ouvert est supprimé, table comprise
+    assert catalog.list_datasets()['digest'].tolist() == ['d3', 'd2']
+    assert catalog.find_dataset('d1') is None
+    assert not catalog._catalog_table_exists(catalog.dataset_table('d1'))
+
+    # L'affichage du sélecteur n'écrit pas dans le catalogue : pas d'éviction hors enregistrement
+    monkeypatch.setattr(catalog, 'CATALOG_MAX_DATASETS', 1)
+    assert catalog.list_datasets()['digest'].tolist() == ['d3', 'd2']
+    assert catalog._catalog_table_exists(catalog.dataset_table('d2'))
+
+    # Une autre session ne voit pas ces datasets dans son sélecteur
+    monkeypatch.setattr(catalog, 'get_namespace', lambda: 's_autre')
+    assert catalog.list_datasets().empty
+
+
+def test_filter_options_are_cached_per_table_version(shopping_table):
+    options = queries_shopping.get_filter_options()
+    expected = _shopping_frame()['Category'].value_counts().to_dict()
+
+    assert options['categories'] == sorted(expected)
+    assert options['counts']['categories'] == expected
+    assert queries_shopping.get_filter_options() is options
+
+    register_dataframe(_shopping_frame(10), 'shopping')
+    assert sum(queries_shopping.get_filter_options()['counts']['categories'].values()) == 10
+
+
+def test_execute_query_caches_until_table_is_replaced(shopping_table):
+    from app.database.connection import get_query_cache_stats
+
+    query = "SELECT COUNT(*) AS n FROM shopping"
+    assert execute_query(query)['n'][0] == 300
+    hits = get_query_cache_stats()['hits']
+    assert execute_query(query)['n'][0] == 300
+    assert get_query_cache_stats()['hits'] == hits + 1
+
+    register_dataframe(_shopping_frame(10), 'shopping')
+    assert execute_query(query)['n'][0] == 10
+
+
+def test_filter_values_are_bound_not_inlined(shopping_table):
+    # Une apostrophe ou une injection dans une valeur ne casse pas la requête
+    assert queries_shopping.get_sales_by_category({'location': ["O'Brien"]})['nb_transactions'].sum() > 0
+    assert queries_shopping.get_sales_by_category({'location': ["x') OR 1=1 --"]}).empty
+
+    # Seuls les filtres renseignés produisent un prédicat, le texte ne dépend pas des valeurs
+    assert queries_shopping._where_clause({}) == ''
+    assert queries_airbnb._where_clause({'room_type': ['Shared room', 'Private room'], 'price_max': 500}) == (
+        'WHERE "room type" IN ($room_type_0, $room_type_1) AND price <= $price_max'
+    )
+    assert queries_airbnb._build_params({'room_type': ['Shared room', 'Private room'], 'price_max': 500}) == {
+        'room_type_0': 'Private room', 'room_type_1': 'Shared room', 'price_max': 500
+    }
+
+
+def test_sessions_have_isolated_tables(monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.database import connection, cube
+
+    current = threading.local()
+    monkeypatch.setattr(connection, '_current_session_id', lambda: getattr(current, 'session_id', None))
+
+    def run_session(session_id: str, n_rows: int) -> set[int]:
+        # Chaque session enregistre sa propre table 'shopping' sous le même nom
+        current.session_id = session_id
+        register_dataframe(_shopping_frame(n_rows), 'shopping')
+        cube.attach_cube('shopping', 'shopping__cube')
+        return {int(queries_shopping.get_sales_by_category()['nb_transactions'].sum()) for _ in range(5)}
+
+    sizes = {f'session-{i}': 20 * (i + 1) for i in range(4)}
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = {session_id: pool.submit(run_session, session_id, n) for session_id, n in sizes.items()}
+
+    assert {session_id: future.result() for session_id, future in results.items()} == {
+        session_id: {n} for session_id, n in sizes.items()
+    }
+
+    # Les sessions inactives sont fermées avec leur schéma
+    connection._close_idle_sessions(float('inf'))
+    assert not connection._sessions
+    # ... ainsi que les versions de leurs tables et leurs caches de session (cubes)
+    schemas = {connection._schema_name(session_id) for session_id in sizes}
+    assert not {key[0] for key in connection._table_versions} & schemas
+    assert not set(connection._data_versions) & schemas
+    assert not {key[0] for key in connection._session_caches} & schemas
+
+
+def test_filter_options_are_cached_per_session(monkeypatch):
+    from app.database import connection
+
+    current = {'session_id': None}
+    monkeypatch.setattr(connection, '_current_session_id', lambda: current['session_id'])
+    computed = []
+    filter_counts = queries_shopping._filter_counts
+    monkeypatch.setattr(queries_shopping, '_filter_counts', lambda source: computed.append(source) or filter_counts(source))
+
+    # Plus de sessions que d'entrées par cache : aucune n'évince les options des autres
+    sessions = [f'session-{i}' for i in range(2 * queries_shopping.FILTER_OPTIONS_MAX_ENTRIES)]
+    for session_id in sessions:
+        current['session_id'] = session_id
+        register_dataframe(_shopping_frame(20), 'shopping')
+        queries_shopping.get_filter_options()
+    assert len(computed) == len(sessions)
+
+    # Reruns : options servies par le cache de chaque session, sans requête
+    for session_id in sessions:
+        current['session_id'] = session_id
+        queries_shopping.get_filter_options()
+    assert len(computed) == len(sessions)
+
+    # Les caches des sessions fermées sont supprimés
+    connection._close_idle_sessions(float('inf'))
+    assert {namespace for namespace, _ in connection._session_caches} <= {'main'}
+
+
+def test_concurrent_queries_run_in_the_session_schema(shopping_table, monkeypatch):
+    from app.database import connection
+
+    # Table 'shopping' de 300 lignes dans main, de 40 lignes dans le schéma de la session
+    monkeypatch.setattr(connection, '_current_session_id', lambda: 'session-concurrent')
+    register_dataframe(_shopping_frame(40), 'shopping')
+
+    tasks = {
+        'sales_by_category': queries_shopping.get_sales_by_category,
+        'sales_by_gender_season': queries_shopping.get_sales_by_gender_season,
+        'avg_basket_by_age': queries_shopping.get_avg_basket_by_age,
+        'payment_methods': queries_shopping.get_payment_methods,
+    }
+    results = dict(connection.run_concurrently(tasks))
+
+    assert set(results) == set(tasks)
+    assert {int(df.filter(like='nb_').iloc[:, 0].sum()) for df in results.values()} == {40}
+    expected = queries_shopping.get_dashboard_kpis()
+    for kpi, df in results.items():
+        pd.testing.assert_frame_equal(_sorted(df), _sorted(expected[kpi]))
+
+    # Les curseurs des requêtes concurrentes sont fermés avec la session
+    connection._close_idle_sessions(float('inf'))
+    assert 's_session_concurrent' not in connection._worker_cursors
+
+
+def test_profiled_rerun_records_query_steps(shopping_table):
+    from app.database import connection
+    from app.utils.profiling import finish_rerun, start_rerun
+
+    start_rerun()
+    tasks = {
+        'sales_by_category': lambda: queries_shopping.get_sales_by_category({'gender': ['Female']}),
+        'payment_methods': lambda: queries_shopping.get_payment_methods({'gender': ['Female']}),
+    }
+    dict(connection.run_concurrently(tasks))
+    queries_shopping.get_sales_by_category({'gender': ['Female']})
+    rerun = finish_rerun()
+
+    steps = [step for step in rerun['steps'] if step['kind'] == 'query']
+    assert len(steps) == 3
+    # Les requêtes des threads de run_concurrently sont rattachées au rerun
+    assert all(step['thread'].startswith('duckdb-query') for step in steps[:2])
+    assert [step['cache'] for step in steps] == [False, False, True]
+    assert all(step['rows_returned'] > 0 and step['seconds'] >= 0 for step in steps)
+    assert steps[0]['rows_scanned'] == 300
+
+    plan = connection.explain_analyze(steps[0]['query'], steps[0]['params'])
+    assert 'Total Time' in plan
+
+
+@pytest.mark.parametrize('filters', [None, {'category': ['Clothing'], 'gender': ['Female'], 'location': ["O'Brien"]}])
+def test_cube_kpis_match_raw_table(shopping_table, filters, monkeypatch):
+    from app.database import cube
+
+    expected = queries_shopping.get_dashboard_kpis(filters)
+
+    monkeypatch.setattr(cube, 'AGGREGATE_CUBE_ENABLED', True)
+    assert cube.build_cube('shopping', 'shopping', 'shopping__cube')
+    cube.attach_cube('shopping', 'shopping__cube')
+    assert cube.get_cube_table('shopping') == 'shopping__cube'
+
+    kpis = queries_shopping.get_dashboard_kpis(filters)
+    for name, df in expected.items():
+        pd.testing.assert_frame_equal(_sorted(kpis[name]), _sorted(df))
+
+    # Remplacer la table invalide le cube : retour à la table brute
+    register_dataframe(_shopping_frame(10), 'shopping')
+    assert cube.get_cube_table('shopping') is None
+
+
+def test_append_dataset_inserts_only_new_rows_and_updates_cube(tmp_path, monkeypatch):
+    from app.database import catalog, cube
+    from app.database.connection import get_table_version
+
+    monkeypatch.setattr(catalog, 'CATALOG_PATH', tmp_path / 'catalog.duckdb')
+    monkeypatch.setattr(catalog, 'AGGREGATE_CUBE_ENABLED', True)
+    monkeypatch.setattr(cube, 'AGGREGATE_CUBE_ENABLED', True)
+
+    history = _shopping_frame(300)
+    catalog.attach_catalog()
+    register_dataframe(history.iloc[:200], catalog.dataset_table('day1'))
+    entry = catalog.save_dataset('day1', 'shopping', 'day1.csv')
+    catalog.open_dataset(entry)
+    queries_shopping.get_filter_options()
+
+    # Vue d'une autre session sur le dataset d'origine
+    execute_query(f"CREATE OR REPLACE VIEW autre_session AS SELECT * FROM {catalog.dataset_table('day1')}", use_cache=False)
+
+    # Le nouveau dépôt recouvre en partie l'historique et apporte une catégorie et un montant inédits
+    delivery = history.iloc[150:].copy()
+    delivery.loc[delivery.index[-1], ['Category', 'Purchase Amount (USD)']] = ['Jewelry', 5000]
+    register_dataframe(delivery, 'delivery')
+
+    appended = catalog.append_dataset(entry, 'delivery', 'day2', 'day2.csv')
+    previous_version = get_table_version('shopping')
+    catalog.open_dataset(appended)
+    queries_shopping.merge_filter_options(previous_version, catalog.delta_table(appended['digest']))
+    assert queries_shopping._filter_options_cache().get(get_table_version('shopping')) is not None
+
+    assert appended['n_rows'] == 300
+    assert execute_query("SELECT COUNT(*) AS n FROM (SELECT DISTINCT * FROM shopping)")['n'][0] == 300
+
+    # Copie à l'écriture : le dataset d'origine et les vues qui le lisent sont intacts
+    assert catalog.find_dataset('day1')['n_rows'] == 200
+    assert execute_query("SELECT COUNT(*) AS n FROM autre_session", use_cache=False)['n'][0] == 200
+
+    expected = pd.concat([history.iloc[:150], delivery])
+    kpis = queries_shopping.get_dashboard_kpis()
+    assert cube.get_cube_table('shopping') == catalog.cube_table(appended['digest'])
+    assert kpis['sales_by_category'].set_index('categorie')['total_ventes'].to_dict() == (
+        expected.groupby('Category')['Purchase Amount (USD)'].sum().to_dict()
+    )
+    assert kpis['payment_methods']['nb_transactions'].sum() == 300
+
+    # Options de filtres complétées à partir du delta : mêmes comptages qu'un calcul complet
+    assert queries_shopping.get_filter_options()['counts'] == queries_shopping._filter_counts('shopping')
+    assert queries_shopping.get_filter_options()['counts']['categories']['Jewelry'] == 1
+
+    # Éviction : la base d'un dataset complété conservé n'est pas supprimée
+    monkeypatch.setattr(catalog, 'CATALOG_MAX_DATASETS', 1)
+    monkeypatch.setattr(catalog, 'SESSION_IDLE_TIMEOUT', 0)
+    catalog._purge_datasets()
+    assert catalog.list_datasets()['digest'].tolist() == [appended['digest'], 'day1']
+    assert execute_query("SELECT COUNT(*) AS n FROM shopping", use_cache=False)['n'][0] == 300
+
+
+def test_append_keeps_delta_rows_and_reads_its_cube_when_cube_mode_is_off(tmp_path, monkeypatch):
+    from app.database import catalog, cube
+
+    monkeypatch.setattr(catalog, 'CATALOG_PATH', tmp_path / 'catalog.duckdb')
+    assert not catalog.AGGREGATE_CUBE_ENABLED and not cube.AGGREGATE_CUBE_ENABLED
+
+    history = _shopping_frame(300)
+    catalog.attach_catalog()
+    register_dataframe(history.iloc[:200], catalog.dataset_table('lundi'))
+    entry = catalog.save_dataset('lundi', 'shopping', 'lundi.csv')
+    catalog.open_dataset(entry)
+    assert cube.get_cube_table('shopping') is None
+
+    # Deux lignes distinctes dans le fichier brut ("$1,200" et "$1200"), identiques une fois nettoyées :
+    # gardées toutes deux à l'ingestion, elles ne sont pas fusionnées à l'ajout
+    delivery = pd.concat([history.iloc[150:], history.iloc[[-1]]])
+    register_dataframe(delivery, 'delivery')
+    appended = catalog.append_dataset(entry, 'delivery', 'mardi', 'mardi.csv')
+
+    assert appended['n_rows'] == 301
+    assert appended['duplicates_removed'] == 50
+
+    # Hors mode cube, le dataset complété est lu dans son cube (base + delta), sans relire la table
+    catalog.open_dataset(appended)
+    assert cube.get_cube_table('shopping') == catalog.cube_table(appended['digest'])
+    expected = pd.concat([history.iloc[:150], delivery])
+    kpis = queries_shopping.get_dashboard_kpis()
+    assert kpis['sales_by_category'].set_index('categorie')['total_ventes'].to_dict() == (
+        expected.groupby('Category')['Purchase Amount (USD)'].sum().to_dict()
+    )
+    assert kpis['payment_methods']['nb_transactions'].sum() == 301
+
+
+def test_append_and_catalog_follow_the_dedup_strategy(tmp_path, monkeypatch):
+    from app.database import catalog
+
+    monkeypatch.setattr(catalog, 'CATALOG_PATH', tmp_path / 'catalog.duckdb')
+    monkeypatch.setattr(catalog, 'DEDUP_STRATEGY', 'key')
+    monkeypatch.setattr(catalog, 'SESSION_IDLE_TIMEOUT', 0)
+
+    listings = _airbnb_frame(10)
+    catalog.attach_catalog()
+    register_dataframe(listings.iloc[:6], catalog.dataset_table('jour1'))
+    entry = catalog.save_dataset('jour1', 'airbnb', 'jour1.csv', duplicates_removed=2)
+
+    # Annonces 4 et 5 republiées avec un nouveau prix : déjà présentes par clé, seules 6 à 9 sont ajoutées
+    delivery = listings.iloc[4:].copy()
+    delivery['price'] += 1
+    register_dataframe(delivery, 'livraison')
+    appended = catalog.append_dataset(entry, 'livraison', 'jour2', 'jour2.csv', duplicates_removed=1)
+
+    assert appended['n_rows'] == 10
+    assert appended['dedup_strategy'] == 'key'
+    assert appended['duplicates_removed'] == 2 + 1 + 2
+    assert execute_query(f"SELECT COUNT(*) AS n FROM {catalog.delta_table(appended['digest'])}", use_cache=False)['n'][0] == 4
+
+    # Autre stratégie : les datasets enregistrés ne sont plus retrouvés, puis sont supprimés
+    monkeypatch.setattr(catalog, 'DEDUP_STRATEGY', 'full_row')
+    assert catalog.find_dataset('jour1') is None
+    assert catalog.list_datasets().empty
+    catalog._purge_datasets()
+    assert not catalog._catalog_table_exists(catalog.dataset_table('jour1'))
+
+
+def test_streaming_ingestion_matches_pandas_with_small_chunks(tmp_path):
+    from app.database.ingestion import ingest_stream
+
+    csv_path = tmp_path / 'airbnb.csv'
+    csv_path.write_text(AIRBNB_CSV)
+
+    df_pandas, _ = preprocess_auto(pd.read_csv(csv_path, low_memory=False))
+    register_dataframe(df_pandas, 'airbnb_pandas')
+    expected = execute_query("SELECT * FROM airbnb_pandas ORDER BY id")
+
+    # Budget minuscule : une ligne par bloc, les doublons sont dans des blocs différents
+    progress = []
+    with open(csv_path, 'rb') as file:
+        dataset_type, duplicates_removed = ingest_stream(
+            file, 'airbnb_stream', memory_budget=1, on_progress=lambda *args: progress.append(args)
+        )
+    result = execute_query("SELECT * FROM airbnb_stream ORDER BY id")
+
+    assert dataset_type == 'airbnb'
+    assert duplicates_removed == df_pandas.attrs['duplicates_removed'] == 1
+    assert len(progress) == 5
+    assert progress[-1][0] == 5 and progress[-1][1] == progress[-1][2]
+    assert list(result.columns) == list(expected.columns)
+    assert result['price'].tolist() == expected['price'].tolist() == [1200.0, 80.0]
+    assert result['reviews per month'].tolist() == expected['reviews per month'].tolist()
+
+
+def test_engines_deduplicate_raw_values_before_cleaning(tmp_path):
+    from app.database.ingestion import ingest_stream
+
+    # Lignes distinctes dans le fichier, identiques une fois price et reviews per month nettoyés
+    csv_path = tmp_path / 'airbnb.csv'
+    csv_path.write_text(AIRBNB_CSV.splitlines()[0] + """
+1,Loft,10,Brooklyn,Private room,strict,"$1,200 ",$240 ,0.5,4,120,,
+1,Loft,10,Brooklyn,Private room,strict,$1200 ,$240 ,0.5,4,120,,
+2,Flat,11,Manhattan,Entire home/apt,flexible,$80 ,$16 ,,5,30,,
+2,Flat,11,Manhattan,Entire home/apt,flexible,$80 ,$16 ,0,5,30,,
+""")
+
+    df_pandas, _ = preprocess_auto(pd.read_csv(csv_path, low_memory=False))
+    ingest_csv(str(csv_path), 'airbnb_duckdb')
+    with open(csv_path, 'rb') as file:
+        ingest_stream(file, 'airbnb_stream', memory_budget=1)
+
+    assert len(df_pandas) == 4
+    for table in ['airbnb_duckdb', 'airbnb_stream']:
+        result = execute_query(f"SELECT * FROM {table} ORDER BY id, \"reviews per month\"")
+        assert len(result) == 4
+        assert not any(col.startswith('__') for col in result.columns)
+        assert result['price'].tolist() == [1200.0, 1200.0, 80.0, 80.0]
+
+
+@pytest.mark.parametrize('strategy, expected_ids, expected_duplicates', [('full_row', [1, 2, 3, 3], 1), ('key', [2, 3], 3)])
+def test_engines_apply_the_dedup_strategy(tmp_path, strategy, expected_ids, expected_duplicates):
+    from app.database.ingestion import ingest_stream
+
+    # Clé 1 : première ligne sans prix (écartée après le dédoublonnage par clé), clé 3 : deux lignes distinctes
+    csv_path = tmp_path / 'airbnb.csv'
+    csv_path.write_text(AIRBNB_CSV.splitlines()[0] + """
+1,Loft,10,Brooklyn,Private room,strict,,$240 ,0.5,4,120,,
+1,Loft,10,Brooklyn,Private room,strict,$1200 ,$240 ,0.5,4,120,,
+2,Flat,11,Manhattan,Entire home/apt,flexible,$80 ,$16 ,,5,30,,
+2,Flat,11,Manhattan,Entire home/apt,flexible,$80 ,$16 ,,5,30,,
+3,Room,12,Queens,Shared room,moderate,$55 ,$11 ,1.2,3,200,,
+3,Room,12,Queens,Shared room,moderate,$60 ,$11 ,1.2,3,200,,
+""")
+
+    df_pandas, _ = preprocess_auto(pd.read_csv(csv_path, low_memory=False), dedup_strategy=strategy)
+    assert sorted(df_pandas['id']) == expected_ids
+    assert df_pandas.attrs['duplicates_removed'] == expected_duplicates
+
+    assert ingest_csv(str(csv_path), 'airbnb_duckdb', strategy) == ('airbnb', expected_duplicates)
+    with open(csv_path, 'rb') as file:
+        assert ingest_stream(file, 'airbnb_stream', memory_budget=1, dedup_strategy=strategy) == ('airbnb', expected_duplicates)
+
+    for table in ['airbnb_duckdb', 'airbnb_stream']:
+        result = execute_query(f"SELECT id, price FROM {table} ORDER BY id, price")
+        assert result['id'].tolist() == expected_ids
+        assert result['price'].tolist() == df_pandas.sort_values(['id', 'price'])['price'].tolist()
+
+
+def test_arrow_read_matches_duckdb_ingestion(tmp_path):
+    from app.utils.data_processing import read_csv_sniffed, read_options, sniff_csv
+
+    csv_path = tmp_path / 'airbnb.csv'
+    csv_path.write_text(AIRBNB_CSV)
+
+    with open(csv_path, 'rb') as file:
+        dataset_type, sample = sniff_csv(file)
+        df_arrow, _ = preprocess_auto(read_csv_sniffed(file, read_options(dataset_type, sample, arrow=True)))
+    register_dataframe(df_arrow, 'airbnb_arrow')
+    expected = execute_query("SELECT * FROM airbnb_arrow ORDER BY id")
+
+    ingest_csv(str(csv_path), 'airbnb_duckdb')
+    result = execute_query("SELECT * FROM airbnb_duckdb ORDER BY id")
+
+    assert list(result.columns) == list(expected.columns)
+    assert 'house_rules' not in result.columns and 'NAME' not in result.columns
+    assert '__index_level_0__' not in expected.columns
+    assert result['price'].tolist() == expected['price'].tolist() == [1200.0, 80.0]
+    assert result['reviews per month'].tolist() == expected['reviews per month'].tolist()
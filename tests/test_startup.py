@@ -0,0 +1,44 @@
+# Tests pour le chargement différé des dashboards et la mesure du démarrage
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from app.utils import lazy_loading
+
+
+def test_dashboard_modules_are_loaded_on_demand():
+    code = (
+        "import sys\n"
+        "import app.components.file_uploader, app.components.sidebar\n"
+        "from app.utils.lazy_loading import load_dashboard\n"
+        "lazy = ['plotly.express', 'app.visualizations.chart_shopping', 'app.visualizations.chart_airbnb',\n"
+        "        'app.database.queries_shopping', 'app.database.queries_airbnb']\n"
+        "print([m for m in lazy if m in sys.modules])\n"
+        "load_dashboard('airbnb')\n"
+        "print([m for m in lazy if m in sys.modules])\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=Path(__file__).resolve().parents[1],
+        capture_output=True, text=True, check=True
+    )
+    before, after = result.stdout.strip().splitlines()
+
+    assert before == '[]'
+    # Seul le dashboard du dataset détecté est chargé, avec son module de requêtes
+    assert after == "['plotly.express', 'app.visualizations.chart_airbnb', 'app.database.queries_airbnb']"
+
+
+def test_startup_is_recorded_once_per_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(lazy_loading, '_startup', None)
+    log_path = tmp_path / 'startup.jsonl'
+    started = time.perf_counter()
+
+    startup = lazy_loading.record_startup(started, started + 0.25, log_path)
+    assert startup['imports_seconds'] == 0.25
+    assert startup['first_rerun_seconds'] >= 0
+    assert lazy_loading.record_startup(started, started, log_path) is None
+
+    assert [json.loads(line) for line in log_path.read_text().splitlines()] == [startup]
+    assert lazy_loading.get_startup() == startup